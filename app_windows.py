@@ -5,6 +5,7 @@ import subprocess
 import threading
 import time
 import json
+import logging
 import webbrowser
 import tempfile
 from PIL import Image
@@ -16,11 +17,32 @@ except Exception:
     ToastNotifier = None
 
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
-from music_server import VERSION
+from music_server import VERSION, _runtime_dir
+from control_channel import ControlListener, EVENT_PORT, EVENT_READY, EVENT_STATUS, EVENT_TRACK
+from instance_registry import EXIT_ALREADY_RUNNING, check_health, find_running_instance
 
 CONFIG_FILE = os.path.join(os.path.expanduser("~"), ".jamdeck_config.json")
 DEFAULT_PORT = 8080
 OLD_SCENES_FILE = os.path.join(os.path.expanduser("~"), ".jamdeck_scenes")
+DEBUG_LOG = os.path.join(tempfile.gettempdir(), "jamdeck_debug.log")
+# Windows truncates tray tooltips at 127 characters
+MAX_TOOLTIP = 120
+# Seconds between /health checks of a server this tray attached to (it sends no events)
+ATTACHED_CHECK_SECONDS = 5.0
+
+# One handler keeps the debug log open instead of reopening it for every line
+_log = logging.getLogger("jamdeck.tray")
+_log.setLevel(logging.INFO)
+_log.propagate = False
+try:
+    _handler = logging.FileHandler(DEBUG_LOG, encoding="utf-8", delay=True)
+    _handler.setFormatter(logging.Formatter("[%(funcName)s] %(asctime)s - %(message)s", "%Y-%m-%d %H:%M:%S"))
+    _log.addHandler(_handler)
+except Exception:
+    _log.addHandler(logging.NullHandler())
+
+def dbg(msg):
+    _log.info(msg, stacklevel=2)
 
 def load_config():
     scenes = ["default"]
@@ -72,6 +94,12 @@ class JamDeckTray:
         self.server_process = None
         self.server_thread = None
         self.server_running = False
+        self.attached = None
+        self.control = None
+        self.server_ready = False
+        self.degraded = None
+        self.clients = 0
+        self.track = None
         # Prefer .ico icon if present for better Windows taskbar/tray rendering
         icon_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets", "images")
         png_icon = os.path.join(icon_dir, "jamdeck-template.png")
@@ -89,9 +117,12 @@ class JamDeckTray:
 
     def build_menu(self):
         return pystray.Menu(
-            pystray.MenuItem(lambda item: "Stop Server" if self.server_running else "Start Server", self.toggle_server),
+            pystray.MenuItem(lambda item: ("Detach from Server" if self.attached is not None else "Stop Server")
+                             if self.server_running else "Start Server", self.toggle_server),
             pystray.Menu.SEPARATOR,
             pystray.MenuItem(lambda item: f"Server URL: http://localhost:{self.actual_port}", lambda: None, enabled=False),
+            pystray.MenuItem(lambda item: self.status_text(), lambda: None, enabled=False),
+            pystray.MenuItem(lambda item: self.track_text(), lambda: None, enabled=False),
             pystray.Menu.SEPARATOR,
             pystray.MenuItem("Copy Scene URL", pystray.Menu(*self.build_copy_menu())),
             pystray.MenuItem("Manage Scenes", pystray.Menu(*self.build_manage_menu())),
@@ -136,6 +167,12 @@ class JamDeckTray:
         if self.server_running:
             return
 
+        # Reuse a server that is already running (e.g. started by another tray)
+        existing = find_running_instance(_runtime_dir())
+        if existing is not None:
+            self.attach_server(existing)
+            return
+
         # Candidate directories to search (in order)
         candidates = []
         try:
@@ -161,14 +198,6 @@ class JamDeckTray:
         server_py_name = "music_server.py"
         server_exe_name = "music_server.exe"
 
-        debug_log = os.path.join(tempfile.gettempdir(), "jamdeck_debug.log")
-        def dbg(msg):
-            try:
-                with open(debug_log, "a", encoding="utf-8") as lf:
-                    lf.write(f"[start_server] {time.strftime('%Y-%m-%d %H:%M:%S')} - {msg}\n")
-            except Exception:
-                pass
-
         cmd = None
         chosen_cwd = None
 
@@ -220,77 +249,172 @@ class JamDeckTray:
         except Exception as e:
             dbg(f"Self-check error: {e}")
 
+        # Status arrives as events on the control channel; stdout stays quiet and
+        # stderr (e.g. a startup traceback) goes straight to the debug log
+        try:
+            control = ControlListener(self.on_control_event)
+        except Exception as e:
+            dbg(f"Control channel unavailable: {e}")
+            self.notify("Jam Deck", f"Failed to start server: {e}")
+            return
+        cmd += ["--control", control.endpoint, "--quiet"]
+
         # Spawn process
         try:
             dbg(f"Spawning: {cmd}, cwd={chosen_cwd}")
-            self.server_process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, encoding='utf-8', cwd=chosen_cwd)
+            with open(DEBUG_LOG, "a", encoding="utf-8") as stderr_log:
+                self.server_process = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=stderr_log, cwd=chosen_cwd)
         except Exception as e:
             dbg(f"Failed to spawn: {e}")
+            control.stop()
             self.notify("Jam Deck", f"Failed to start server: {e}")
             return
 
+        # Reset before the listener runs: an early EVENT_PORT must not be overwritten
+        self.server_ready = False
+        self.degraded = None
+        self.clients = 0
+        self.track = None
+        self.actual_port = self.preferred_port
+        self.server_running = True
+        self.control = control
+        control.start()
         self.server_thread = threading.Thread(target=self.monitor_server, daemon=True)
         self.server_thread.start()
-        time.sleep(1)
-        self.server_running = True
-        self.actual_port = self.preferred_port
         self.icon.menu = self.build_menu()
-        self.notify("Jam Deck", "Server Started — overlay is active")
 
     def stop_server(self, icon=None, item=None):
         if not self.server_running:
             return
         proc = self.server_process
+        attached = self.attached
         self.server_running = False
         self.server_process = None
-        try:
-            proc.terminate()
-        except Exception:
-            pass
+        self.attached = None
         self.icon.menu = self.build_menu()
+        if attached is not None:
+            # Not our process: only let go of it, it keeps serving whoever started it
+            self.notify("Jam Deck", f"Detached from the server on port {attached.get('port')}; it keeps running")
+            return
+        try:
+            if proc is not None:
+                proc.terminate()
+        except Exception as e:
+            dbg(f"Could not stop server: {e}")
         self.notify("Jam Deck", "Server Stopped")
 
-    def monitor_server(self):
-        proc = self.server_process
-        debug_log = os.path.join(tempfile.gettempdir(), "jamdeck_debug.log")
-        def dbg(msg):
-            try:
-                with open(debug_log, "a", encoding="utf-8") as lf:
-                    lf.write(f"[monitor_server] {time.strftime('%Y-%m-%d %H:%M:%S')} - {msg}\n")
-            except Exception:
-                pass
-
-        while proc and proc.poll() is None:
-            try:
-                line = proc.stdout.readline()
-                if line:
-                    line = line.strip()
-                    print(f"Server: {line}")
-                    dbg(f"Server output: {line}")
-                    if line.startswith("JAMDECK_PORT="):
-                        try:
-                            port = int(line.split("=")[1])
-                            self.actual_port = port
-                            self.icon.menu = self.build_menu()
-                            dbg(f"Detected port: {port}")
-                        except Exception as e:
-                            dbg(f"Port parse error: {e}")
-            except Exception as e:
-                dbg(f"Exception reading output: {e}")
+    def attach_server(self, entry):
+        """Use a running server found in the instance registry instead of starting one."""
+        dbg(f"Attaching to running server: pid {entry.get('pid')}, port {entry.get('port')}")
+        self.attached = entry
+        self.server_process = None
+        self.server_running = True
+        self.actual_port = entry.get("port") or self.actual_port
+        self.server_ready = True
+        self.apply_health(entry.get("healthDoc") or {})
+        self.server_thread = threading.Thread(target=self.monitor_attached, args=(entry,), daemon=True)
+        self.server_thread.start()
+        self.icon.menu = self.build_menu()
+        self.notify("Jam Deck", f"Using the server already running on port {self.actual_port}")
+
+    def apply_health(self, health):
+        self.degraded = health.get("degraded")
+        self.clients = int(health.get("clients") or 0)
+        track = health.get("track") or {}
+        self.track = track if track.get("title") else None
+        self.refresh_status()
+
+    def monitor_attached(self, entry):
+        # The attached server is not our child and has no control channel to us, so check on it
+        while self.attached is entry:
+            health = check_health(entry)
+            if health is None:
                 break
+            self.apply_health(health)
+            time.sleep(ATTACHED_CHECK_SECONDS)
+        dbg(f"Attached server {entry.get('pid')} is gone")
+        if self.attached is entry:
+            self.attached = None
+            self.server_ready = False
+            self.server_running = False
+            self.icon.menu = self.build_menu()
+            self.notify("Jam Deck", "Server stopped unexpectedly")
 
-        # Process ended
+    def monitor_server(self):
+        proc = self.server_process
+        control = self.control
+        # Nothing to read any more: just wait for the process to end
         exit_code = None
         try:
-            exit_code = proc.returncode
-        except Exception:
-            pass
+            exit_code = proc.wait()
+        except Exception as e:
+            dbg(f"Exception waiting for server: {e}")
         dbg(f"Server exited with code: {exit_code}")
-        if self.server_running:
+        if control is not None:
+            control.stop()
+        if self.control is control:
+            self.control = None
+            self.server_ready = False
+        if exit_code == EXIT_ALREADY_RUNNING and self.server_running and self.server_process is proc:
+            # Another launch won the race to start a server; use that one
+            existing = find_running_instance(_runtime_dir(), wait=2.0)
+            if existing is not None:
+                self.attach_server(existing)
+                return
+        if self.server_running and self.server_process is proc:
             self.server_running = False
             self.icon.menu = self.build_menu()
             self.notify("Jam Deck", "Server stopped unexpectedly")
 
+    def on_control_event(self, event):
+        """Apply one status event from the server (called on the control listener thread)."""
+        kind = event.get("event")
+        if kind == EVENT_PORT:
+            self.actual_port = int(event.get("port") or self.actual_port)
+            dbg(f"Detected port: {self.actual_port}")
+        elif kind == EVENT_READY:
+            self.server_ready = True
+            dbg("Server ready")
+            self.notify("Jam Deck", "Server Started — overlay is active")
+        elif kind == EVENT_STATUS:
+            if event.get("degraded") != self.degraded:
+                dbg(f"Degraded: {event.get('degraded')}")
+            self.degraded = event.get("degraded")
+            self.clients = int(event.get("clients") or 0)
+        elif kind == EVENT_TRACK:
+            self.track = event if event.get("title") else None
+        else:
+            return
+        self.refresh_status()
+
+    def status_text(self):
+        if not self.server_running:
+            return "Status: Stopped"
+        if not self.server_ready:
+            return "Status: Starting..."
+        if self.degraded:
+            return f"Status: Degraded ({self.degraded})"
+        return f"Status: Ready — {self.clients} overlay(s) connected"
+
+    def track_text(self):
+        track = self.track
+        if not track:
+            return "Nothing playing"
+        text = track.get("title") or ""
+        if track.get("artist"):
+            text += f" — {track['artist']}"
+        return ("Now Playing: " if track.get("playing") else "Paused: ") + text
+
+    def refresh_status(self):
+        try:
+            title = "Jam Deck"
+            if self.server_running and self.track:
+                title += f" — {self.track_text()}"
+            self.icon.title = title[:MAX_TOOLTIP]
+            self.icon.update_menu()
+        except Exception as e:
+            dbg(f"Could not refresh tray status: {e}")
+
     def open_browser(self, icon=None, item=None):
         if not self.server_running:
             self.notify("Jam Deck", "Server not running")
@@ -421,7 +545,11 @@ class JamDeckTray:
             self.notify("Jam Deck", info.replace("\n", " "))
 
     def quit(self, icon=None, item=None):
-        if self.server_running:
+        if self.attached is not None:
+            # Leave a server this tray did not start running for whoever started it
+            self.attached = None
+            self.server_running = False
+        elif self.server_running:
             self.stop_server()
         self.icon.stop()
 
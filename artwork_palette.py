@@ -0,0 +1,93 @@
+# artwork_palette.py
+# Derives a small color palette from album art so overlays can tint to the cover:
+# the dominant color, a vivid accent, and readable text colors for both. It runs
+# once per cover (the result is cached with the artwork) on a downscaled image.
+# Requires Pillow; without it no palette is produced.
+
+import colorsys
+import io
+
+# Covers are decoded/downscaled to at most this many pixels per side before quantizing
+SAMPLE_SIZE = 64
+# Number of median-cut buckets
+PALETTE_COLORS = 8
+# An accent must cover at least this share of the image and differ enough from the dominant color
+MIN_ACCENT_SHARE = 0.03
+MIN_ACCENT_DISTANCE = 60
+
+LIGHT_TEXT = (255, 255, 255)
+DARK_TEXT = (17, 17, 17)
+
+def _hex(rgb):
+    return "#{:02x}{:02x}{:02x}".format(*rgb)
+
+def _luminance(rgb):
+    """WCAG relative luminance."""
+    def channel(c):
+        c /= 255.0
+        return c / 12.92 if c <= 0.03928 else ((c + 0.055) / 1.055) ** 2.4
+    r, g, b = (channel(c) for c in rgb)
+    return 0.2126 * r + 0.7152 * g + 0.0722 * b
+
+def contrast_ratio(a, b):
+    light, dark = sorted((_luminance(a), _luminance(b)), reverse=True)
+    return (light + 0.05) / (dark + 0.05)
+
+def text_color(background):
+    """White or near-black, whichever is more readable on background."""
+    if contrast_ratio(LIGHT_TEXT, background) >= contrast_ratio(DARK_TEXT, background):
+        return LIGHT_TEXT
+    return DARK_TEXT
+
+def _distance(a, b):
+    return sum((x - y) ** 2 for x, y in zip(a, b)) ** 0.5
+
+def _pick_accent(swatches, dominant):
+    best, best_score = None, 0.0
+    for share, rgb in swatches:
+        if share < MIN_ACCENT_SHARE or _distance(rgb, dominant) < MIN_ACCENT_DISTANCE:
+            continue
+        _, lightness, saturation = colorsys.rgb_to_hls(*(c / 255.0 for c in rgb))
+        # Vivid, mid-lightness colors make the best accents; area counts, but less
+        score = saturation * (1 - abs(lightness - 0.5) * 1.5) * share ** 0.5
+        if score > best_score:
+            best, best_score = rgb, score
+    if best is not None:
+        return best
+    # Monochrome cover: use a lighter or darker shade of the dominant color
+    hue, lightness, saturation = colorsys.rgb_to_hls(*(c / 255.0 for c in dominant))
+    lightness = lightness - 0.25 if lightness > 0.5 else lightness + 0.25
+    return tuple(round(c * 255) for c in colorsys.hls_to_rgb(hue, lightness, saturation))
+
+def extract_palette(data):
+    """Return {"dominant", "accent", "text", "accentText"} as hex colors, or None."""
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+    try:
+        img = Image.open(io.BytesIO(data))
+        # JPEG covers decode straight at a reduced scale
+        img.draft("RGB", (SAMPLE_SIZE, SAMPLE_SIZE))
+        img = img.convert("RGB")
+        img.thumbnail((SAMPLE_SIZE, SAMPLE_SIZE))
+        method = Image.Quantize.MEDIANCUT if hasattr(Image, "Quantize") else Image.MEDIANCUT
+        # Median cut runs over all pixels at once in C rather than per pixel in Python
+        quantized = img.quantize(colors=PALETTE_COLORS, method=method)
+        raw = quantized.getpalette()
+        counts = quantized.getcolors(PALETTE_COLORS) or []
+    except Exception:
+        return None
+    if not counts:
+        return None
+    total = float(sum(count for count, _ in counts))
+    swatches = sorted(((count / total, tuple(raw[index * 3:index * 3 + 3])) for count, index in counts),
+                      reverse=True)
+    dominant = swatches[0][1]
+    accent = _pick_accent(swatches, dominant)
+    return {
+        "dominant": _hex(dominant),
+        "accent": _hex(accent),
+        "text": _hex(text_color(dominant)),
+        "accentText": _hex(text_color(accent)),
+    }
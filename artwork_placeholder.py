@@ -0,0 +1,36 @@
+# artwork_placeholder.py
+# Builds a tiny low-quality preview of album art (LQIP) as an inline data URI. The
+# overlay paints it as soon as a track changes and cross-fades to the full cover once
+# that has loaded. Runs once per cover (the result is cached with the artwork).
+# Requires Pillow; without it no placeholder is produced.
+
+import base64
+import io
+
+# Longest side of the preview in pixels; the browser's upscaling provides the blur
+PLACEHOLDER_SIZE = 16
+PLACEHOLDER_QUALITY = 50
+# Never inline more than this many bytes of image data
+MAX_PLACEHOLDER_BYTES = 1024
+
+def make_placeholder(data):
+    """Return a "data:image/jpeg;base64,..." preview of the image bytes, or None."""
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+    try:
+        img = Image.open(io.BytesIO(data))
+        # JPEG covers decode straight at a reduced scale
+        img.draft("RGB", (PLACEHOLDER_SIZE, PLACEHOLDER_SIZE))
+        img = img.convert("RGB")
+        img.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE))
+        out = io.BytesIO()
+        # No optimize/progressive: both add bytes at this size
+        img.save(out, format="JPEG", quality=PLACEHOLDER_QUALITY)
+    except Exception:
+        return None
+    encoded = out.getvalue()
+    if len(encoded) > MAX_PLACEHOLDER_BYTES:
+        return None
+    return "data:image/jpeg;base64," + base64.b64encode(encoded).decode("ascii")
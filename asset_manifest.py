@@ -0,0 +1,80 @@
+# asset_manifest.py
+# Versioned list of the overlay's static files, precached by the service worker (sw.js).
+# The version is a hash of the files' contents, so it changes exactly when an asset does.
+
+import hashlib
+import os
+import threading
+import time
+
+# Files the overlay needs for its first paint: URL -> path relative to the app directory
+CORE_ASSETS = {
+    "/": "overlay.html",
+    "/overlay.css": "overlay.css",
+    "/overlay.js": "overlay.js",
+    "/fonts.css": "fonts.css",
+}
+# Content-hashed WOFF2 files produced by build_fonts.py
+FONT_DIST_DIR = os.path.join("assets", "fonts", "dist")
+FONT_DIST_URL = "/assets/fonts/dist/"
+
+class AssetManifest:
+    """Builds {"version", "assets"} from the static files on disk.
+
+    Files are re-stat'ed at most every `check_interval` seconds and only re-hashed
+    when a size or modification time changed.
+    """
+    def __init__(self, base_dir, check_interval=5.0):
+        self.base_dir = base_dir
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._checked = 0.0
+        self._signature = None
+        self._manifest = {"version": "", "assets": []}
+
+    def _files(self):
+        files = [(url, os.path.join(self.base_dir, rel)) for url, rel in CORE_ASSETS.items()]
+        dist = os.path.join(self.base_dir, FONT_DIST_DIR)
+        try:
+            names = sorted(n for n in os.listdir(dist) if n.endswith(".woff2"))
+        except OSError:
+            names = []
+        files.extend((FONT_DIST_URL + name, os.path.join(dist, name)) for name in names)
+        return files
+
+    def _rebuild(self, files):
+        digest = hashlib.sha256()
+        assets = []
+        for url, path in files:
+            try:
+                with open(path, "rb") as f:
+                    data = f.read()
+            except OSError:
+                continue
+            digest.update(url.encode("utf-8") + b"\0" + hashlib.sha256(data).digest())
+            assets.append(url)
+        return {"version": digest.hexdigest()[:12], "assets": assets}
+
+    def get(self):
+        """Return the current manifest, rebuilding it if a file changed."""
+        with self._lock:
+            now = time.monotonic()
+            if self._signature is not None and now - self._checked < self.check_interval:
+                return self._manifest
+            self._checked = now
+            files = self._files()
+            signature = []
+            for url, path in files:
+                try:
+                    st = os.stat(path)
+                    signature.append((url, st.st_size, st.st_mtime_ns))
+                except OSError:
+                    signature.append((url, None, None))
+            if signature != self._signature:
+                self._manifest = self._rebuild(files)
+                self._signature = signature
+            return self._manifest
+
+    @property
+    def version(self):
+        return self.get()["version"]
@@ -0,0 +1,249 @@
+# build_fonts.py
+# Builds the self-hosted font bundle used by the overlay.
+#
+#   python build_fonts.py [--download]
+#
+# 1. (--download) fetches the Google Fonts families used by the themes into
+#    assets/fonts/ as static Regular/Bold TTFs, so nothing is loaded from
+#    fonts.googleapis.com at runtime.
+# 2. Subsets every face to the glyph ranges the overlay renders and converts it
+#    to WOFF2 under assets/fonts/dist/ with a content hash in the file name.
+# 3. Writes fonts.css (the @font-face rules linked by overlay.html) and
+#    assets/fonts/dist/manifest.json.
+# 4. Families that could not be vendored keep a Google Fonts <link> (with
+#    preconnects) between the remote-fonts markers in overlay.html; the block is
+#    emptied once every family is self-hosted. A <link> loads in parallel with
+#    fonts.css, unlike an @import inside it.
+#
+# Hashed files never change, so the server can serve them with immutable caching.
+# Requires: pip install fonttools brotli
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import sys
+import urllib.request
+
+BASE_DIR = os.path.dirname(os.path.realpath(__file__))
+FONTS_DIR = os.path.join(BASE_DIR, "assets", "fonts")
+DIST_DIR = os.path.join(FONTS_DIR, "dist")
+FONTS_CSS = os.path.join(BASE_DIR, "fonts.css")
+OVERLAY_HTML = os.path.join(BASE_DIR, "overlay.html")
+REMOTE_START = "<!-- remote-fonts:start -->"
+REMOTE_END = "<!-- remote-fonts:end -->"
+MANIFEST = os.path.join(DIST_DIR, "manifest.json")
+URL_PREFIX = "/assets/fonts/dist/"
+SRC_SEPARATOR = ",\n         "
+
+GOOGLE_FONTS_RAW = "https://github.com/google/fonts/raw/main/ofl/"
+
+# Google Fonts families: family -> (source path in google/fonts, is variable)
+GOOGLE_SOURCES = {
+    "Comfortaa": ("comfortaa/Comfortaa[wght].ttf", True),
+    "Inter": ("inter/Inter[opsz,wght].ttf", True),
+    "Quicksand": ("quicksand/Quicksand[wght].ttf", True),
+    "Rubik": ("rubik/Rubik[wght].ttf", True),
+    "Poppins": ("poppins/Poppins-{style}.ttf", False),
+}
+
+# (family, weight, style, source files in assets/fonts). Extra files are CSS src fallbacks.
+FACES = [
+    ("Comfortaa", "400", "normal", ["Comfortaa-Regular.ttf"]),
+    ("Comfortaa", "700", "normal", ["Comfortaa-Bold.ttf"]),
+    ("Inter", "400", "normal", ["Inter-Regular.ttf"]),
+    ("Inter", "700", "normal", ["Inter-Bold.ttf"]),
+    ("Poppins", "400", "normal", ["Poppins-Regular.ttf"]),
+    ("Poppins", "700", "normal", ["Poppins-Bold.ttf"]),
+    ("Quicksand", "400", "normal", ["Quicksand-Regular.ttf"]),
+    ("Quicksand", "700", "normal", ["Quicksand-Bold.ttf"]),
+    ("Rubik", "400", "normal", ["Rubik-Regular.ttf"]),
+    ("Rubik", "700", "normal", ["Rubik-Bold.ttf"]),
+    ("Retro Gaming", "normal", "normal", ["PressStart2P-Regular.ttf", "Retro-Gaming.ttf"]),
+    ("Atkinson Hyperlegible", "normal", "normal", ["AtkinsonHyperlegible-Regular.ttf"]),
+    ("Atkinson Hyperlegible", "bold", "normal", ["AtkinsonHyperlegible-Bold.ttf"]),
+    ("JetBrains Mono", "100 900", "normal", ["JetBrainsMono[wght].ttf"]),
+    ("JetBrains Mono", "100 900", "italic", ["JetBrainsMono-Italic[wght].ttf"]),
+]
+
+# Glyphs the overlay can render: Latin, Latin-1, Latin Extended-A/B, combining marks,
+# Greek, Cyrillic, general punctuation (• … – —), currency, ™ and ♪.
+# Characters outside these ranges fall back to system fonts in the browser.
+UNICODE_RANGES = [
+    (0x0020, 0x007E), (0x00A0, 0x024F), (0x0259, 0x0259), (0x02BB, 0x02BC), (0x02C6, 0x02C7),
+    (0x02D8, 0x02DD), (0x0300, 0x036F), (0x0370, 0x03FF), (0x0400, 0x04FF), (0x1E00, 0x1EFF),
+    (0x2000, 0x206F), (0x20A0, 0x20CF), (0x2100, 0x2122), (0x2190, 0x2193), (0x2212, 0x2215),
+    (0x25CF, 0x25CF), (0x266A, 0x266B), (0xFEFF, 0xFEFF), (0xFFFD, 0xFFFD),
+]
+
+def _unicodes():
+    codes = []
+    for start, end in UNICODE_RANGES:
+        codes.extend(range(start, end + 1))
+    return codes
+
+def _css_unicode_range(codepoints):
+    """Compact CSS unicode-range from the codepoints a subset actually contains."""
+    ranges = []
+    for cp in sorted(codepoints):
+        if ranges and cp == ranges[-1][1] + 1:
+            ranges[-1][1] = cp
+        else:
+            ranges.append([cp, cp])
+    return ", ".join(f"U+{a:04X}" if a == b else f"U+{a:04X}-{b:04X}" for a, b in ranges)
+
+def _fetch(url):
+    print(f"Downloading {url}")
+    with urllib.request.urlopen(url, timeout=60) as resp:
+        return resp.read()
+
+def download_google_fonts():
+    """Fetch the Google Fonts families as static Regular/Bold TTFs into assets/fonts/."""
+    for family, (source, variable) in GOOGLE_SOURCES.items():
+        stem = family.replace(" ", "")
+        targets = {"Regular": 400, "Bold": 700}
+        missing = [style for style in targets if not os.path.exists(os.path.join(FONTS_DIR, f"{stem}-{style}.ttf"))]
+        if not missing:
+            continue
+        try:
+            _download_family(family, source, variable, stem, targets, missing)
+        except OSError as e:
+            print(f"Could not download {family}: {e}")
+
+def _download_family(family, source, variable, stem, targets, missing):
+    from fontTools.ttLib import TTFont
+    from fontTools.varLib.instancer import instantiateVariableFont
+
+    if variable:
+        data = _fetch(GOOGLE_FONTS_RAW + source)
+        for style in missing:
+            font = TTFont(io.BytesIO(data))
+            axes = {axis.axisTag: axis.defaultValue for axis in font["fvar"].axes}
+            axes["wght"] = targets[style]
+            # Pin every axis to get a plain static face
+            static = instantiateVariableFont(font, axes, updateFontNames=True)
+            static.save(os.path.join(FONTS_DIR, f"{stem}-{style}.ttf"))
+    else:
+        for style in missing:
+            data = _fetch(GOOGLE_FONTS_RAW + source.format(style=style))
+            with open(os.path.join(FONTS_DIR, f"{stem}-{style}.ttf"), "wb") as f:
+                f.write(data)
+
+def build_woff2(src_path):
+    """Subset a TTF and return (woff2 bytes, set of codepoints kept)."""
+    from fontTools import subset
+    from fontTools.ttLib import TTFont
+
+    options = subset.Options()
+    options.flavor = "woff2"
+    options.layout_features = ["*"]
+    options.name_IDs = ["*"]
+    options.notdef_outline = True
+    options.hinting = False
+    options.desubroutinize = True
+    # Keep the source timestamp so identical input yields identical bytes (and hash)
+    font = TTFont(src_path, recalcTimestamp=False)
+    subsetter = subset.Subsetter(options)
+    subsetter.populate(unicodes=_unicodes())
+    subsetter.subset(font)
+    kept = set(font.getBestCmap() or {})
+    buf = io.BytesIO()
+    font.flavor = "woff2"
+    font.save(buf)
+    return buf.getvalue(), kept
+
+def build():
+    os.makedirs(DIST_DIR, exist_ok=True)
+    manifest = {"files": {}}
+    rules = []
+    produced = set()
+    remote = []
+    for family, weight, style, sources in FACES:
+        srcs = []
+        coverage = set()
+        for name in sources:
+            path = os.path.join(FONTS_DIR, name)
+            if not os.path.exists(path):
+                print(f"Skipping missing font source: {name} (run with --download)")
+                continue
+            data, kept = build_woff2(path)
+            digest = hashlib.sha256(data).hexdigest()[:10]
+            stem = os.path.splitext(name)[0].replace("[", "-").replace("]", "").replace(",", "-")
+            out_name = f"{stem}.{digest}.woff2"
+            with open(os.path.join(DIST_DIR, out_name), "wb") as f:
+                f.write(data)
+            produced.add(out_name)
+            manifest["files"][name] = out_name
+            coverage |= kept
+            fmt = "woff2-variations" if "[wght]" in name else "woff2"
+            srcs.append(f"url('{URL_PREFIX}{out_name}') format('{fmt}')")
+            print(f"{name}: {os.path.getsize(path)} -> {len(data)} bytes")
+        if not srcs:
+            if family in GOOGLE_SOURCES and family not in remote:
+                remote.append(family)
+            continue
+        rules.append(
+            "@font-face {\n"
+            f"    font-family: '{family}';\n"
+            f"    src: {SRC_SEPARATOR.join(srcs)};\n"
+            f"    font-weight: {weight};\n"
+            f"    font-style: {style};\n"
+            "    font-display: swap;\n"
+            f"    unicode-range: {_css_unicode_range(coverage)};\n"
+            "}\n"
+        )
+
+    # Remove outputs from previous builds
+    for old in os.listdir(DIST_DIR):
+        if old.endswith(".woff2") and old not in produced:
+            os.remove(os.path.join(DIST_DIR, old))
+
+    header = "/* Generated by build_fonts.py - do not edit by hand. */\n\n"
+    write_remote_links(remote)
+    css = header + "\n".join(rules)
+    with open(FONTS_CSS, "w", encoding="utf-8", newline="\n") as f:
+        f.write(css)
+    manifest["css"] = "fonts.css"
+    manifest["remote"] = remote
+    manifest["version"] = hashlib.sha256(css.encode()).hexdigest()[:10]
+    with open(MANIFEST, "w", encoding="utf-8", newline="\n") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+        f.write("\n")
+    print(f"Wrote {FONTS_CSS} and {MANIFEST}")
+
+def write_remote_links(remote):
+    """Point overlay.html at Google Fonts for the families in `remote` (none: remove the links)."""
+    with open(OVERLAY_HTML, "r", encoding="utf-8") as f:
+        page = f.read()
+    start = page.find(REMOTE_START)
+    end = page.find(REMOTE_END)
+    if start < 0 or end < start:
+        print(f"overlay.html has no {REMOTE_START} block; not updating Google Fonts links")
+        return
+    block = ""
+    if remote:
+        # Families not vendored yet still come from Google Fonts until `--download` succeeds
+        query = "&".join(f"family={f.replace(' ', '+')}:wght@400;700" for f in remote)
+        block = (
+            "\n    <link rel=\"preconnect\" href=\"https://fonts.googleapis.com\">\n"
+            "    <link rel=\"preconnect\" href=\"https://fonts.gstatic.com\" crossorigin>\n"
+            f"    <link href=\"https://fonts.googleapis.com/css2?{query}&display=swap\" rel=\"stylesheet\">\n    "
+        )
+        print(f"Not vendored (using Google Fonts links): {', '.join(remote)}")
+    updated = page[:start + len(REMOTE_START)] + block + page[end:]
+    if updated != page:
+        with open(OVERLAY_HTML, "w", encoding="utf-8", newline="\n") as f:
+            f.write(updated)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the self-hosted Jam Deck font bundle")
+    parser.add_argument("--download", action="store_true", help="Fetch missing Google Fonts sources first")
+    args = parser.parse_args()
+    try:
+        if args.download:
+            download_google_fonts()
+        build()
+    except ImportError as e:
+        print(f"Missing build dependency ({e}). Install with: pip install fonttools brotli")
+        sys.exit(1)
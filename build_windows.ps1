@@ -15,6 +15,11 @@ pip install pyinstaller pystray pillow pyperclip pyzmq modulegraph win10toast wi
 # Optional: winrt installation may require separate steps
 Write-Host "Note: If you plan to use SMTC via winrt, install pywinrt with 'pip install pywinrt' and follow its installation instructions."
 
+# Build the self-hosted font bundle (downloads the Google Fonts families once, subsets to WOFF2)
+Write-Host "Building font bundle..."
+pip install fonttools brotli
+python .\build_fonts.py --download
+
 # Run collect_zmq if present to prepare native libs
 if (Test-Path ".\collect_zmq.py") {
   Write-Host "Running collect_zmq.py to gather ZMQ binaries..."
@@ -29,6 +34,8 @@ $dataArgs = @(
   "--add-data", "overlay.html;.",
   "--add-data", "overlay.css;.",
   "--add-data", "overlay.js;.",
+  "--add-data", "sw.js;.",
+  "--add-data", "fonts.css;.",
   "--add-data", "assets;assets"
 )
 
@@ -83,6 +90,8 @@ Copy-Item ".\assets" (Join-Path $staging "assets") -Recurse -Force
 Copy-Item "overlay.html" $staging -ErrorAction SilentlyContinue
 Copy-Item "overlay.css" $staging -ErrorAction SilentlyContinue
 Copy-Item "overlay.js" $staging -ErrorAction SilentlyContinue
+Copy-Item "sw.js" $staging -ErrorAction SilentlyContinue
+Copy-Item "fonts.css" $staging -ErrorAction SilentlyContinue
 
 Write-Host "Staging completed at $staging"
 
@@ -0,0 +1,162 @@
+# control_channel.py
+# Typed status events from the music server to the tray app over a local ZMQ PUSH/PULL
+# pair, instead of the tray reading and parsing the server's stdout line by line.
+#
+# The tray binds a PULL socket on a random loopback port and starts the server with
+# --control <endpoint>; the server connects a PUSH socket to it. Each message is one
+# JSON object with an "event" field:
+#
+#   port      {"port"}                            HTTP port the server bound
+#   ready     {"port"}                            startup finished, overlays can connect
+#   status    {"degraded", "clients"}             degraded: reason string or None;
+#                                                 clients: overlays seen recently
+#   track     {"playing", "title", "artist", "album", "appId"}
+#   stopping  {}                                  clean shutdown started
+#
+# Sends never block: if the tray stops reading, events are dropped at the high-water mark.
+
+import json
+import queue
+import threading
+import time
+
+import zmq
+
+CONTROL_HWM = 100
+# Seconds between checks of the status callback (only changes are sent)
+STATUS_INTERVAL = 2.0
+
+EVENT_PORT = "port"
+EVENT_READY = "ready"
+EVENT_STATUS = "status"
+EVENT_TRACK = "track"
+EVENT_STOPPING = "stopping"
+
+TRACK_FIELDS = ("playing", "title", "artist", "album", "appId")
+
+def track_summary(payload):
+    """The track fields shown by the tray, taken from a now-playing payload."""
+    payload = payload or {}
+    track = {key: payload.get(key) for key in TRACK_FIELDS}
+    track["playing"] = bool(track["playing"])
+    return track
+
+class ControlPublisher(threading.Thread):
+    """Server side: sends events to the tray's endpoint from its own thread.
+
+    get_status() returns {"degraded", "clients"}; it is polled every STATUS_INTERVAL
+    seconds and sent when it changed. Register track() as a state listener.
+    """
+    def __init__(self, context, endpoint, get_status=None, interval=STATUS_INTERVAL):
+        super().__init__(name="jamdeck-control", daemon=True)
+        self.context = context
+        self.endpoint = endpoint
+        self.get_status = get_status
+        self.interval = interval
+        self._queue = queue.Queue(maxsize=64)
+        self._last_track = None
+        self._last_status = None
+
+    def send(self, event, **fields):
+        """Queue one event; safe to call from any thread."""
+        fields["event"] = event
+        try:
+            self._queue.put_nowait(fields)
+        except queue.Full:
+            pass
+
+    def track(self, version, payload):
+        """State listener: send the track when its displayed fields changed."""
+        track = track_summary(payload)
+        if track != self._last_track:
+            self._last_track = track
+            self.send(EVENT_TRACK, **track)
+
+    def stop(self):
+        """Send a final stopping event and let the thread flush and exit."""
+        self.send(EVENT_STOPPING)
+        try:
+            self._queue.put(None, timeout=1.0)
+        except queue.Full:
+            pass
+
+    def _check_status(self, sock):
+        if self.get_status is None:
+            return
+        try:
+            status = self.get_status()
+        except Exception as e:
+            print(f"Control status error: {e}")
+            return
+        if status != self._last_status:
+            self._last_status = status
+            self._send(sock, dict(status, event=EVENT_STATUS))
+
+    def _send(self, sock, message):
+        try:
+            sock.send(json.dumps(message).encode("utf-8"), flags=zmq.NOBLOCK)
+        except zmq.Again:
+            pass
+
+    def run(self):
+        try:
+            sock = self.context.socket(zmq.PUSH)
+            sock.setsockopt(zmq.SNDHWM, CONTROL_HWM)
+            # Give the stopping event a moment to leave on shutdown, but never hang exit
+            sock.setsockopt(zmq.LINGER, 500)
+            sock.connect(self.endpoint)
+        except Exception as e:
+            print(f"Control channel failed to connect to {self.endpoint}: {e}")
+            return
+        next_status = time.monotonic() + self.interval
+        try:
+            while True:
+                try:
+                    message = self._queue.get(timeout=max(0.0, next_status - time.monotonic()))
+                except queue.Empty:
+                    message = False
+                if message is None:
+                    break
+                if message:
+                    self._send(sock, message)
+                if time.monotonic() >= next_status:
+                    self._check_status(sock)
+                    next_status = time.monotonic() + self.interval
+        finally:
+            sock.close()
+
+class ControlListener(threading.Thread):
+    """Tray side: binds a loopback PULL socket and calls on_event(dict) for every event."""
+    def __init__(self, on_event, context=None):
+        super().__init__(name="jamdeck-control-listener", daemon=True)
+        self.on_event = on_event
+        self.context = context or zmq.Context.instance()
+        self._stop_event = threading.Event()
+        self._sock = self.context.socket(zmq.PULL)
+        self._sock.setsockopt(zmq.LINGER, 0)
+        port = self._sock.bind_to_random_port("tcp://127.0.0.1")
+        self.endpoint = f"tcp://127.0.0.1:{port}"
+
+    def stop(self):
+        self._stop_event.set()
+        if not self.is_alive() and self._sock is not None and self.ident is None:
+            # Never started: nothing else will close the socket
+            self._sock.close()
+
+    def run(self):
+        try:
+            while not self._stop_event.is_set():
+                # Blocks in ZMQ (no Python wakeups) until an event arrives or the timeout passes
+                if not self._sock.poll(500):
+                    continue
+                try:
+                    event = json.loads(self._sock.recv(zmq.NOBLOCK).decode("utf-8"))
+                except (zmq.Again, ValueError):
+                    continue
+                if isinstance(event, dict):
+                    try:
+                        self.on_event(event)
+                    except Exception as e:
+                        print(f"Control event handler failed: {e}")
+        finally:
+            self._sock.close()
@@ -0,0 +1,150 @@
+# file_output.py
+# Writes the current track to plain files for OBS "Read from file" Text sources
+# and Image sources. Files are replaced atomically and only when their content
+# changes; bursts of updates (rapid track skips) are coalesced into one write.
+
+import os
+import threading
+import time
+
+# Files written to the export directory
+TITLE_FILE = "title.txt"
+ARTIST_FILE = "artist.txt"
+ALBUM_FILE = "album.txt"
+COMBINED_FILE = "nowplaying.txt"
+ARTWORK_FILE = "artwork.jpg"
+
+def _combined_line(payload):
+    """'Artist - Title', the common now-playing.txt convention."""
+    title = payload.get("title") or ""
+    artist = payload.get("artist") or ""
+    if title and artist:
+        return f"{artist} - {title}"
+    return title or artist
+
+def atomic_write(path, data, retries=5):
+    """Write bytes to a temp file next to path, then rename over it."""
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    for attempt in range(retries):
+        try:
+            os.replace(tmp, path)
+            return
+        except PermissionError:
+            # On Windows the reader (OBS) may hold the target open for a moment
+            if attempt == retries - 1:
+                break
+            time.sleep(0.05 * (attempt + 1))
+    try:
+        os.remove(tmp)
+    except OSError:
+        pass
+    raise PermissionError(f"Could not replace {path}")
+
+class FileExportSink(threading.Thread):
+    """Mirrors the published state into text/image files in an output directory.
+
+    Register update() as a state listener. A write happens once updates have been
+    quiet for `coalesce` seconds (or after `max_delay` at the latest), and each
+    file is only touched when its bytes differ from what is already there.
+    """
+    def __init__(self, output_dir, get_artwork=None, coalesce=0.75, max_delay=3.0):
+        super().__init__(name="jamdeck-file-export", daemon=True)
+        self.output_dir = output_dir
+        self.get_artwork = get_artwork
+        self.coalesce = coalesce
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+        self._latest = None
+        self._first_pending = None
+        self._last_update = 0.0
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        # path -> bytes last known to be on disk (or None for "absent")
+        self._written = {}
+        self._artwork_digest = None
+
+    def update(self, version, payload):
+        """State listener: remember the latest payload and schedule a write."""
+        now = time.monotonic()
+        with self._lock:
+            self._latest = payload
+            self._last_update = now
+            if self._first_pending is None:
+                self._first_pending = now
+        self._wake.set()
+
+    def stop(self):
+        self._stop_event.set()
+        self._wake.set()
+
+    def _write_if_changed(self, name, data):
+        path = os.path.join(self.output_dir, name)
+        if name not in self._written:
+            try:
+                with open(path, "rb") as f:
+                    self._written[name] = f.read()
+            except OSError:
+                self._written[name] = None
+        if self._written[name] == data:
+            return
+        if data is None:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        else:
+            atomic_write(path, data)
+        self._written[name] = data
+
+    def _export(self, payload):
+        payload = payload or {}
+        playing = bool(payload.get("playing"))
+        texts = {
+            TITLE_FILE: payload.get("title") or "",
+            ARTIST_FILE: payload.get("artist") or "",
+            ALBUM_FILE: payload.get("album") or "",
+            COMBINED_FILE: _combined_line(payload),
+        }
+        for name, text in texts.items():
+            self._write_if_changed(name, (text if playing else "").encode("utf-8"))
+
+        digest = payload.get("artworkHash") if playing else None
+        if digest != self._artwork_digest or ARTWORK_FILE not in self._written:
+            data = self.get_artwork(digest) if (digest and self.get_artwork) else None
+            self._write_if_changed(ARTWORK_FILE, data)
+            self._artwork_digest = digest
+
+    def _due(self):
+        """Return (True, payload) when a write is due, else (False, seconds to wait or None)."""
+        with self._lock:
+            if self._first_pending is None:
+                return False, None
+            now = time.monotonic()
+            # Debounce: wait until updates go quiet, bounded by max_delay
+            deadline = min(self._last_update + self.coalesce, self._first_pending + self.max_delay)
+            if now < deadline:
+                return False, deadline - now
+            self._first_pending = None
+            return True, self._latest
+
+    def run(self):
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+        except Exception as e:
+            print(f"File export disabled, cannot create {self.output_dir}: {e}")
+            return
+        print(f"Exporting now-playing files to {self.output_dir}")
+        while not self._stop_event.is_set():
+            due, value = self._due()
+            if not due:
+                self._wake.wait(value)
+                self._wake.clear()
+                continue
+            try:
+                self._export(value)
+            except Exception as e:
+                print(f"File export error: {e}")
@@ -0,0 +1,145 @@
+# instance_registry.py
+# Finds the running Jam Deck server so launches attach to it instead of starting another.
+#
+# The server holds an exclusive OS lock on jamdeck_instance.lock in the runtime dir for
+# its whole life, and once it is serving it writes jamdeck_instance.json (pid, port,
+# version, boot id, health URL). Because the OS drops the lock when a process dies,
+# a registry file whose lock can be taken is stale and is removed. An entry only
+# counts as running when its /health endpoint answers with the same pid.
+
+import json
+import os
+import time
+import urllib.request
+
+from file_output import atomic_write
+
+REGISTRY_FILE = "jamdeck_instance.json"
+LOCK_FILE = "jamdeck_instance.lock"
+HEALTH_PATH = "/health"
+HEALTH_TIMEOUT = 1.0
+# Process exit code of a server that found another instance already running
+EXIT_ALREADY_RUNNING = 3
+
+class InstanceLock:
+    """Exclusive, non-blocking lock on a file, released by the OS if the process dies."""
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    @property
+    def held(self):
+        return self._file is not None
+
+    def acquire(self):
+        """Try to take the lock. Returns True on success, False if another process holds it."""
+        if self._file is not None:
+            return True
+        f = open(self.path, "a+b")
+        try:
+            f.seek(0)
+            if os.name == "nt":
+                import msvcrt
+                msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            return False
+        self._file = f
+        return True
+
+    def release(self):
+        f, self._file = self._file, None
+        if f is None:
+            return
+        try:
+            f.seek(0)
+            if os.name == "nt":
+                import msvcrt
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+        except OSError:
+            pass
+        finally:
+            f.close()
+
+def health_url(port):
+    return f"http://127.0.0.1:{port}{HEALTH_PATH}"
+
+def read_registry(runtime_dir):
+    """The registry entry as a dict, or None if missing or unreadable."""
+    try:
+        with open(os.path.join(runtime_dir, REGISTRY_FILE), "r", encoding="utf-8") as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return entry if isinstance(entry, dict) else None
+
+def write_registry(runtime_dir, port, version, boot_id):
+    entry = {
+        "pid": os.getpid(),
+        "port": port,
+        "version": version,
+        "boot": boot_id,
+        "health": health_url(port),
+        "started": round(time.time(), 3),
+    }
+    atomic_write(os.path.join(runtime_dir, REGISTRY_FILE), json.dumps(entry, indent=2).encode("utf-8"))
+    return entry
+
+def remove_registry(runtime_dir, pid=None):
+    """Delete the registry file (only if it belongs to pid, when given)."""
+    path = os.path.join(runtime_dir, REGISTRY_FILE)
+    if pid is not None:
+        entry = read_registry(runtime_dir)
+        if entry is not None and entry.get("pid") != pid:
+            return
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+def check_health(entry, timeout=HEALTH_TIMEOUT):
+    """GET the entry's health URL. Returns the health document if it is that same process, else None."""
+    url = entry.get("health") or health_url(entry.get("port"))
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            health = json.loads(response.read().decode("utf-8"))
+    except Exception:
+        return None
+    if not isinstance(health, dict) or health.get("app") != "jamdeck" or health.get("pid") != entry.get("pid"):
+        return None
+    return health
+
+def _lock_is_free(runtime_dir):
+    probe = InstanceLock(os.path.join(runtime_dir, LOCK_FILE))
+    if probe.acquire():
+        probe.release()
+        return True
+    return False
+
+def find_running_instance(runtime_dir, wait=0.0, timeout=HEALTH_TIMEOUT):
+    """Return the registry entry (with its "healthDoc") of a healthy running server, or None.
+
+    Stale entries are removed. With wait > 0, an instance that holds the lock but is not
+    answering yet (e.g. still starting) is retried for up to `wait` seconds.
+    """
+    deadline = time.monotonic() + wait
+    while True:
+        entry = read_registry(runtime_dir)
+        if entry is not None:
+            health = check_health(entry, timeout)
+            if health is not None:
+                return dict(entry, healthDoc=health)
+        if _lock_is_free(runtime_dir):
+            # Nobody is running: whatever the file says is left over from a crash
+            if entry is not None:
+                remove_registry(runtime_dir, pid=entry.get("pid"))
+            return None
+        if time.monotonic() >= deadline:
+            return None
+        time.sleep(0.25)
@@ -0,0 +1,318 @@
+# listening_stats.py
+# Listening statistics ("most played this stream / this week") in a local SQLite
+# database, fed by track transitions from the published now-playing state.
+#
+# A play ends when the selected track changes, playback stops, or the playback clock
+# wraps from the end of the track back to its start (repeat-one publishes no change).
+# Its listened time (seconds spent with status "playing") is added to running counters
+# for the track, its artist and the player app: all-time, per hour, and per rolling
+# window; it counts as a play once MIN_PLAY_SECONDS were listened. Top-N queries read
+# those counters through indexes instead of scanning a history. A rolling window's
+# counters are lowered by the hourly rows that leave it as its start moves, so they
+# cost one pass over an expiring hour, not over the window. The "stream" window (this
+# server run) is kept in memory. Results are cached until the next recorded play, or
+# the next hour for the rolling windows, so query cost stays flat as history grows.
+
+import queue
+import sqlite3
+import threading
+import time
+
+STATS_FILE = "jamdeck_stats.sqlite3"
+# A track counts as played after this much listening (shorter listens still add time)
+MIN_PLAY_SECONDS = 30.0
+STATS_KINDS = ("track", "artist", "app")
+STATS_ORDERS = ("plays", "time")
+# Rolling windows in seconds; "stream" is this server run, "all" has no start
+WINDOW_SECONDS = {"day": 86400, "week": 7 * 86400, "month": 30 * 86400}
+STATS_WINDOWS = ("stream",) + tuple(WINDOW_SECONDS) + ("all",)
+MAX_TOP = 100
+MAX_CACHED = 256
+# Seconds between playback clock checks for a track that started over
+WRAP_CHECK_SECONDS = 2.0
+# Slack (seconds) for the clock when telling a wrap at the track's end from a seek back
+WRAP_MARGIN = 2.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    name TEXT NOT NULL,
+    artist TEXT NOT NULL DEFAULT '',
+    album TEXT NOT NULL DEFAULT '',
+    UNIQUE (kind, name, artist, album)
+);
+CREATE TABLE IF NOT EXISTS totals (
+    item INTEGER PRIMARY KEY REFERENCES items (id),
+    kind TEXT NOT NULL,
+    plays INTEGER NOT NULL,
+    seconds REAL NOT NULL,
+    last_played REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS totals_by_plays ON totals (kind, plays DESC, seconds DESC);
+CREATE INDEX IF NOT EXISTS totals_by_time ON totals (kind, seconds DESC);
+CREATE TABLE IF NOT EXISTS hourly (
+    hour INTEGER NOT NULL,
+    item INTEGER NOT NULL REFERENCES items (id),
+    kind TEXT NOT NULL,
+    plays INTEGER NOT NULL,
+    seconds REAL NOT NULL,
+    PRIMARY KEY (hour, item)
+);
+CREATE INDEX IF NOT EXISTS hourly_by_kind ON hourly (kind, hour);
+CREATE TABLE IF NOT EXISTS window_totals (
+    span TEXT NOT NULL,
+    item INTEGER NOT NULL REFERENCES items (id),
+    kind TEXT NOT NULL,
+    plays INTEGER NOT NULL,
+    seconds REAL NOT NULL,
+    PRIMARY KEY (span, item)
+);
+CREATE INDEX IF NOT EXISTS window_by_plays ON window_totals (span, kind, plays DESC, seconds DESC);
+CREATE INDEX IF NOT EXISTS window_by_time ON window_totals (span, kind, seconds DESC);
+CREATE TABLE IF NOT EXISTS window_starts (
+    span TEXT PRIMARY KEY,
+    first_hour INTEGER NOT NULL
+);
+"""
+
+def _track_key(payload):
+    """(title, artist, album, appId) of a payload that is showing a track, else None."""
+    if not payload or not payload.get("playing") or payload.get("error"):
+        return None
+    title = payload.get("title") or ""
+    if not title:
+        return None
+    return title, payload.get("artist") or "", payload.get("album") or "", payload.get("appId") or ""
+
+def _play_items(key):
+    """(kind, name, artist, album) counters a play of the track `key` adds to."""
+    title, artist, album, app_id = key
+    items = [("track", title, artist, album)]
+    if artist:
+        items.append(("artist", artist, "", ""))
+    if app_id:
+        items.append(("app", app_id, "", ""))
+    return items
+
+def _public_item(kind, name, artist, album, plays, seconds):
+    if kind == "track":
+        item = {"title": name, "artist": artist, "album": album}
+    elif kind == "artist":
+        item = {"artist": name}
+    else:
+        item = {"appId": name}
+    item["plays"] = plays
+    item["seconds"] = round(seconds, 1)
+    return item
+
+class ListeningStats(threading.Thread):
+    """Records plays from state changes and answers top-N queries.
+
+    Register update() as a state listener; plays are written from this thread. top()
+    may be called from any thread. get_clock() returns {"position", "duration", "playing"}
+    of the published track (or None), and is used to notice a track that started over.
+    """
+    def __init__(self, path, min_play=MIN_PLAY_SECONDS, get_clock=None):
+        super().__init__(name="jamdeck-stats", daemon=True)
+        self.path = path
+        self.min_play = min_play
+        self.get_clock = get_clock
+        self.started_at = time.time()
+        self.generation = 0
+        self._lock = threading.Lock()
+        self._events = queue.Queue(maxsize=256)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+        self._current = None
+        self._stream = {kind: {} for kind in STATS_KINDS}
+        self._cache = {}
+
+    def update(self, version, payload):
+        """State listener: queue the change with the time it was seen."""
+        try:
+            self._events.put_nowait((time.time(), payload))
+        except queue.Full:
+            pass
+
+    def stop(self):
+        try:
+            self._events.put(None, timeout=1.0)
+        except queue.Full:
+            pass
+
+    def run(self):
+        try:
+            while True:
+                try:
+                    event = self._events.get(timeout=WRAP_CHECK_SECONDS)
+                except queue.Empty:
+                    event = ()
+                if event is None:
+                    break
+                try:
+                    if event:
+                        self._observe(*event)
+                    self._check_wrap(time.time())
+                except Exception as e:
+                    print(f"Listening stats error: {e}")
+        finally:
+            # Count the track that is playing at shutdown up to now
+            try:
+                self._observe(time.time(), None)
+            except Exception as e:
+                print(f"Listening stats error: {e}")
+            with self._lock:
+                self._db.close()
+
+    def _observe(self, at, payload):
+        if payload and payload.get("stale"):
+            # Replayed from the warm-state file, not something that was just heard
+            return
+        key = _track_key(payload)
+        playing = key is not None and str(payload.get("status") or "").lower() == "playing"
+        current = self._current
+        if current is not None:
+            if current["playing"]:
+                current["seconds"] += max(0.0, at - current["since"])
+            current["since"] = at
+            if current["key"] == key:
+                current["playing"] = playing
+                return
+            self._record(current["key"], current["seconds"], at)
+        self._current = {"key": key, "playing": playing, "since": at, "seconds": 0.0, "clock": None} if key else None
+
+    def _check_wrap(self, at):
+        """End the current play and start another when the clock went from the track's end back to its start."""
+        current = self._current
+        clock = self.get_clock() if self.get_clock else None
+        if current is None or not clock or clock.get("position") is None:
+            return
+        position, duration = clock["position"], clock.get("duration")
+        last, current["clock"] = current["clock"], (position, at)
+        if last is None or not duration or position >= last[0]:
+            return
+        elapsed = at - last[1]
+        # The end was reachable since the last reading, and the new position is no later
+        # than that time allows; a seek back from the middle of the track is neither
+        if last[0] + elapsed + WRAP_MARGIN < duration or position > elapsed + WRAP_MARGIN:
+            return
+        listened = at - current["since"] if current["playing"] else 0.0
+        into_new = min(listened, position)
+        self._record(current["key"], current["seconds"] + listened - into_new, at)
+        self._current = dict(current, since=at, seconds=into_new, clock=(position, at))
+
+    def _item_id(self, kind, name, artist, album):
+        row = self._db.execute("SELECT id FROM items WHERE kind = ? AND name = ? AND artist = ? AND album = ?",
+                               (kind, name, artist, album)).fetchone()
+        if row is not None:
+            return row[0]
+        return self._db.execute("INSERT INTO items (kind, name, artist, album) VALUES (?, ?, ?, ?)",
+                                (kind, name, artist, album)).lastrowid
+
+    def _record(self, key, seconds, at):
+        """Add one finished play of track `key` to every counter."""
+        if seconds <= 0:
+            return
+        plays = 1 if seconds >= self.min_play else 0
+        hour = int(at // 3600)
+        with self._lock:
+            with self._db:
+                for kind, name, artist, album in _play_items(key):
+                    item = self._item_id(kind, name, artist, album)
+                    self._db.execute(
+                        "INSERT INTO totals (item, kind, plays, seconds, last_played) VALUES (?, ?, ?, ?, ?) "
+                        "ON CONFLICT (item) DO UPDATE SET plays = plays + excluded.plays, "
+                        "seconds = seconds + excluded.seconds, last_played = excluded.last_played",
+                        (item, kind, plays, seconds, at))
+                    self._db.execute(
+                        "INSERT INTO hourly (hour, item, kind, plays, seconds) VALUES (?, ?, ?, ?, ?) "
+                        "ON CONFLICT (hour, item) DO UPDATE SET plays = plays + excluded.plays, "
+                        "seconds = seconds + excluded.seconds",
+                        (hour, item, kind, plays, seconds))
+                    for span in WINDOW_SECONDS:
+                        self._db.execute(
+                            "INSERT INTO window_totals (span, item, kind, plays, seconds) VALUES (?, ?, ?, ?, ?) "
+                            "ON CONFLICT (span, item) DO UPDATE SET plays = plays + excluded.plays, "
+                            "seconds = seconds + excluded.seconds",
+                            (span, item, kind, plays, seconds))
+                    counters = self._stream[kind].setdefault((name, artist, album), [0, 0.0])
+                    counters[0] += plays
+                    counters[1] += seconds
+            self.generation += 1
+            self._cache.clear()
+
+    def _advance_window(self, window, first_hour):
+        """Make window_totals for `window` cover the hourly rows from first_hour on. Caller holds the lock."""
+        row = self._db.execute("SELECT first_hour FROM window_starts WHERE span = ?", (window,)).fetchone()
+        stored = row[0] if row is not None else None
+        if stored == first_hour:
+            return
+        with self._db:
+            if stored is None or stored > first_hour or first_hour - stored >= WINDOW_SECONDS[window] // 3600:
+                # New database or a long gap: rebuilding reads no more than the window itself
+                self._db.execute("DELETE FROM window_totals WHERE span = ?", (window,))
+                self._db.execute(
+                    "INSERT INTO window_totals (span, item, kind, plays, seconds) "
+                    "SELECT ?, item, kind, SUM(plays), SUM(seconds) FROM hourly WHERE hour >= ? GROUP BY item",
+                    (window, first_hour))
+            else:
+                # Take out only the hours that left the window
+                self._db.execute(
+                    "INSERT INTO window_totals (span, item, kind, plays, seconds) "
+                    "SELECT ?, item, kind, -SUM(plays), -SUM(seconds) FROM hourly WHERE hour >= ? AND hour < ? "
+                    "GROUP BY item ON CONFLICT (span, item) DO UPDATE SET plays = plays + excluded.plays, "
+                    "seconds = seconds + excluded.seconds",
+                    (window, stored, first_hour))
+                self._db.execute("DELETE FROM window_totals WHERE span = ? AND plays <= 0 AND seconds < 0.05",
+                                 (window,))
+            self._db.execute("INSERT OR REPLACE INTO window_starts (span, first_hour) VALUES (?, ?)",
+                             (window, first_hour))
+
+    def top(self, kind="track", window="stream", order="plays", limit=10):
+        """Top `limit` tracks, artists or apps in a window, as a JSON-ready dict."""
+        now = time.time()
+        span = WINDOW_SECONDS.get(window)
+        # Rolling windows move by the hour, so the hour is part of the cache key
+        first_hour = int((now - span) // 3600) if span else None
+        cache_key = (kind, window, order, limit, first_hour)
+        with self._lock:
+            cached = self._cache.get(cache_key)
+            if cached is not None:
+                return cached
+            if window == "stream":
+                rows = [(name, artist, album, plays, seconds)
+                        for (name, artist, album), (plays, seconds) in self._stream[kind].items()
+                        if plays or order == "time"]
+                rank = (lambda row: (row[3], row[4])) if order == "plays" else (lambda row: row[4])
+                rows = sorted(rows, key=rank, reverse=True)[:limit]
+                since = self.started_at
+            elif span:
+                self._advance_window(window, first_hour)
+                rows = self._db.execute(
+                    "SELECT i.name, i.artist, i.album, w.plays, w.seconds "
+                    "FROM window_totals w JOIN items i ON i.id = w.item WHERE w.span = ? AND w.kind = ? " +
+                    ("AND w.plays > 0 ORDER BY w.plays DESC, w.seconds DESC " if order == "plays"
+                     else "ORDER BY w.seconds DESC ") + "LIMIT ?",
+                    (window, kind, limit)).fetchall()
+                since = first_hour * 3600
+            else:
+                rows = self._db.execute(
+                    "SELECT i.name, i.artist, i.album, t.plays, t.seconds "
+                    "FROM totals t JOIN items i ON i.id = t.item WHERE t.kind = ? " +
+                    ("AND t.plays > 0 ORDER BY t.plays DESC, t.seconds DESC " if order == "plays"
+                     else "ORDER BY t.seconds DESC ") + "LIMIT ?",
+                    (kind, limit)).fetchall()
+                since = None
+            result = {
+                "by": kind,
+                "window": window,
+                "order": order,
+                "since": since,
+                "generation": self.generation,
+                "items": [_public_item(kind, *row) for row in rows],
+            }
+            if len(self._cache) >= MAX_CACHED:
+                self._cache.clear()
+            self._cache[cache_key] = result
+            return result
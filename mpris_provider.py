@@ -0,0 +1,322 @@
+# mpris_provider.py
+# Linux now-playing provider: watches MPRIS2 media players on the D-Bus session bus.
+#
+# One background thread owns the bus connection. It reads every player's state once,
+# then follows PropertiesChanged, Seeked and NameOwnerChanged signals, so taking a
+# sample only copies the cached state and never talks to D-Bus. Art given as a
+# file:// URL is read once per track through a caller-supplied loader.
+# Requires jeepney (pip install jeepney); it is imported lazily.
+
+import threading
+import time
+from urllib.parse import unquote, urlparse
+
+MPRIS_PREFIX = "org.mpris.MediaPlayer2."
+MPRIS_PATH = "/org/mpris/MediaPlayer2"
+ROOT_IFACE = "org.mpris.MediaPlayer2"
+PLAYER_IFACE = "org.mpris.MediaPlayer2.Player"
+PROPS_IFACE = "org.freedesktop.DBus.Properties"
+# Seconds to wait for a player's reply; a hung player must not stall the watcher for long
+CALL_TIMEOUT = 2.0
+# Largest local art file that is read
+MAX_ART_BYTES = 8 * 1024 * 1024
+
+def _variant(value):
+    # jeepney returns variants as (signature, value)
+    if isinstance(value, tuple) and len(value) == 2 and isinstance(value[0], str):
+        return value[1]
+    return value
+
+def read_art_file(url, max_bytes=MAX_ART_BYTES):
+    """Bytes of a file:// art URL, or None for other schemes, missing or oversized files."""
+    parsed = urlparse(url or "")
+    if parsed.scheme != "file":
+        return None
+    try:
+        with open(unquote(parsed.path), "rb") as f:
+            data = f.read(max_bytes + 1)
+    except OSError:
+        return None
+    if not data or len(data) > max_bytes:
+        return None
+    return data
+
+class MprisPlayer:
+    """Cached state of one player, updated by the watcher thread."""
+    def __init__(self, bus_name):
+        self.bus_name = bus_name
+        self.identity = ""
+        self.status = "stopped"
+        self.metadata = {}
+        self.art_url = None
+        self.art_key = None
+        self.art_digest = None
+        # Position anchor: seconds at monotonic time `anchored`, advancing while playing
+        self.position = None
+        self.anchored = 0.0
+        self.rate = 1.0
+
+    @property
+    def app_id(self):
+        return self.bus_name[len(MPRIS_PREFIX):]
+
+    def current_position(self):
+        if self.position is None:
+            return None
+        if self.status == "playing":
+            return self.position + (time.monotonic() - self.anchored) * self.rate
+        return self.position
+
+    def set_position(self, seconds):
+        self.position = seconds
+        self.anchored = time.monotonic()
+
+    def snapshot(self):
+        """Plain dict of this player's state, safe to use outside the watcher thread."""
+        meta = self.metadata
+        artists = meta.get("xesam:artist") or []
+        if isinstance(artists, str):
+            artists = [artists]
+        length = meta.get("mpris:length")
+        return {
+            "appId": self.app_id,
+            "identity": self.identity,
+            "status": self.status,
+            "title": str(meta.get("xesam:title") or ""),
+            "artist": ", ".join(str(a) for a in artists if a),
+            "album": str(meta.get("xesam:album") or ""),
+            "artDigest": self.art_digest,
+            "position": self.current_position(),
+            "duration": (length / 1e6) if isinstance(length, int) and length > 0 else None,
+        }
+
+class MprisWatcher(threading.Thread):
+    """Follows all MPRIS players on the session bus.
+
+    load_art(data) stores art bytes and returns a digest (or None); on_change() is
+    called from the watcher thread after any player changed.
+    """
+    def __init__(self, load_art=None, on_change=None, bus="SESSION"):
+        super().__init__(name="jamdeck-mpris", daemon=True)
+        self.load_art = load_art
+        self.on_change = on_change
+        self.bus = bus
+        self.error = None
+        self._lock = threading.Lock()
+        self._players = {}    # well-known bus name -> MprisPlayer
+        self._owners = {}     # unique connection name -> well-known bus name
+        self._ready = threading.Event()
+        self._stop_event = threading.Event()
+        self._conn = None
+
+    def wait_ready(self, timeout=None):
+        """Wait for the initial scan; returns False if it did not finish in time."""
+        return self._ready.wait(timeout)
+
+    def players(self):
+        """Snapshots of all players, playing first, then paused, then the rest."""
+        order = {"playing": 0, "paused": 1}
+        with self._lock:
+            snaps = [player.snapshot() for player in self._players.values()]
+        return sorted(snaps, key=lambda snap: (order.get(snap["status"], 2), snap["appId"]))
+
+    def stop(self):
+        self._stop_event.set()
+
+    # --- D-Bus helpers (watcher thread only) ---
+    def _call(self, bus_name, path, interface, method, signature=None, body=()):
+        from jeepney import DBusAddress, new_method_call
+        from jeepney.wrappers import unwrap_msg
+        address = DBusAddress(path, bus_name=bus_name, interface=interface)
+        message = new_method_call(address, method, signature, body)
+        return unwrap_msg(self._conn.send_and_get_reply(message, timeout=CALL_TIMEOUT))
+
+    def _get_all(self, bus_name, interface):
+        (props,) = self._call(bus_name, MPRIS_PATH, PROPS_IFACE, "GetAll", "s", (interface,))
+        return {key: _variant(value) for key, value in props.items()}
+
+    def _subscribe(self):
+        from jeepney import MatchRule, message_bus
+        from jeepney.wrappers import unwrap_msg
+        rules = [
+            MatchRule(type="signal", interface=PROPS_IFACE, member="PropertiesChanged", path=MPRIS_PATH),
+            MatchRule(type="signal", interface=PLAYER_IFACE, member="Seeked", path=MPRIS_PATH),
+        ]
+        owner_rule = MatchRule(type="signal", sender="org.freedesktop.DBus",
+                               interface="org.freedesktop.DBus", member="NameOwnerChanged")
+        owner_rule.add_arg_condition(0, ROOT_IFACE, kind="namespace")
+        rules.append(owner_rule)
+        for rule in rules:
+            unwrap_msg(self._conn.send_and_get_reply(message_bus.AddMatch(rule), timeout=CALL_TIMEOUT))
+
+    def _add_player(self, bus_name, owner=None):
+        from jeepney import message_bus
+        from jeepney.wrappers import unwrap_msg
+        try:
+            if owner is None:
+                (owner,) = unwrap_msg(self._conn.send_and_get_reply(message_bus.GetNameOwner(bus_name),
+                                                                    timeout=CALL_TIMEOUT))
+            player = MprisPlayer(bus_name)
+            try:
+                player.identity = str(self._get_all(bus_name, ROOT_IFACE).get("Identity") or "")
+            except Exception:
+                pass
+            self._apply(player, self._get_all(bus_name, PLAYER_IFACE), initial=True)
+        except Exception as e:
+            print(f"MPRIS: could not read {bus_name}: {e}")
+            return
+        with self._lock:
+            self._players[bus_name] = player
+            self._owners[owner] = bus_name
+
+    def _remove_player(self, bus_name):
+        with self._lock:
+            self._players.pop(bus_name, None)
+            for owner in [o for o, name in self._owners.items() if name == bus_name]:
+                del self._owners[owner]
+
+    def _apply(self, player, props, initial=False):
+        """Update player from Player-interface properties. Caller holds the lock (or owns player)."""
+        if "PlaybackStatus" in props:
+            # Re-anchor the position so the time spent in the old status is accounted for
+            player.set_position(player.current_position())
+            player.status = str(props["PlaybackStatus"]).lower()
+        if "Rate" in props:
+            try:
+                player.rate = float(props["Rate"]) or 1.0
+            except (TypeError, ValueError):
+                pass
+        if "Metadata" in props:
+            meta = {key: _variant(value) for key, value in (props["Metadata"] or {}).items()}
+            track_changed = meta.get("mpris:trackid") != player.metadata.get("mpris:trackid") \
+                or meta.get("xesam:title") != player.metadata.get("xesam:title")
+            player.metadata = meta
+            if track_changed and not initial:
+                player.set_position(0.0)
+            self._update_art(player)
+        if "Position" in props:
+            # Only present in GetAll replies; players do not signal position changes
+            try:
+                player.set_position(int(props["Position"]) / 1e6)
+            except (TypeError, ValueError):
+                pass
+
+    def _update_art(self, player):
+        url = player.metadata.get("mpris:artUrl") or None
+        key = (url, player.metadata.get("mpris:trackid"), player.metadata.get("xesam:title"))
+        if key == player.art_key:
+            return
+        # Read once per track (and URL); players often reuse one file path for every cover
+        player.art_key = key
+        player.art_url = url
+        player.art_digest = None
+        if url and self.load_art:
+            data = read_art_file(url)
+            if data:
+                try:
+                    player.art_digest = self.load_art(data)
+                except Exception as e:
+                    print(f"MPRIS: could not store art for {player.bus_name}: {e}")
+
+    def reload_art(self, app_id):
+        """Read a player's art again (e.g. after it was evicted from the caller's cache). Returns the digest."""
+        with self._lock:
+            player = self._players.get(MPRIS_PREFIX + app_id)
+            if player is None:
+                return None
+            player.art_key = None
+            self._update_art(player)
+            return player.art_digest
+
+    def _handle(self, msg):
+        """Apply one signal. Returns True if a player changed."""
+        from jeepney import HeaderFields
+        header = msg.header.fields
+        member = header.get(HeaderFields.member)
+        sender = header.get(HeaderFields.sender)
+        if member == "NameOwnerChanged":
+            name, old, new = msg.body
+            if not name.startswith(MPRIS_PREFIX):
+                return False
+            if old:
+                self._remove_player(name)
+            if new:
+                self._add_player(name, owner=new)
+            return True
+        with self._lock:
+            player = self._players.get(self._owners.get(sender))
+        if player is None:
+            return False
+        if member == "Seeked":
+            with self._lock:
+                player.set_position(msg.body[0] / 1e6)
+            return True
+        if member == "PropertiesChanged":
+            interface, changed, invalidated = msg.body
+            if interface != PLAYER_IFACE:
+                return False
+            props = {key: _variant(value) for key, value in changed.items()}
+            if invalidated:
+                # Some players only invalidate; fetch the current values once
+                try:
+                    fresh = self._get_all(player.bus_name, PLAYER_IFACE)
+                    props.update({key: fresh[key] for key in invalidated if key in fresh})
+                except Exception:
+                    pass
+            with self._lock:
+                self._apply(player, props)
+            return True
+        return False
+
+    def _scan(self):
+        from jeepney import message_bus
+        from jeepney.wrappers import unwrap_msg
+        (names,) = unwrap_msg(self._conn.send_and_get_reply(message_bus.ListNames(), timeout=CALL_TIMEOUT))
+        for name in sorted(names):
+            if name.startswith(MPRIS_PREFIX):
+                self._add_player(name)
+
+    def _notify(self):
+        if self.on_change:
+            try:
+                self.on_change()
+            except Exception as e:
+                print(f"MPRIS change callback failed: {e}")
+
+    def run(self):
+        try:
+            from jeepney import MatchRule
+            from jeepney.io.blocking import open_dbus_connection
+        except ImportError:
+            self.error = "jeepney is not installed (pip install jeepney)"
+            self._ready.set()
+            return
+        try:
+            self._conn = open_dbus_connection(bus=self.bus)
+        except Exception as e:
+            self.error = f"D-Bus session bus unavailable: {e}"
+            self._ready.set()
+            return
+        try:
+            with self._conn.filter(MatchRule(type="signal"), bufsize=256) as signals:
+                # Subscribe before scanning so no change between the two is missed
+                self._subscribe()
+                self._scan()
+                self._ready.set()
+                print(f"MPRIS: watching {len(self._players)} player(s)")
+                while not self._stop_event.is_set():
+                    try:
+                        msg = self._conn.recv_until_filtered(signals, timeout=1.0)
+                    except TimeoutError:
+                        continue
+                    if self._handle(msg):
+                        self._notify()
+        except Exception as e:
+            self.error = f"D-Bus connection lost: {e}"
+            print(f"MPRIS watcher stopped: {e}")
+        finally:
+            self._ready.set()
+            try:
+                self._conn.close()
+            except Exception:
+                pass
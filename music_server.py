@@ -1,5 +1,5 @@
 #!/usr/bin/env python3
-from http.server import BaseHTTPRequestHandler, HTTPServer
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 import subprocess
 import json
 from urllib.parse import parse_qs, urlparse, unquote
@@ -12,6 +12,29 @@ import socket
 import argparse # Import argparse
 import tempfile
 import platform
+import threading
+import hashlib
+import struct
+import queue
+import math
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from file_output import FileExportSink
+from overlay_render import RenderCache, clamp_width, render_frame, THEMES as RENDER_THEMES, DEFAULT_THEME as RENDER_DEFAULT_THEME, DEFAULT_WIDTH as RENDER_DEFAULT_WIDTH
+from asset_manifest import AssetManifest
+from overlay_bootstrap import BootstrapPage
+from artwork_palette import extract_palette
+from artwork_placeholder import make_placeholder
+from tracing import ProfileCapture, TracedWriter, Tracer
+from thumbnail_reader import read_image_stream
+from mpris_provider import MprisWatcher
+from control_channel import ControlPublisher, EVENT_PORT, EVENT_READY, track_summary
+from listening_stats import MAX_TOP, STATS_FILE, STATS_KINDS, STATS_ORDERS, STATS_WINDOWS, ListeningStats
+from instance_registry import EXIT_ALREADY_RUNNING, LOCK_FILE, InstanceLock, find_running_instance, remove_registry, write_registry
+from relay import RelayReceiver, RelaySender, diff_payload, parse_address
+from warm_state import WARM_STATE_FILE, WarmStateWriter, load_warm_state
+from obs_output import ObsWebSocketSink, DEFAULT_TITLE_SOURCE, DEFAULT_ARTIST_SOURCE, DEFAULT_ARTWORK_SOURCE
 
 # Version information
 VERSION = "1.0.0"
@@ -143,9 +166,454 @@ LAST_KNOWN_META = {}
 # Cache of last known metadata (by appId)
 LAST_KNOWN_META = {}
 
+# Optional ZMQ PUB endpoint for local consumers (e.g. tcp://127.0.0.1:5557); set via env or --zmq-pub
+ZMQ_PUB_ENDPOINT = os.environ.get("JAMDECK_ZMQ_PUB") or None
+# Encoding for ZMQ messages: "json" or "binary"
+ZMQ_PUB_ENCODING = os.environ.get("JAMDECK_ZMQ_ENCODING", "json")
+# Outgoing message cap per subscriber; slow subscribers drop messages instead of stalling the server
+ZMQ_PUB_HWM = 100
+# Optional obs-websocket v5 URL (e.g. ws://127.0.0.1:4455) for pushing into native OBS sources
+OBS_WS_URL = os.environ.get("JAMDECK_OBS_WS") or None
+OBS_WS_PASSWORD = os.environ.get("JAMDECK_OBS_PASSWORD") or None
+# Input names in OBS; an empty name disables that field
+OBS_TITLE_SOURCE = DEFAULT_TITLE_SOURCE
+OBS_ARTIST_SOURCE = DEFAULT_ARTIST_SOURCE
+OBS_ARTWORK_SOURCE = DEFAULT_ARTWORK_SOURCE
+# Optional directory for text/artwork files read by OBS sources; set via env or --export-dir
+EXPORT_DIR = os.environ.get("JAMDECK_EXPORT_DIR") or None
+# Seconds between background samples while a push output (ZMQ, OBS, ...) is enabled
+SAMPLE_INTERVAL = 1.0
+# Poll scheduling hints sent to overlays in X-JamDeck-Poll-After (milliseconds), for
+# responses that were not held open; the same in every state, so no change waits longer
+POLL_INTERVAL_MS = 3000
+POLL_MIN_MS = 250
+# /nowplaying?since=<version>&wait=<ms> holds the request until the client's state changes,
+# for at most this long (milliseconds)
+LONG_POLL_MAX_MS = 25000
+# Seconds between provider samples while requests are held (shared by all of them)
+LONG_POLL_SAMPLE_INTERVAL = 1.0
+# Requests held at once per client address. Browsers open about 6 connections per host
+# (all OBS Browser Sources share one browser), so a few are left for artwork and pages.
+LONG_POLL_MAX_HELD = 4
+# Seconds after the predicted end of a track to poll, so the next track is already reported
+TRACK_END_MARGIN = 0.3
+# Average provider sample time (seconds) above which clients are asked to back off
+SLOW_SAMPLE_SECONDS = 0.75
+# How sessions are read during a sample: "sequential" (one after another) or "concurrent"
+# (all media-property reads started at once, then finished on a small pool); set via env or --smtc-reads
+SMTC_READ_MODES = ("sequential", "concurrent")
+SMTC_READ_MODE = os.environ.get("JAMDECK_SMTC_READS", "sequential")
+SMTC_READ_WORKERS = 4
+# Record spans for /debug/trace and allow /debug/profile captures; set via env or --trace
+TRACE_ENABLED = str(os.environ.get("JAMDECK_TRACE", "")).strip().lower() in ("1", "true", "yes", "on")
+# Poll hint while only the restored (stale) state is available
+POLL_STALE_MS = 1000
+# Persist the last state to the runtime dir and serve it right after a restart; set via env or --no-warm-state
+WARM_STATE_ENABLED = str(os.environ.get("JAMDECK_WARM_STATE", "1")).strip().lower() not in ("0", "false", "no", "off")
+# Dual-PC relay: forward state to another instance ([host:]port), or mirror the state of one; set via env or CLI
+RELAY_TO = os.environ.get("JAMDECK_RELAY_TO") or None
+RELAY_LISTEN = os.environ.get("JAMDECK_RELAY_LISTEN") or None
+RELAY_TOKEN = os.environ.get("JAMDECK_RELAY_TOKEN") or None
+# Tray control channel (a ZMQ endpoint the tray listens on) and quiet stdout; set via env or CLI
+CONTROL_ENDPOINT = os.environ.get("JAMDECK_CONTROL") or None
+QUIET = str(os.environ.get("JAMDECK_QUIET", "")).strip().lower() in ("1", "true", "yes", "on")
+# Clients that made a request within this many seconds count as connected overlays
+ACTIVE_CLIENT_WINDOW = 15.0
+# Register this server in the runtime dir and defer to one that is already running; set via env or --no-registry
+REGISTRY_ENABLED = str(os.environ.get("JAMDECK_REGISTRY", "1")).strip().lower() not in ("0", "false", "no", "off")
+# Record listening statistics (served at /stats) in the runtime dir; set via env or --no-stats
+STATS_ENABLED = str(os.environ.get("JAMDECK_STATS", "1")).strip().lower() not in ("0", "false", "no", "off")
+# Seconds to wait for a running instance that holds the lock but does not answer yet (e.g. still starting)
+REGISTRY_WAIT = 5.0
+# Requests waiting on a sample reuse one taken within this many seconds
+FRESH_SAMPLE_AGE = 0.25
+# Recent states kept so /nowplaying?since=<version> can answer with a patch
+STATE_HISTORY = 32
+# Per-client token bucket for provider-backed routes (/nowplaying, /render.png)
+CLIENT_RATE = 4.0
+CLIENT_BURST = 8
+# Most requests allowed to wait on the provider at once
+ADMISSION_LIMIT = 4
+
+# ---------------------------------------------------------
+# Published state shared by the HTTP routes and push outputs
+
+class ArtworkStore:
+    """Small in-memory cache of recent cover images keyed by their SHA-1 content hash.
+
+    Derived data (the color palette and the placeholder preview) is cached next to each
+    image and evicted with it.
+    """
+    def __init__(self, max_entries=8):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._palettes = {}
+        self._placeholders = {}
+        self.max_entries = max_entries
+        self.current = None
+
+    def put(self, data, current=True, digest=None):
+        """Store image bytes and return their hex digest.
+
+        current=False stores a cover without making it the default for get().
+        A caller that already hashed data passes digest; data is then stored as
+        given (no copy), so it must not be modified afterwards.
+        """
+        owned = digest is not None
+        if digest is None:
+            digest = hashlib.sha1(data).hexdigest()
+        with self._lock:
+            if digest not in self._entries:
+                self._entries[digest] = data if owned else bytes(data)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_entries:
+                evicted, _ = self._entries.popitem(last=False)
+                self._palettes.pop(evicted, None)
+                self._placeholders.pop(evicted, None)
+            if current:
+                self.current = digest
+        return digest
+
+    def mark_current(self, digest):
+        with self._lock:
+            if digest in self._entries:
+                self.current = digest
+
+    def put_file(self, path):
+        """Read an image file into the cache. Returns the digest or None."""
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except Exception:
+            return None
+        if not data:
+            return None
+        return self.put(data)
+
+    def get(self, digest=None):
+        """Return cached bytes for digest (or the current image), or None."""
+        with self._lock:
+            key = digest or self.current
+            if key is None:
+                return None
+            return self._entries.get(key)
+
+    def _derived(self, cache, digest, compute):
+        """Return compute(bytes) for a cached cover, memoized in cache until eviction."""
+        with self._lock:
+            if digest in cache:
+                return cache[digest]
+            data = self._entries.get(digest)
+        if data is None:
+            return None
+        with TRACER.span("artwork." + compute.__name__):
+            value = compute(data)
+        with self._lock:
+            if digest in self._entries:
+                cache[digest] = value
+        return value
+
+    def export(self):
+        """Return [(digest, bytes, extra)] oldest first, where extra holds the derived data and a current flag."""
+        with self._lock:
+            entries = []
+            for digest, data in self._entries.items():
+                extra = {}
+                if self._palettes.get(digest):
+                    extra["palette"] = self._palettes[digest]
+                if self._placeholders.get(digest):
+                    extra["placeholder"] = self._placeholders[digest]
+                if digest == self.current:
+                    extra["current"] = True
+                entries.append((digest, data, extra))
+            return entries
+
+    def restore(self, entries):
+        """Load entries produced by export(), including their derived data."""
+        for digest, data, extra in entries:
+            digest = self.put(data, current=bool(extra.get("current")))
+            with self._lock:
+                if "palette" in extra:
+                    self._palettes[digest] = extra["palette"]
+                if "placeholder" in extra:
+                    self._placeholders[digest] = extra["placeholder"]
+
+    def palette(self, digest):
+        """Color palette of a cached cover, computed once per digest. None if unavailable."""
+        return self._derived(self._palettes, digest, extract_palette)
+
+    def placeholder(self, digest):
+        """Inline data URI preview of a cached cover, computed once per digest. None if unavailable."""
+        return self._derived(self._placeholders, digest, make_placeholder)
+
+class NowPlayingState:
+    """Last published now-playing payload plus a version that increases on every change.
+
+    The snapshot also holds every media session seen in the same sample (for /sessions);
+    the version covers both. The last `history` states are kept for patches between versions.
+    """
+    def __init__(self, history=STATE_HISTORY):
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._listeners = []
+        self._history = deque(maxlen=history)
+        self.version = 0
+        self.payload = None
+        self.sessions = []
+        self.published_at = 0.0
+
+    def add_listener(self, callback):
+        """Register callback(version, payload), invoked after each change."""
+        with self._lock:
+            self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        with self._lock:
+            try:
+                self._listeners.remove(callback)
+            except ValueError:
+                pass
+
+    def snapshot(self):
+        """Return (version, payload) of the last published state."""
+        with self._lock:
+            return self.version, self.payload
+
+    def snapshot_sessions(self):
+        """Return (version, sessions) of the last published state."""
+        with self._lock:
+            return self.version, self.sessions
+
+    def snapshot_all(self):
+        """Return (version, payload, sessions) of the last published state."""
+        with self._lock:
+            return self.version, self.payload, self.sessions
+
+    def wait_for_change(self, version, timeout):
+        """Wait until the version differs from `version` or timeout seconds passed. Returns the version."""
+        with self._changed:
+            self._changed.wait_for(lambda: self.version != version, timeout)
+            return self.version
+
+    def at_version(self, version):
+        """Return (payload, sessions) published as version, or None once it left the history."""
+        with self._lock:
+            for entry in reversed(self._history):
+                if entry[0] == version:
+                    return entry[1], entry[2]
+        return None
+
+    def publish(self, payload, sessions=None):
+        """Publish payload (and sessions) if they differ from the current ones. Returns (version, changed).
+
+        Listeners are only called when the payload itself changed.
+        """
+        sessions = sessions or []
+        with self._lock:
+            self.published_at = time.time()
+            payload_changed = payload != self.payload
+            if not payload_changed and sessions == self.sessions:
+                return self.version, False
+            self.version += 1
+            self.payload = payload
+            self.sessions = sessions
+            version = self.version
+            self._history.append((version, payload, sessions))
+            self._changed.notify_all()
+            listeners = list(self._listeners) if payload_changed else []
+        for callback in listeners:
+            try:
+                callback(version, payload)
+            except Exception as e:
+                print(f"State listener error: {e}")
+        return version, True
+
+    def restore(self, payload, sessions=None):
+        """Install a saved payload (and sessions) without calling listeners.
+
+        Unlike publish(), published_at stays unset, so the state never counts as a fresh sample.
+        """
+        with self._lock:
+            self.version += 1
+            self.payload = payload
+            self.sessions = sessions or []
+            self._history.append((self.version, payload, self.sessions))
+            self._changed.notify_all()
+            return self.version
+
+class PlaybackClock:
+    """Position and duration of the current track, used to predict when it ends."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.position = None
+        self.duration = None
+        self.playing = False
+        self.updated = 0.0
+
+    def update(self, position, duration, playing):
+        with self._lock:
+            self.position = position
+            self.duration = duration
+            self.playing = playing
+            self.updated = time.monotonic()
+
+    def clear(self):
+        with self._lock:
+            self.position = None
+            self.duration = None
+            self.playing = False
+
+    def snapshot(self):
+        """Return {"position", "duration", "playing"} as of now, or None when the position is unknown."""
+        with self._lock:
+            if self.position is None:
+                return None
+            position = self.position
+            if self.playing:
+                position += time.monotonic() - self.updated
+            return {"position": round(position, 3), "duration": self.duration, "playing": self.playing}
+
+    def remaining(self):
+        """Seconds until the current track ends, or None when unknown."""
+        with self._lock:
+            if self.position is None or not self.duration:
+                return None
+            position = self.position
+            if self.playing:
+                position += time.monotonic() - self.updated
+            return max(0.0, self.duration - position)
+
+class ProviderLoad:
+    """Moving average of provider sample time; a slow provider means clients should back off."""
+    def __init__(self, threshold=SLOW_SAMPLE_SECONDS, alpha=0.3):
+        self._lock = threading.Lock()
+        self.threshold = threshold
+        self.alpha = alpha
+        self.average = 0.0
+
+    def record(self, seconds):
+        with self._lock:
+            self.average += self.alpha * (seconds - self.average)
+
+    def retry_after(self):
+        """Whole seconds clients should wait before the next request, or None when not overloaded."""
+        with self._lock:
+            average = self.average
+        if average < self.threshold:
+            return None
+        return max(1, math.ceil(average * 4))
+
+class HeldRequests:
+    """Counts /nowplaying requests held open per client address."""
+    def __init__(self, per_address=LONG_POLL_MAX_HELD):
+        self._lock = threading.Lock()
+        self._held = {}
+        self.per_address = per_address
+
+    def acquire(self, address):
+        """Take a slot for address; False when it already holds per_address requests."""
+        with self._lock:
+            count = self._held.get(address, 0)
+            if count >= self.per_address:
+                return False
+            self._held[address] = count + 1
+            return True
+
+    def release(self, address):
+        with self._lock:
+            count = self._held.get(address, 0) - 1
+            if count > 0:
+                self._held[address] = count
+            else:
+                self._held.pop(address, None)
+
+class RequestLimiter:
+    """Per-client token buckets plus a global cap on requests waiting for the provider."""
+    def __init__(self, rate=CLIENT_RATE, burst=CLIENT_BURST, admission_limit=ADMISSION_LIMIT,
+                 idle_timeout=60.0, max_clients=256):
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._admission = threading.BoundedSemaphore(admission_limit)
+        self.rate = rate
+        self.burst = burst
+        self.admission_limit = admission_limit
+        self.idle_timeout = idle_timeout
+        self.max_clients = max_clients
+        self.counters = {"sampled": 0, "rejected_client": 0, "rejected_global": 0, "degraded": 0}
+
+    def take(self, key):
+        """Consume a token for key. Returns 0 when allowed, else seconds until a token is available."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                wait = 0
+            else:
+                self._buckets[key] = (tokens, now)
+                wait = (1 - tokens) / self.rate
+            if len(self._buckets) > self.max_clients:
+                # Forget clients that have been quiet for a while (a full bucket is the default anyway)
+                for stale in [k for k, (_, seen) in self._buckets.items() if now - seen > self.idle_timeout]:
+                    del self._buckets[stale]
+        return wait
+
+    def admit(self):
+        """Try to take an admission slot without blocking; release() it after sampling."""
+        return self._admission.acquire(blocking=False)
+
+    def release(self):
+        self._admission.release()
+
+    def count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def active_clients(self, window=ACTIVE_CLIENT_WINDOW):
+        """Number of clients that made a request in the last `window` seconds."""
+        now = time.monotonic()
+        with self._lock:
+            return sum(1 for _, seen in self._buckets.values() if now - seen <= window)
+
+    def metrics(self):
+        with self._lock:
+            counters = dict(self.counters)
+            clients = len(self._buckets)
+        counters["rejected"] = counters["rejected_client"] + counters["rejected_global"]
+        counters.update({
+            "clients": clients,
+            "clientRate": self.rate,
+            "clientBurst": self.burst,
+            "admissionLimit": self.admission_limit,
+        })
+        return counters
+
+ARTWORK = ArtworkStore()
+NOW_PLAYING = NowPlayingState()
+PLAYBACK_CLOCK = PlaybackClock()
+PROVIDER_LOAD = ProviderLoad()
+LIMITER = RequestLimiter()
+HELD_REQUESTS = HeldRequests()
+# Static files precached by the overlay's service worker (sw.js)
+ASSETS = AssetManifest(os.path.dirname(os.path.realpath(__file__)))
+STARTED_AT = time.time()
+# Rendered /render.png frames, keyed by state version and render parameters
+RENDER_CACHE = RenderCache()
+# Single-request overlay pages, cached per (asset version, state version, pinned app)
+BOOTSTRAP = BootstrapPage(os.path.dirname(os.path.realpath(__file__)))
+# Distinguishes state versions across restarts (versions restart at 1)
+BOOT_ID = format(int(time.time() * 1000), "x")
+# Span ring buffer (/debug/trace) and on-demand cProfile captures (/debug/profile)
+TRACER = Tracer()
+PROFILER = ProfileCapture()
+
 # Function to clean up resources on exit
 def cleanup():
     global zmq_context
+    _stop_push_outputs()
+    _stop_control_channel()
+    _release_instance()
     if zmq_context:
         print("Closing ZMQ context...")
         zmq_context.term()
@@ -173,8 +641,30 @@ signal.signal(signal.SIGTERM, signal_handler)
 # ---------------------------------------------------------
 # Windows: System Media Transport Controls (SMTC) access
 
-def _get_media_properties(session):
-    """Return media properties object using the best available SMTC API."""
+def _start_media_properties(session):
+    """Start the async media-properties read of a session without waiting. Returns the operation or None."""
+    for name in ("try_get_media_properties_async", "get_media_properties_async"):
+        try:
+            method = getattr(session, name, None)
+            if method:
+                op = method()
+                if callable(getattr(op, "get", None)):
+                    return op
+        except Exception:
+            continue
+    return None
+
+def _get_media_properties(session, pending=None):
+    """Return media properties object using the best available SMTC API.
+
+    pending is an operation from _start_media_properties() that is already running.
+    """
+    if pending is not None:
+        try:
+            return pending.get()
+        except Exception:
+            # Retry through the usual API names below
+            pass
     # Try common API names exposed by different winrt bindings
     for name in ("try_get_media_properties_async", "get_media_properties_async", "get_current_media_properties"):
         try:
@@ -205,15 +695,20 @@ def _get_session_app_id(session):
             continue
     return None
 
-def _extract_thumbnail_to_file(control):
-    """Extract SMTC thumbnail to a temp JPEG file. Returns file path or None."""
+def _read_thumbnail(control):
+    """Read the SMTC thumbnail of a media properties object. Returns (data, sha1 digest) or (None, None).
+
+    The stream is read in chunks with bounded memory and stops at the end of the image
+    (see thumbnail_reader.py).
+    """
     try:
         thumb = getattr(control, "thumbnail", None)
         if not thumb:
-            return None
+            return None, None
 
         # Open the WinRT stream for the thumbnail
-        stream = thumb.open_read_async().get()
+        with TRACER.span("smtc.thumbnail.open_read"):
+            stream = thumb.open_read_async().get()
 
         # Prefer DataReader to read the bytes from the IInputStream
         try:
@@ -221,51 +716,57 @@ def _extract_thumbnail_to_file(control):
         except Exception:
             DataReader = None  # If DataReader cannot be imported, we'll fail back to None
 
-        tmp_file = os.path.join(_runtime_dir(), "harmony_deck_cover.jpg")
-
         if DataReader is not None and stream:
+            reader = None
             try:
-                # Some runtimes provide a 'size' property; if not, load up to 10MB
+                # Some runtimes provide a 'size' property; it is only used to size the buffer
                 size = getattr(stream, "size", 0)
                 try:
                     size = int(size) if size else 0
                 except Exception:
                     size = 0
 
-                max_bytes = 10 * 1024 * 1024  # 10MB safety cap
-                to_load = min(size if size else max_bytes, max_bytes)
-
                 reader = DataReader(stream)
                 try:
-                    reader.input_stream_options = InputStreamOptions.READ_AHEAD
+                    # Partial: load_async returns whatever is available, and 0 at the end of the stream
+                    reader.input_stream_options = InputStreamOptions.PARTIAL
                 except Exception:
                     pass
 
-                loaded = reader.load_async(to_load).get()
-                buf = bytearray(loaded)
-                reader.read_bytes(buf)
-
-                with open(tmp_file, "wb") as f:
-                    f.write(buf)
-
-                try:
-                    reader.detach_stream()
-                except Exception:
-                    pass
-                try:
-                    reader.close()
-                except Exception:
-                    pass
+                def read_into(window):
+                    with TRACER.span("smtc.thumbnail.load_async", requested=len(window)):
+                        loaded = reader.load_async(len(window)).get()
+                    if loaded:
+                        try:
+                            reader.read_bytes(window[:loaded])
+                        except TypeError:
+                            # Bindings that only fill bytearrays
+                            chunk = bytearray(loaded)
+                            reader.read_bytes(chunk)
+                            window[:loaded] = chunk
+                    return loaded
 
-                if os.path.exists(tmp_file) and os.path.getsize(tmp_file) > 0:
-                    return tmp_file
+                return read_image_stream(read_into, size_hint=size)
             except Exception:
-                # Fall through to return None
+                # Fall through to return nothing
                 pass
+            finally:
+                if reader is not None:
+                    try:
+                        reader.detach_stream()
+                    except Exception:
+                        pass
+                    try:
+                        reader.close()
+                    except Exception:
+                        pass
 
-        return None
+        return None, None
     except Exception:
-        return None
+        return None, None
+
+def _cover_file_path():
+    return os.path.join(_runtime_dir(), "harmony_deck_cover.jpg")
 
 def _normalize_playback_status(playback_status):
     """Normalize playback status to a lowercase string."""
@@ -292,8 +793,172 @@ def _normalize_playback_status(playback_status):
         except Exception:
             return "unknown"
 
-def get_windows_smtc_track():
-    """Attempt to read current media session via Windows SMTC (supports UWP/Store apps like Apple Music)."""
+def _timespan_seconds(value):
+    """Convert a WinRT TimeSpan (timedelta or 100ns ticks) to seconds."""
+    if value is None:
+        return None
+    if hasattr(value, "total_seconds"):
+        return value.total_seconds()
+    ticks = getattr(value, "duration", value)
+    return float(ticks) / 10_000_000
+
+def _get_timeline(session, advancing=True):
+    """Return (position, duration) in seconds from the SMTC timeline, or None if unavailable.
+
+    With advancing=True (the track is playing) the position is moved forward by the time
+    since SMTC last updated it.
+    """
+    try:
+        get_timeline = getattr(session, "get_timeline_properties", None)
+        timeline = get_timeline() if callable(get_timeline) else getattr(session, "timeline_properties", None)
+        if timeline is None:
+            return None
+        start = _timespan_seconds(getattr(timeline, "start_time", None)) or 0.0
+        end = _timespan_seconds(getattr(timeline, "end_time", None))
+        position = _timespan_seconds(getattr(timeline, "position", None))
+        if end is None or position is None or end <= start:
+            return None
+        position -= start
+        # The position is a snapshot taken at last_updated_time; account for the time since
+        updated = getattr(timeline, "last_updated_time", None)
+        if advancing and isinstance(updated, datetime):
+            if updated.tzinfo is None:
+                updated = updated.replace(tzinfo=timezone.utc)
+            age = (datetime.now(timezone.utc) - updated).total_seconds()
+            if 0 < age < end - start:
+                position += age
+        return position, end - start
+    except Exception:
+        return None
+
+# AppUserModelID prefix of the Apple Music (Microsoft Store) app, preferred over other sessions
+APPLE_MUSIC_PREFIX = "AppleInc.AppleMusicWin"
+# app id -> ((title, artist, album), artwork digest); thumbnails are only re-read when the track changes
+_THUMBNAIL_CACHE = {}
+# Digest of the cover currently written to the cover file
+_cover_digest = None
+
+def _get_playback_status(session):
+    """Read the raw playback status of a session, tolerating binding differences."""
+    try:
+        get_playback = getattr(session, "get_playback_info", None)
+        if callable(get_playback):
+            pi = get_playback()
+            return getattr(pi, "playback_status", getattr(pi, "playbackStatus", None))
+        # Some bindings expose a property instead
+        pi = getattr(session, "playback_info", None) or getattr(session, "playbackInfo", None)
+        if pi:
+            return getattr(pi, "playback_status", getattr(pi, "playbackStatus", None))
+        return None
+    except Exception:
+        try:
+            return getattr(session, "playback_status", None) or getattr(session, "playbackStatus", None)
+        except Exception:
+            return None
+
+def _is_active_status(playback_status):
+    """True when a playback status means playing or paused (SMTC 4/5), with string fallbacks."""
+    try:
+        # If playback_status exposes a 'name' (enum), check for 'playing'
+        ps_name = getattr(playback_status, "name", None)
+        if ps_name and isinstance(ps_name, str) and ps_name.lower() == "playing":
+            return True
+        # Try numeric conversion
+        try:
+            return int(playback_status) in (4, 5)
+        except Exception:
+            # Fallback: string content may contain enum name or numeric literal
+            ps_str = str(playback_status).lower()
+            return "playing" in ps_str or "paused" in ps_str or "4" in ps_str or "5" in ps_str
+    except Exception:
+        return False
+
+def _session_artwork(app_id, control, track_key):
+    """Digest of a session's thumbnail in ARTWORK; the thumbnail is re-read only for a new track."""
+    cached = _THUMBNAIL_CACHE.get(app_id)
+    if cached and cached[0] == track_key and cached[1] and ARTWORK.get(cached[1]) is not None:
+        return cached[1]
+    digest = None
+    with TRACER.span("smtc.thumbnail", app=app_id):
+        data, data_digest = _read_thumbnail(control)
+    if data:
+        digest = ARTWORK.put(data, current=False, digest=data_digest)
+    # Not cached when missing: players often publish the thumbnail after the title
+    _THUMBNAIL_CACHE[app_id] = (track_key, digest)
+    return digest
+
+def _write_cover_file(digest):
+    """Mirror the selected cover to the cover file served by /artwork without a hash."""
+    global _cover_digest
+    if digest == _cover_digest:
+        return
+    data = ARTWORK.get(digest)
+    if data is None:
+        return
+    try:
+        with open(_cover_file_path(), "wb") as f:
+            f.write(data)
+        ARTWORK.mark_current(digest)
+        _cover_digest = digest
+    except Exception as e:
+        print(f"Could not write cover file: {e}")
+
+def _read_smtc_session(session, pending=None):
+    """Capture one SMTC session as a record. Keys starting with '_' are internal.
+
+    pending: an already started media-properties read (see _start_media_properties).
+    """
+    app_id = _get_session_app_id(session)
+    playback_status = _get_playback_status(session)
+    record = {
+        "appId": app_id,
+        "status": _normalize_playback_status(playback_status),
+        "playing": _is_active_status(playback_status),
+        "title": "",
+        "artist": "",
+        "album": "",
+        "_session": session,
+        "_playback_status": playback_status,
+        "_control": None,
+        "_metadata_error": None,
+    }
+    try:
+        with TRACER.span("smtc.media_properties", app=app_id):
+            control = _get_media_properties(session, pending)
+    except Exception as e:
+        record["_metadata_error"] = str(e) or "unavailable"
+        return record
+    record["_control"] = control
+    # Some sessions expose title/artist/album differently; use getattr for resilience
+    record["title"] = getattr(control, "title", "") or ""
+    record["artist"] = getattr(control, "artist", "") or ""
+    record["album"] = getattr(control, "album_title", "") or getattr(control, "album", "") or ""
+    try:
+        if getattr(control, "thumbnail", None):
+            _attach_artwork(record, _session_artwork(app_id, control, (record["title"], record["artist"], record["album"])))
+    except Exception:
+        pass
+    return record
+
+def _attach_artwork(record, digest):
+    """Add the artwork fields for a cover cached in ARTWORK to a session record."""
+    if not digest:
+        return
+    # Content-addressed URL: only changes when the cover itself changes
+    record["artworkHash"] = digest
+    record["artworkPath"] = f"/artwork?h={digest}"
+    placeholder = ARTWORK.placeholder(digest)
+    if placeholder:
+        record["artworkPlaceholder"] = placeholder
+    palette = ARTWORK.palette(digest)
+    if palette:
+        record["palette"] = palette
+
+def _public_session(record):
+    return {key: value for key, value in record.items() if not key.startswith("_")}
+
+def read_windows_smtc_sessions():
+    """Enumerate every SMTC session once. Returns (records, error payload or None)."""
     # Ensure the stdlib 'uuid' module is available for any runtime imports (some winrt bindings
     # perform dynamic imports that PyInstaller can miss). Explicit import here helps bundled EXEs.
     try:
@@ -301,279 +966,841 @@ def get_windows_smtc_track():
     except Exception:
         # If uuid truly isn't available, continue — error will be reported by the caller
         pass
+    # Lazy import winrt to avoid hard dependency on non-Windows platforms
     try:
-        # Lazy import winrt to avoid hard dependency on non-Windows platforms
-        try:
-            from winrt.windows.media.control import GlobalSystemMediaTransportControlsSessionManager as SMTCManager
-        except Exception as imp_e:
-            payload = {"playing": False, "error": f"winrt import failed: {imp_e}"}
-            _smtc_debug_log("winrt import failed", payload, session=None)
-            return json.dumps(payload)
- 
-        try:
+        from winrt.windows.media.control import GlobalSystemMediaTransportControlsSessionManager as SMTCManager
+    except Exception as imp_e:
+        payload = {"playing": False, "error": f"winrt import failed: {imp_e}"}
+        _smtc_debug_log("winrt import failed", payload, session=None)
+        return [], payload
+
+    try:
+        with TRACER.span("smtc.request_async"):
             mgr = SMTCManager.request_async().get()
-            # Ensure we materialize sessions into a list once to avoid exhausting iterators.
+        # Ensure we materialize sessions into a list once to avoid exhausting iterators.
+        with TRACER.span("smtc.get_sessions"):
             try:
                 sessions_list = list(mgr.get_sessions())
             except Exception:
                 # Fallback to manual list construction
                 sessions_list = [s for s in mgr.get_sessions()]
-        except Exception as e:
-            payload = {"playing": False, "error": f"SMTC request failed: {e}"}
-            _smtc_debug_log("SMTC request failed", payload, session=None)
-            return json.dumps(payload)
+    except Exception as e:
+        payload = {"playing": False, "error": f"SMTC request failed: {e}"}
+        _smtc_debug_log("SMTC request failed", payload, session=None)
+        return [], payload
 
-        # Debugging: enumerate sessions and print details to help diagnose "No active media session"
-        try:
-            sess_count = len(sessions_list)
-            print(f"[SMTC DEBUG] Retrieved {sess_count} session(s)")
-        except Exception as dbg_e:
-            print(f"[SMTC DEBUG] Could not determine session count: {dbg_e}")
-
-        # Iterate with index — some session objects are lazy / proxy objects so wrap attribute access
-        idx = 0
-        for session in sessions_list:
-            try:
-                print(f"[SMTC DEBUG] Session #{idx}: {repr(session)}")
-                # Try common attribute/property names for app identifier
-                app_id = None
-                for name in ("source_app_user_model_id", "source_app_user_model_id", "app_id", "app_user_model_id", "SourceAppUserModelId"):
-                    try:
-                        val = getattr(session, name, None)
-                        if val:
-                            app_id = val
-                            break
-                    except Exception:
-                        continue
-                print(f"[SMTC DEBUG]  app_id: {app_id}")
+    print(f"[SMTC DEBUG] Retrieved {len(sessions_list)} session(s)")
+    if SMTC_READ_MODE == "concurrent" and len(sessions_list) > 1:
+        results = _read_sessions_concurrently(sessions_list)
+    else:
+        results = [_read_session_safely(idx, session) for idx, session in enumerate(sessions_list)]
+    records = []
+    for idx, record in enumerate(results):
+        if record is None:
+            continue
+        print(f"[SMTC DEBUG] Session #{idx}: app_id: {record['appId']}, playback_status: {record['_playback_status']}")
+        records.append(record)
+    return records, None
 
-                # Try to get playback info (may be a callable)
-                playback_status = None
-                try:
-                    get_playback = getattr(session, "get_playback_info", None)
-                    if callable(get_playback):
-                        pi = get_playback()
-                        playback_status = getattr(pi, "playback_status", getattr(pi, "playbackStatus", None))
-                    else:
-                        # Some bindings expose a property instead
-                        pi = getattr(session, "playback_info", None) or getattr(session, "playbackInfo", None)
-                        if pi:
-                            playback_status = getattr(pi, "playback_status", getattr(pi, "playbackStatus", None))
-                except Exception as p_e:
-                    # Fallback: attempt to access simple properties if available
-                    try:
-                        playback_status = getattr(session, "playback_status", None) or getattr(session, "playbackStatus", None)
-                    except Exception:
-                        playback_status = None
-                print(f"[SMTC DEBUG]  playback_status: {playback_status}")
+def _read_session_safely(idx, session, pending=None):
+    # Some session objects are lazy / proxy objects, so one failing session must not stop the walk
+    try:
+        with TRACER.span("smtc.session", index=idx):
+            return _read_smtc_session(session, pending)
+    except Exception as e:
+        print(f"[SMTC DEBUG] Exception inspecting session #{idx}: {e}")
+        return None
 
-                # Note: do not fail here — continue to existing logic below that reads media properties
-            except Exception as e:
-                print(f"[SMTC DEBUG] Exception inspecting session #{idx}: {e}")
-            idx += 1
- 
-        # Prefer the first session that reports a playing state.
-        # Use playback status when available, but still attempt to read metadata
-        # because some players may report playback state without exposing title/artist.
-
-        # Attempt to prefer Apple Music session if present (AppUserModelID starts with this prefix)
-        apple_prefix = "AppleInc.AppleMusicWin_"
-        apple_idx = None
-        for i, s in enumerate(sessions_list):
-            try:
-                app_id = None
-                for name in ("source_app_user_model_id", "app_id", "app_user_model_id", "SourceAppUserModelId"):
-                    try:
-                        val = getattr(s, name, None)
-                        if val:
-                            app_id = val
-                            break
-                    except Exception:
-                        continue
-                if app_id and isinstance(app_id, str) and app_id.startswith(apple_prefix):
-                    apple_idx = i
-                    print(f"[SMTC DEBUG] Preferred Apple Music session found at index {i}: {app_id}")
-                    break
-            except Exception:
-                continue
-        if apple_idx is not None and apple_idx != 0:
-            # Move the preferred session to the front so selection logic picks it first.
-            sessions_list.insert(0, sessions_list.pop(apple_idx))
+_SMTC_POOL = None
+_SMTC_POOL_LOCK = threading.Lock()
 
-        for session in sessions_list:
-            try:
-                # Determine playback status robustly
-                playback_status = None
-                try:
-                    get_playback = getattr(session, "get_playback_info", None)
-                    if callable(get_playback):
-                        pi = get_playback()
-                        playback_status = getattr(pi, "playback_status", getattr(pi, "playbackStatus", None))
-                    else:
-                        pi = getattr(session, "playback_info", None) or getattr(session, "playbackInfo", None)
-                        if pi:
-                            playback_status = getattr(pi, "playback_status", getattr(pi, "playbackStatus", None))
-                except Exception:
-                    try:
-                        playback_status = getattr(session, "playback_status", None) or getattr(session, "playbackStatus", None)
-                    except Exception:
-                        playback_status = None
+def _init_smtc_worker():
+    # Older pywinrt releases need each thread to join the multithreaded apartment explicitly
+    try:
+        import winrt
+        init_apartment = getattr(winrt, "init_apartment", None)
+        if init_apartment:
+            init_apartment(getattr(winrt, "MTA", 0))
+    except Exception:
+        pass
 
-                # Normalize playback status to decide if session is playing — robust fallback
-                is_playing = False
-                try:
-                    # If playback_status exposes a 'name' (enum), check for 'playing'
-                    ps_name = getattr(playback_status, "name", None)
-                    if ps_name and isinstance(ps_name, str) and ps_name.lower() == "playing":
-                        is_playing = True
-                    else:
-                        # Try numeric conversion
-                        try:
-                            ps_int = int(playback_status)
-                            if ps_int in (4, 5):
-                                is_playing = True
-                        except Exception:
-                            # Fallback: string content may contain enum name or numeric literal
-                            try:
-                                ps_str = str(playback_status).lower()
-                                if "playing" in ps_str or "paused" in ps_str or "4" in ps_str or "5" in ps_str:
-                                    is_playing = True
-                            except Exception:
-                                pass
-
-                    # Heuristic: if this session belongs to Apple Music, prefer treating it as playing
-                    # when a playback_status is present but metadata might be inaccessible in this runtime.
-                    try:
-                        app_id = None
-                        for name in ("source_app_user_model_id", "app_id", "app_user_model_id", "SourceAppUserModelId"):
-                            try:
-                                val = getattr(session, name, None)
-                                if val:
-                                    app_id = val
-                                    break
-                            except Exception:
-                                continue
-                        if not is_playing and app_id and isinstance(app_id, str) and app_id.startswith("AppleInc.AppleMusicWin") and playback_status is not None:
-                            # Attempt to read metadata; if that fails, return a minimal playing payload for Apple Music.
-                            try:
-                                control = _get_media_properties(session)
-                                title = getattr(control, "title", "") or ""
-                                artist = getattr(control, "artist", "") or ""
-                                album = getattr(control, "album_title", "") or getattr(control, "album", "") or ""
-                                if title or artist:
-                                    # Return full metadata if available
-                                    payload = {"playing": True, "title": title, "artist": artist, "album": album, "appId": app_id, "status": _normalize_playback_status(playback_status)}
-                                    _smtc_debug_log("Returning Apple full metadata", payload, session=session, control=control, playback_status=playback_status)
-                                    return json.dumps(payload)
-                                # If metadata empty but we have a playback status, return minimal payload
-                                print(f"[SMTC DEBUG] Returning minimal playing payload for Apple Music (app_id: {app_id}, playback_status: {playback_status})")
-                                payload = {"playing": True, "title": "", "artist": "", "album": "", "appId": app_id, "status": _normalize_playback_status(playback_status)}
-                                _smtc_debug_log("Returning Apple minimal payload", payload, session=session, control=control, playback_status=playback_status)
-                                return json.dumps(payload)
-                            except Exception as e:
-                                print(f"[SMTC DEBUG] Apple metadata read failed: {e}; returning minimal payload")
-                                payload = {"playing": True, "title": "", "artist": "", "album": "", "appId": app_id, "status": _normalize_playback_status(playback_status)}
-                                _smtc_debug_log("Apple metadata read failed; returning minimal payload", payload, session=session, control=None, playback_status=playback_status)
-                                return json.dumps(payload)
-                    except Exception:
-                        pass
-                except Exception:
-                    pass
+def _smtc_pool():
+    global _SMTC_POOL
+    with _SMTC_POOL_LOCK:
+        if _SMTC_POOL is None:
+            _SMTC_POOL = ThreadPoolExecutor(max_workers=SMTC_READ_WORKERS, thread_name_prefix="jamdeck-smtc",
+                                            initializer=_init_smtc_worker)
+        return _SMTC_POOL
 
-                # Attempt to read media properties for non-Apple sessions or when Apple early-return not taken
-                app_id = _get_session_app_id(session)
-                try:
-                    control = _get_media_properties(session)
-                except Exception as e:
-                    # If we cannot read metadata but playback indicates active, return minimal payload (with diagnostics)
-                    if is_playing:
-                        payload = {
-                            "playing": True,
-                            "title": "",
-                            "artist": "",
-                            "album": "",
-                            "appId": app_id,
-                            "status": _normalize_playback_status(playback_status),
-                        }
-                        _smtc_debug_log(f"Metadata read failed; returning minimal payload: {e}", payload, session=session, control=None, playback_status=playback_status)
-                        return json.dumps(payload)
-                    # Otherwise skip this session
-                    continue
-                # Some sessions expose title/artist/album differently; use getattr for resilience
-                title = getattr(control, "title", "") or ""
-                artist = getattr(control, "artist", "") or ""
-                album = getattr(control, "album_title", "") or getattr(control, "album", "") or ""
-
-                # Try to extract thumbnail (may not be available)
-                artwork_path = None
-                try:
-                    thumb = getattr(control, "thumbnail", None)
-                    if thumb:
-                        path = _extract_thumbnail_to_file(control)
-                        if path and os.path.isfile(path):
-                            artwork_path = path
-                except Exception:
-                    artwork_path = None
-
-                # If the session is playing, return it even if metadata is sparse.
-                if is_playing or title or artist:
-                    app_id = _get_session_app_id(session)
-                    data = {
-                        "playing": True if is_playing else False,
-                        "title": title,
-                        "artist": artist,
-                        "album": album,
-                        "appId": app_id,
-                        "status": _normalize_playback_status(playback_status),
-                    }
-                    if artwork_path:
-                        try:
-                            ts = int(os.path.getmtime(artwork_path))
-                            data["artworkPath"] = f"/artwork?t={ts}"
-                        except Exception:
-                            pass
-                    # Cache last known non-empty metadata for this app
-                    try:
-                        if (title or artist) and app_id:
-                            LAST_KNOWN_META[app_id] = {"title": title, "artist": artist, "album": album}
-                    except Exception:
-                        pass
-                    _smtc_debug_log("Returning session payload", data, session=session, control=control, playback_status=playback_status)
-                    return json.dumps(data)
-            except Exception:
-                # If any session fails, continue to next
-                continue
+def _read_sessions_concurrently(sessions_list):
+    """Read every session at once, so a sample takes as long as the slowest session, not their sum.
 
-        payload = {"playing": False, "error": "No active media session"}
-        _smtc_debug_log("No active media session", payload, session=None)
-        return json.dumps(payload)
+    All media-property reads are started first (WinRT runs them in the background); the
+    pool then waits on each and reads thumbnails side by side. Results keep the session order.
+    """
+    with TRACER.span("smtc.start_reads", sessions=len(sessions_list)):
+        pending = [_start_media_properties(session) for session in sessions_list]
+    pool = _smtc_pool()
+    futures = [pool.submit(_read_session_safely, idx, session, op)
+               for idx, (session, op) in enumerate(zip(sessions_list, pending))]
+    return [future.result() for future in futures]
+
+def _select_now_playing(records):
+    """Pick the session reported by /nowplaying. Returns (record or None, payload)."""
+    # Prefer the Apple Music session if present, then the first session that is playing.
+    # Playback status is used when available, but sessions with metadata also qualify
+    # because some players report playback state without exposing title/artist.
+    ordered = list(records)
+    for i, record in enumerate(ordered):
+        if (record["appId"] or "").startswith(APPLE_MUSIC_PREFIX):
+            if i:
+                print(f"[SMTC DEBUG] Preferred Apple Music session found at index {i}: {record['appId']}")
+                ordered.insert(0, ordered.pop(i))
+            break
+
+    for record in ordered:
+        app_id = record["appId"]
+        session = record["_session"]
+        control = record["_control"]
+        playback_status = record["_playback_status"]
+        payload = {
+            "playing": True,
+            "title": record["title"],
+            "artist": record["artist"],
+            "album": record["album"],
+            "appId": app_id,
+            "status": record["status"],
+        }
+
+        # Heuristic: Apple Music may report a status that doesn't read as playing while its
+        # metadata is inaccessible in this runtime; treat it as playing anyway.
+        if not record["playing"] and (app_id or "").startswith(APPLE_MUSIC_PREFIX) and playback_status is not None:
+            if record["title"] or record["artist"]:
+                _smtc_debug_log("Returning Apple full metadata", payload, session=session, control=control, playback_status=playback_status)
+            else:
+                print(f"[SMTC DEBUG] Returning minimal playing payload for Apple Music (app_id: {app_id}, playback_status: {playback_status})")
+                _smtc_debug_log("Returning Apple minimal payload", payload, session=session, control=control, playback_status=playback_status)
+            return record, payload
+
+        if record["_metadata_error"] is not None:
+            # If we cannot read metadata but playback indicates active, return minimal payload
+            if record["playing"]:
+                _smtc_debug_log(f"Metadata read failed; returning minimal payload: {record['_metadata_error']}", payload, session=session, control=None, playback_status=playback_status)
+                return record, payload
+            continue
+
+        # If the session is playing, return it even if metadata is sparse.
+        if record["playing"] or record["title"] or record["artist"]:
+            payload["playing"] = record["playing"]
+            if record.get("artworkHash"):
+                payload["artworkHash"] = record["artworkHash"]
+                payload["artworkPath"] = record["artworkPath"]
+                for key in ("artworkPlaceholder", "palette"):
+                    if record.get(key):
+                        payload[key] = record[key]
+            # Cache last known non-empty metadata for this app
+            if (record["title"] or record["artist"]) and app_id:
+                LAST_KNOWN_META[app_id] = {"title": record["title"], "artist": record["artist"], "album": record["album"]}
+            _smtc_debug_log("Returning session payload", payload, session=session, control=control, playback_status=playback_status)
+            return record, payload
+
+    payload = {"playing": False, "error": "No active media session"}
+    _smtc_debug_log("No active media session", payload, session=None)
+    return None, payload
+
+def get_windows_smtc_state():
+    """Read all media sessions via Windows SMTC (supports UWP/Store apps like Apple Music).
+
+    Every session is captured in a single enumeration. Returns (payload, sessions): the
+    payload of the selected session (as served by /nowplaying) and all session records.
+    """
+    try:
+        records, error = read_windows_smtc_sessions()
+        if error is not None:
+            return error, []
+        return _state_from_records(records, lambda record, advancing: _get_timeline(record["_session"], advancing))
     except Exception as e:
-        return json.dumps({"playing": False, "error": f"Unexpected SMTC error: {e}"})
- 
-# Cross-platform wrapper used by the server
-def get_now_playing():
-    """Return JSON string describing current playback; dispatches per-platform."""
+        return {"playing": False, "error": f"Unexpected SMTC error: {e}"}, []
+
+def _state_from_records(records, get_timeline):
+    """Select the reported session from provider records. Returns (payload, public session records).
+
+    get_timeline(record, advancing) returns (position, duration) in seconds or None.
+    """
+    selected, payload = _select_now_playing(records)
+    if selected is not None:
+        # Track timeline feeds the overlay's poll scheduling hint
+        advancing = selected["status"] == "playing"
+        timeline = get_timeline(selected, advancing)
+        if timeline:
+            PLAYBACK_CLOCK.update(timeline[0], timeline[1], advancing)
+    if payload.get("artworkHash"):
+        _write_cover_file(payload["artworkHash"])
+    return payload, [_public_session(record) for record in records]
+
+def get_windows_smtc_track():
+    """Attempt to read current media session via Windows SMTC. Returns a JSON string."""
+    payload, _ = get_windows_smtc_state()
+    return json.dumps(payload)
+
+# ---------------------------------------------------------
+# Linux: MPRIS2 players on the D-Bus session bus (see mpris_provider.py)
+
+# Seconds the first sample waits for the initial scan of players
+MPRIS_STARTUP_WAIT = 2.0
+# Seconds before a watcher that stopped (e.g. the bus went away) is started again
+MPRIS_RETRY_SECONDS = 10.0
+_MPRIS_WATCHER = None
+_MPRIS_STARTED = 0.0
+_MPRIS_LOCK = threading.Lock()
+
+def _store_mpris_art(data):
+    return ARTWORK.put(data, current=False)
+
+def _on_mpris_change():
+    # Players push their changes, so publish right away instead of waiting for the next poll
+    sample_now_playing()
+
+def _mpris_watcher():
+    global _MPRIS_WATCHER, _MPRIS_STARTED
+    with _MPRIS_LOCK:
+        watcher = _MPRIS_WATCHER
+        if watcher is None or (not watcher.is_alive() and time.monotonic() - _MPRIS_STARTED > MPRIS_RETRY_SECONDS):
+            watcher = MprisWatcher(load_art=_store_mpris_art, on_change=_on_mpris_change)
+            watcher.start()
+            _MPRIS_WATCHER = watcher
+            _MPRIS_STARTED = time.monotonic()
+        return watcher
+
+def _mpris_record(watcher, snap):
+    """Session record (same shape as _read_smtc_session's) for an MPRIS player snapshot."""
+    status = snap["status"]
+    record = {
+        "appId": snap["appId"],
+        "status": status,
+        "playing": status in ("playing", "paused"),
+        "title": snap["title"],
+        "artist": snap["artist"],
+        "album": snap["album"],
+        "_session": None,
+        "_playback_status": status,
+        "_control": None,
+        "_metadata_error": None,
+        "_timeline": (snap["position"], snap["duration"]),
+    }
+    digest = snap["artDigest"]
+    if digest and ARTWORK.get(digest) is None:
+        # Evicted from the artwork cache by other covers: read the file again
+        digest = watcher.reload_art(snap["appId"])
+    _attach_artwork(record, digest)
+    return record
+
+def _mpris_timeline(record, advancing):
+    position, duration = record["_timeline"]
+    if position is None or not duration:
+        return None
+    return position, duration
+
+def get_mpris_state():
+    """Read all MPRIS players from the watcher's cache. Returns (payload, sessions) like get_windows_smtc_state()."""
+    try:
+        watcher = _mpris_watcher()
+        if not watcher.wait_ready(MPRIS_STARTUP_WAIT):
+            return {"playing": False, "error": "Waiting for D-Bus"}, []
+        if watcher.error and not watcher.is_alive():
+            return {"playing": False, "error": f"MPRIS unavailable: {watcher.error}"}, []
+        records = [_mpris_record(watcher, snap) for snap in watcher.players()]
+        return _state_from_records(records, _mpris_timeline)
+    except Exception as e:
+        return {"playing": False, "error": f"Unexpected MPRIS error: {e}"}, []
+
+# --- Relay (dual-PC setups) ---
+_RELAY_RECEIVER = None
+
+def _relay_state():
+    """(version, state) sent by RelaySender: the published state plus the playback clock."""
+    version, payload, sessions = NOW_PLAYING.snapshot_all()
+    return version, {"payload": payload, "sessions": sessions, "clock": PLAYBACK_CLOCK.snapshot()}
+
+def _store_relay_art(data):
+    return ARTWORK.put(data, current=False)
+
+def _has_artwork(digest):
+    return ARTWORK.get(digest) is not None
+
+def _on_relay_change():
+    # The sender pushes its changes, so publish right away instead of waiting for the next poll
+    sample_now_playing()
+
+def get_relay_state():
+    """Return (payload, sessions) mirrored from the relay sender; marked stale while it is disconnected."""
+    receiver = _RELAY_RECEIVER
+    state, received_at, connected = receiver.snapshot() if receiver else (None, 0.0, False)
+    if not state or not isinstance(state.get("payload"), dict):
+        return {"playing": False, "error": "Waiting for relay"}, []
+    payload = dict(state["payload"])
+    clock = state.get("clock")
+    if clock and connected:
+        position = clock.get("position")
+        if position is not None and clock.get("playing"):
+            position += time.monotonic() - received_at
+        PLAYBACK_CLOCK.update(position, clock.get("duration"), bool(clock.get("playing")))
+    if payload.get("artworkHash"):
+        _write_cover_file(payload["artworkHash"])
+    if not connected:
+        payload["stale"] = True
+    return payload, list(state.get("sessions") or [])
+
+def _start_relay_receiver():
+    global _RELAY_RECEIVER
+    receiver = RelayReceiver(parse_address(RELAY_LISTEN), on_change=_on_relay_change,
+                             put_artwork=_store_relay_art, has_artwork=_has_artwork, token=RELAY_TOKEN)
+    _RELAY_RECEIVER = receiver
+    receiver.start()
+    _PUSH_OUTPUTS.append(receiver)
+
+# Cross-platform wrappers used by the server
+def get_now_playing_state():
+    """Return (payload, sessions) describing current playback; dispatches per-platform."""
     try:
+        if RELAY_LISTEN:
+            return get_relay_state()
         pf = platform.system()
         if pf == "Windows":
-            return get_windows_smtc_track()
+            return get_windows_smtc_state()
+        elif pf == "Linux":
+            return get_mpris_state()
         else:
             # macOS AppleScript support removed in this Windows-focused fork
-            return json.dumps({"playing": False, "error": f"Unsupported platform for this fork: {pf}"})
+            return {"playing": False, "error": f"Unsupported platform for this fork: {pf}"}, []
     except Exception as e:
-        return json.dumps({"playing": False, "error": f"Now playing wrapper error: {e}"})
+        return {"playing": False, "error": f"Now playing wrapper error: {e}"}, []
+
+def get_now_playing():
+    """Return JSON string describing current playback; dispatches per-platform."""
+    payload, _ = get_now_playing_state()
+    return json.dumps(payload)
+
+def pinned_payload(sessions, app):
+    """Payload for the session whose app id contains `app` (case-insensitive), from a snapshot."""
+    needle = app.lower()
+    for record in sessions or []:
+        if needle in (record.get("appId") or "").lower():
+            return dict(record)
+    return {"playing": False, "appId": app}
+
+# Serializes provider access between HTTP requests and the background poller
+_SAMPLE_LOCK = threading.Lock()
+
+def sample_now_playing(max_age=None):
+    """Sample the provider once and publish the result. Returns (version, payload).
+
+    With max_age, a sample taken less than max_age seconds ago is reused, so requests that
+    queued behind a sample share its result instead of walking the provider again.
+    """
+    # While only restored state exists, requests get it at once instead of queuing
+    # behind the first live sample
+    with TRACER.span("sample.wait"):
+        acquired = _SAMPLE_LOCK.acquire(blocking=not is_stale(NOW_PLAYING.payload))
+    if not acquired:
+        return NOW_PLAYING.snapshot()
+    try:
+        if max_age is not None and NOW_PLAYING.payload is not None \
+                and time.time() - NOW_PLAYING.published_at < max_age:
+            return NOW_PLAYING.snapshot()
+        with PROFILER.profiled(), TRACER.span("sample"):
+            # Providers that know the track timeline update the clock again during the sample
+            PLAYBACK_CLOCK.clear()
+            started = time.monotonic()
+            payload, sessions = get_now_playing_state()
+            PROVIDER_LOAD.record(time.monotonic() - started)
+            if not isinstance(payload, dict):
+                payload = {"playing": False, "error": "Invalid provider payload"}
+            version, _ = NOW_PLAYING.publish(payload, sessions)
+        return version, payload
+    finally:
+        _SAMPLE_LOCK.release()
+
+def is_stale(payload):
+    """True for a payload restored from the warm-state file and not yet replaced by a live sample."""
+    return bool(payload and payload.get("stale"))
+
+def poll_hint_ms(payload, use_clock=True):
+    """Suggested delay before a client's next /nowplaying poll, in milliseconds.
+
+    use_clock=False skips the track-end prediction (the clock follows the selected session only).
+    """
+    payload = payload or {}
+    if is_stale(payload):
+        return POLL_STALE_MS
+    remaining = PLAYBACK_CLOCK.remaining() if use_clock and payload.get("playing") else None
+    if remaining is not None and remaining * 1000 < POLL_INTERVAL_MS:
+        # Land the next poll just after the track ends so the change shows up right away
+        return max(POLL_MIN_MS, int((remaining + TRACK_END_MARGIN) * 1000))
+    return POLL_INTERVAL_MS
+
+class StatePoller(threading.Thread):
+    """Samples the provider on an interval so push outputs see changes without HTTP polling."""
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        super().__init__(name="jamdeck-poller", daemon=True)
+        self.interval = max(0.2, float(interval))
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                sample_now_playing()
+            except Exception as e:
+                print(f"Background sample failed: {e}")
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+
+# --- ZMQ PUB output ---
+# Each message is three frames: [topic, header, body]. The header is
+# struct "!BBQ" = (schema version, encoding id, state version) so consumers can
+# drop stale or duplicate messages and detect format changes.
+ZMQ_SCHEMA_VERSION = 1
+ZMQ_TOPIC_NOWPLAYING = b"nowplaying"
+ZMQ_TOPIC_ARTWORK = b"artwork"
+ZMQ_ENCODINGS = {"json": 0, "binary": 1}
+_ZMQ_HEADER = struct.Struct("!BBQ")
+# Playback status codes used by the binary encoding (mirrors SMTC's enum)
+_ZMQ_STATUS_CODES = {"closed": 0, "opened": 1, "changing": 2, "stopped": 3, "playing": 4, "paused": 5}
+
+def _pack_str(value):
+    raw = (value or "").encode("utf-8")[:0xFFFF]
+    return struct.pack("!H", len(raw)) + raw
+
+def encode_nowplaying_binary(payload):
+    """Compact binary form of a now-playing payload.
+
+    Layout: flags (B: 1=playing, 2=has artwork, 4=has error), status code (B, 255=unknown),
+    then length-prefixed UTF-8 strings title, artist, album, appId, error, then
+    the 20-byte SHA-1 artwork digest when flag 2 is set.
+    """
+    payload = payload or {}
+    digest = payload.get("artworkHash")
+    flags = 0
+    if payload.get("playing"):
+        flags |= 1
+    if digest:
+        flags |= 2
+    if payload.get("error"):
+        flags |= 4
+    status = _ZMQ_STATUS_CODES.get(str(payload.get("status") or "").lower(), 255)
+    parts = [struct.pack("!BB", flags, status)]
+    for key in ("title", "artist", "album", "appId", "error"):
+        parts.append(_pack_str(payload.get(key)))
+    if digest:
+        parts.append(bytes.fromhex(digest))
+    return b"".join(parts)
+
+class ZmqStatePublisher(threading.Thread):
+    """Publishes versioned now-playing and artwork-hash messages on an XPUB socket.
+
+    New subscriptions are answered with the current snapshot, so late subscribers
+    get state immediately instead of waiting for the next change. The socket is
+    owned by this thread; other threads hand updates over through a queue.
+    """
+    def __init__(self, context, endpoint, encoding="json", hwm=ZMQ_PUB_HWM):
+        super().__init__(name="jamdeck-zmq-pub", daemon=True)
+        self.context = context
+        self.endpoint = endpoint
+        self.encoding = encoding if encoding in ZMQ_ENCODINGS else "json"
+        self.hwm = hwm
+        self._queue = queue.Queue(maxsize=64)
+        self._stop_event = threading.Event()
+        self._last_artwork = None
+
+    def publish(self, version, payload):
+        """State listener: queue an update for the publisher thread."""
+        try:
+            self._queue.put_nowait((version, payload))
+        except queue.Full:
+            # The publisher thread only falls behind if it is stuck; newest state wins on resync
+            pass
+
+    def stop(self):
+        self._stop_event.set()
+
+    def _frames(self, topic, version, payload):
+        header = _ZMQ_HEADER.pack(ZMQ_SCHEMA_VERSION, ZMQ_ENCODINGS[self.encoding], version)
+        payload = payload or {}
+        if topic == ZMQ_TOPIC_ARTWORK:
+            digest = payload.get("artworkHash")
+            if self.encoding == "binary":
+                body = bytes.fromhex(digest) if digest else b""
+            else:
+                body = json.dumps({"hash": digest, "path": payload.get("artworkPath")}).encode()
+        elif self.encoding == "binary":
+            body = encode_nowplaying_binary(payload)
+        else:
+            body = json.dumps(payload).encode()
+        return [topic, header, body]
+
+    def _send(self, sock, topic, version, payload):
+        try:
+            sock.send_multipart(self._frames(topic, version, payload), flags=zmq.NOBLOCK)
+        except zmq.Again:
+            # High-water mark reached; drop rather than block the server
+            pass
+        except Exception as e:
+            print(f"ZMQ publish error: {e}")
+
+    def _send_snapshot(self, sock, prefix):
+        version, payload = NOW_PLAYING.snapshot()
+        if payload is None:
+            return
+        for topic in (ZMQ_TOPIC_NOWPLAYING, ZMQ_TOPIC_ARTWORK):
+            if topic.startswith(prefix):
+                self._send(sock, topic, version, payload)
+
+    def run(self):
+        try:
+            sock = self.context.socket(zmq.XPUB)
+            sock.setsockopt(zmq.SNDHWM, self.hwm)
+            sock.setsockopt(zmq.LINGER, 0)
+            # Deliver every subscribe message (not only the first per topic) so each new
+            # subscriber triggers its own snapshot
+            sock.setsockopt(zmq.XPUB_VERBOSE, 1)
+            sock.bind(self.endpoint)
+        except Exception as e:
+            print(f"ZMQ publisher failed to bind {self.endpoint}: {e}")
+            return
+        print(f"ZMQ publisher bound to {self.endpoint} ({self.encoding})")
+        poller = zmq.Poller()
+        poller.register(sock, zmq.POLLIN)
+        try:
+            while not self._stop_event.is_set():
+                events = dict(poller.poll(100))
+                if sock in events:
+                    try:
+                        msg = sock.recv(zmq.NOBLOCK)
+                        if msg and msg[0] == 1:
+                            self._send_snapshot(sock, msg[1:])
+                    except zmq.Again:
+                        pass
+                while True:
+                    try:
+                        version, payload = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    self._send(sock, ZMQ_TOPIC_NOWPLAYING, version, payload)
+                    digest = (payload or {}).get("artworkHash")
+                    if digest != self._last_artwork:
+                        self._last_artwork = digest
+                        self._send(sock, ZMQ_TOPIC_ARTWORK, version, payload)
+        finally:
+            sock.close()
+
+# Running push outputs (ZMQ publisher, OBS sink, file export, relay, background poller)
+_PUSH_OUTPUTS = []
+
+def _default_export_dir():
+    return os.path.join(_runtime_dir(), "jamdeck_export")
+
+def _start_push_outputs():
+    """Start configured push outputs and the poller that feeds them."""
+    if ZMQ_PUB_ENDPOINT and zmq_context is not None:
+        publisher = ZmqStatePublisher(zmq_context, ZMQ_PUB_ENDPOINT, encoding=ZMQ_PUB_ENCODING)
+        NOW_PLAYING.add_listener(publisher.publish)
+        publisher.start()
+        _PUSH_OUTPUTS.append(publisher)
+    if OBS_WS_URL:
+        sink = ObsWebSocketSink(
+            OBS_WS_URL,
+            password=OBS_WS_PASSWORD,
+            title_source=OBS_TITLE_SOURCE,
+            artist_source=OBS_ARTIST_SOURCE,
+            artwork_source=OBS_ARTWORK_SOURCE,
+            artwork_dir=_runtime_dir(),
+            get_artwork=ARTWORK.get,
+        )
+        NOW_PLAYING.add_listener(sink.update)
+        sink.start()
+        _PUSH_OUTPUTS.append(sink)
+    if EXPORT_DIR is not None:
+        exporter = FileExportSink(EXPORT_DIR or _default_export_dir(), get_artwork=ARTWORK.get)
+        NOW_PLAYING.add_listener(exporter.update)
+        exporter.start()
+        _PUSH_OUTPUTS.append(exporter)
+    if RELAY_TO:
+        sender = RelaySender(parse_address(RELAY_TO, default_host="127.0.0.1"), _relay_state, ARTWORK.get,
+                             BOOT_ID, token=RELAY_TOKEN)
+        NOW_PLAYING.add_listener(sender.update)
+        sender.start()
+        _PUSH_OUTPUTS.append(sender)
+    if _PUSH_OUTPUTS:
+        poller = StatePoller(SAMPLE_INTERVAL)
+        poller.start()
+        _PUSH_OUTPUTS.append(poller)
+
+# --- Warm state ---
+def _warm_state_path():
+    return os.path.join(_runtime_dir(), WARM_STATE_FILE)
+
+def _warm_state_snapshot():
+    """(state, artwork) for the warm-state file: the published state plus the caches it relies on."""
+    _, payload = NOW_PLAYING.snapshot()
+    _, sessions = NOW_PLAYING.snapshot_sessions()
+    state = {
+        "payload": payload,
+        "sessions": sessions,
+        "meta": dict(LAST_KNOWN_META),
+        "thumbnails": {app_id: [list(track_key), digest]
+                       for app_id, (track_key, digest) in list(_THUMBNAIL_CACHE.items()) if digest},
+    }
+    return state, ARTWORK.export()
+
+def restore_warm_state():
+    """Publish the saved state, marked stale, before the first live sample. Returns True if restored."""
+    loaded = load_warm_state(_warm_state_path())
+    if loaded is None:
+        return False
+    state, artwork = loaded
+    payload = state.get("payload")
+    if not isinstance(payload, dict) or payload.get("error"):
+        return False
+    ARTWORK.restore(artwork)
+    LAST_KNOWN_META.update(state.get("meta") or {})
+    for app_id, (track_key, digest) in (state.get("thumbnails") or {}).items():
+        if ARTWORK.get(digest) is not None:
+            _THUMBNAIL_CACHE[app_id] = (tuple(track_key), digest)
+    if payload.get("artworkHash"):
+        # Refresh the cover file, which may belong to an older track
+        _write_cover_file(payload["artworkHash"])
+    NOW_PLAYING.restore(dict(payload, stale=True), state.get("sessions"))
+    print(f"Restored warm state: {payload.get('title') or 'nothing playing'} (stale until the first sample)")
+    return True
+
+def _start_warm_state_writer():
+    writer = WarmStateWriter(_warm_state_path(), _warm_state_snapshot)
+    NOW_PLAYING.add_listener(writer.update)
+    writer.start()
+    _PUSH_OUTPUTS.append(writer)
+
+def _stop_push_outputs():
+    while _PUSH_OUTPUTS:
+        output = _PUSH_OUTPUTS.pop()
+        try:
+            output.stop()
+            output.join(timeout=1.0)
+        except Exception:
+            pass
+
+# --- Tray control channel ---
+CONTROL = None
+
+def _control_status():
+    """Status reported to the tray: why output is degraded (or None) and how many overlays are connected."""
+    _, payload = NOW_PLAYING.snapshot()
+    payload = payload or {}
+    degraded = None
+    if payload.get("error"):
+        degraded = payload["error"]
+    elif is_stale(payload):
+        degraded = "Showing saved state"
+    elif PROVIDER_LOAD.retry_after() is not None:
+        degraded = "Media provider is slow"
+    return {"degraded": degraded, "clients": LIMITER.active_clients()}
+
+def _start_control_channel(port):
+    global CONTROL
+    if not CONTROL_ENDPOINT or zmq_context is None or CONTROL is not None:
+        return
+    CONTROL = ControlPublisher(zmq_context, CONTROL_ENDPOINT, get_status=_control_status)
+    NOW_PLAYING.add_listener(CONTROL.track)
+    CONTROL.start()
+    CONTROL.send(EVENT_PORT, port=port)
+
+def _stop_control_channel():
+    global CONTROL
+    control, CONTROL = CONTROL, None
+    if control is None:
+        return
+    NOW_PLAYING.remove_listener(control.track)
+    control.stop()
+    # The thread must close its socket before the ZMQ context can terminate
+    control.join(timeout=2.0)
+
+# --- Listening statistics ---
+STATS = None
+
+def _start_listening_stats():
+    """Record plays from state changes; as a push output it also keeps the poller sampling."""
+    global STATS
+    try:
+        stats = ListeningStats(os.path.join(_runtime_dir(), STATS_FILE), get_clock=PLAYBACK_CLOCK.snapshot)
+    except Exception as e:
+        print(f"Listening stats unavailable: {e}")
+        return
+    NOW_PLAYING.add_listener(stats.update)
+    # The first sample was published before the listener was added
+    version, payload = NOW_PLAYING.snapshot()
+    if payload is not None:
+        stats.update(version, payload)
+    stats.start()
+    _PUSH_OUTPUTS.append(stats)
+    STATS = stats
+
+# --- Instance registry ---
+_INSTANCE_LOCK = None
+
+def _claim_instance():
+    """Take the instance lock. Returns False (after reporting it) if a healthy server is already running."""
+    global _INSTANCE_LOCK
+    runtime_dir = _runtime_dir()
+    lock = InstanceLock(os.path.join(runtime_dir, LOCK_FILE))
+    if lock.acquire():
+        _INSTANCE_LOCK = lock
+        # Left over from a server that did not exit cleanly
+        remove_registry(runtime_dir)
+        return True
+    existing = find_running_instance(runtime_dir, wait=REGISTRY_WAIT)
+    if existing is None:
+        print("Another server holds the instance lock but does not answer; starting without registering")
+        return True
+    print(f"Jam Deck is already running (pid {existing['pid']}) on port {existing['port']}")
+    print(f"JAMDECK_PORT={existing['port']}")
+    return False
+
+def _register_instance(port):
+    if _INSTANCE_LOCK is None:
+        return
+    try:
+        write_registry(_runtime_dir(), port, VERSION, BOOT_ID)
+    except Exception as e:
+        print(f"Could not write instance registry: {e}")
+
+def _release_instance():
+    global _INSTANCE_LOCK
+    lock, _INSTANCE_LOCK = _INSTANCE_LOCK, None
+    if lock is None:
+        return
+    remove_registry(_runtime_dir(), pid=os.getpid())
+    lock.release()
 
 # Create custom HTTP request handler
 class MusicHandler(BaseHTTPRequestHandler):
     def log_message(self, format, *args):
         # Print to stdout instead of stderr for better visibility
-        print(f"{self.address_string()} - - [{self.log_date_time_string()}] {format % args}")
+        if not QUIET:
+            print(f"{self.address_string()} - - [{self.log_date_time_string()}] {format % args}")
+
+    def _client_key(self, query):
+        # Overlays on one machine share an IP, so they also identify themselves with ?client=
+        client_id = query.get('client', [''])[0] or self.headers.get('User-Agent', '')
+        return self.client_address[0], client_id[:64]
+
+    def _sample_limited(self, query):
+        """Sample the provider unless this client or the server is over its limit.
+
+        Returns (version, payload, retry_after). retry_after is None for a fresh sample;
+        otherwise payload is the cached state (or None if there is none yet).
+        """
+        wait = LIMITER.take(self._client_key(query))
+        if wait:
+            LIMITER.count("rejected_client")
+            return self._cached_state(wait)
+        if not LIMITER.admit():
+            LIMITER.count("rejected_global")
+            return self._cached_state(1)
+        try:
+            version, payload = sample_now_playing(max_age=FRESH_SAMPLE_AGE)
+        finally:
+            LIMITER.release()
+        LIMITER.count("sampled")
+        return version, payload, None
+
+    def _patch_base(self, query, pin):
+        """The payload the client already has for ?since=<version>&boot=<id>, or None.
+
+        None means a full payload must be sent: no since, a version from another server
+        run, or one that has left the state history.
+        """
+        since = query.get('since', [''])[0]
+        if not since or query.get('boot', [''])[0] != BOOT_ID:
+            return None
+        try:
+            entry = NOW_PLAYING.at_version(int(since))
+        except ValueError:
+            return None
+        if entry is None:
+            return None
+        payload, sessions = entry
+        if pin:
+            return pinned_payload(sessions, pin)
+        return payload
+
+    def _hold_while_unchanged(self, query, pin, version, payload, base):
+        """Hold a ?wait=<ms> request while the client's state (base) is still the current one.
+
+        Returns (version, payload, held). held is False when the request was answered at
+        once: no wait asked for, a restored or slow-to-sample state, or too many held requests.
+        """
+        try:
+            wait = min(LONG_POLL_MAX_MS, int(query.get('wait', ['0'])[0])) / 1000
+        except ValueError:
+            return version, payload, False
+        address = self.client_address[0]
+        if wait <= 0 or is_stale(payload) or PROVIDER_LOAD.retry_after() \
+                or not HELD_REQUESTS.acquire(address):
+            return version, payload, False
+        deadline = time.monotonic() + wait
+        try:
+            while payload == base:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                NOW_PLAYING.wait_for_change(version, min(remaining, LONG_POLL_SAMPLE_INTERVAL))
+                # Held requests share one sample per interval
+                version, payload = sample_now_playing(max_age=LONG_POLL_SAMPLE_INTERVAL)
+                if pin:
+                    version, sessions = NOW_PLAYING.snapshot_sessions()
+                    payload = pinned_payload(sessions, pin)
+        finally:
+            HELD_REQUESTS.release(address)
+        return version, payload, True
+
+    def _cached_state(self, wait):
+        version, payload = NOW_PLAYING.snapshot()
+        if payload is not None:
+            LIMITER.count("degraded")
+        return version, payload, max(1, math.ceil(wait))
+
+    def _send_rate_limited(self, retry_after):
+        self.send_response(429)
+        self.send_header('Content-type', 'application/json')
+        self.send_header('Retry-After', str(retry_after))
+        self.send_header('Access-Control-Expose-Headers', 'Retry-After')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+        self.wfile.write(json.dumps({"playing": False, "error": "Rate limited"}).encode())
     
+    def _send_debug_disabled(self):
+        self.send_response(404)
+        self.send_header('Content-type', 'text/plain')
+        self.end_headers()
+        self.wfile.write(b'Debug endpoints are disabled; start the server with --trace')
+
     def do_GET(self):
+        path = urlparse(self.path).path
+        if path.startswith('/debug/') or not (TRACER.enabled or PROFILER.active):
+            self._handle_get()
+            return
+        if TRACER.enabled:
+            self.wfile = TracedWriter(self.wfile, TRACER)
+        with PROFILER.profiled(), TRACER.span("GET " + path):
+            self._handle_get()
+
+    def _handle_get(self):
         # Parse the URL
         parsed_path = urlparse(self.path)
         path = parsed_path.path
-        print(f"Request received: {path}")
+        if not QUIET:
+            print(f"Request received: {path}")
         
         # Serve static files (HTML, CSS, JS)
         if path == '/' or path.endswith('.html') or path.endswith('.css') or path.endswith('.js'):
@@ -586,9 +1813,10 @@ class MusicHandler(BaseHTTPRequestHandler):
                 file_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), file_name)
             
             # Add debugging for file resolution
-            print(f"Static file requested: {path}")
-            print(f"Resolving to path: {file_path}")
-            print(f"File exists: {os.path.exists(file_path)}")
+            if not QUIET:
+                print(f"Static file requested: {path}")
+                print(f"Resolving to path: {file_path}")
+                print(f"File exists: {os.path.exists(file_path)}")
             
             try:
                 with open(file_path, 'rb') as f:
@@ -606,7 +1834,8 @@ class MusicHandler(BaseHTTPRequestHandler):
                     content_type = 'text/html'  # default for '/' path
                 
                 content_length = len(content)
-                print(f"Serving {path} ({content_length} bytes) as {content_type}")
+                if not QUIET:
+                    print(f"Serving {path} ({content_length} bytes) as {content_type}")
                 
                 self.send_header('Content-type', content_type)
                 self.send_header('Content-Length', str(content_length))
@@ -631,38 +1860,131 @@ class MusicHandler(BaseHTTPRequestHandler):
         
         # Route requests
         if path == '/nowplaying':
-            print("Handling /nowplaying request")
-            music_data = get_now_playing()
-            
-            self.send_response(200)
+            if not QUIET:
+                print("Handling /nowplaying request")
+            query = parse_qs(parsed_path.query)
+            version, payload, limited = self._sample_limited(query)
+            if limited and payload is None:
+                self._send_rate_limited(limited)
+                return
+            use_clock = True
+            pin = query.get('app', [''])[0]
+            if pin:
+                # Pinned app: taken from the same snapshot, no extra provider call
+                version, sessions = NOW_PLAYING.snapshot_sessions()
+                pinned = pinned_payload(sessions, pin)
+                use_clock = pinned.get('appId') == payload.get('appId')
+                payload = pinned
+            base = self._patch_base(query, pin) if payload is not None else None
+            held = False
+            if base is not None and not limited and payload == base:
+                # Nothing new for this client yet: answer when there is
+                version, payload, held = self._hold_while_unchanged(query, pin, version, payload, base)
+            if base is not None:
+                # The client already has the state at ?since=: send only the fields that changed
+                music_data = json.dumps(diff_payload(base, payload), separators=(',', ':'))
+            else:
+                music_data = json.dumps(payload)
+            # A held response already waited for the change; the client asks again right away
+            poll_after = POLL_MIN_MS if held else poll_hint_ms(payload, use_clock)
+            retry_after = max(limited or 0, PROVIDER_LOAD.retry_after() or 0)
+            if retry_after:
+                poll_after = max(poll_after, retry_after * 1000)
+
+            # Over the limit: 429, but with the cached state so the client still has something to show
+            self.send_response(429 if limited else 200)
             self.send_header('Content-type', 'application/json')
+            self.send_header('X-JamDeck-Version', str(version))
+            self.send_header('X-JamDeck-Boot', BOOT_ID)
+            if base is not None:
+                self.send_header('X-JamDeck-Patch', query['since'][0])
+            self.send_header('X-JamDeck-Poll-After', str(poll_after))
+            # Lets the service worker refresh its precache when a static file changed
+            self.send_header('X-JamDeck-Assets', ASSETS.version)
+            if retry_after:
+                self.send_header('Retry-After', str(retry_after))
+            self.send_header('Access-Control-Expose-Headers', 'X-JamDeck-Version, X-JamDeck-Boot, X-JamDeck-Patch, X-JamDeck-Poll-After, X-JamDeck-Assets, Retry-After')
             self.send_header('Access-Control-Allow-Origin', '*')
             self.send_header('Access-Control-Allow-Methods', 'GET')
             self.send_header('Cache-Control', 'no-store, no-cache, must-revalidate')
             self.end_headers()
             
             # Debug the output we're sending
-            print(f"Sending JSON response: {music_data}")
+            if not QUIET:
+                print(f"Sending JSON response: {music_data}")
             
             # Always ensure we send valid JSON
             self.wfile.write(music_data.encode())
             
+        elif path == '/bootstrap':
+            # The overlay page with its CSS/JS inlined and the current state embedded:
+            # an OBS scene switch paints the right track from this one response
+            query = parse_qs(parsed_path.query)
+            version, payload, _ = self._sample_limited(query)
+            pin = query.get('app', [''])[0]
+            if pin and payload is not None:
+                version, sessions = NOW_PLAYING.snapshot_sessions()
+                payload = pinned_payload(sessions, pin)
+            assets_version = ASSETS.version
+            # The pin is user input; only its hash goes into the header
+            pin_key = hashlib.sha1(pin.encode("utf-8")).hexdigest()[:10] if pin else ""
+            etag = f'"{BOOT_ID}-{assets_version}-{version}-{pin_key}"'
+            if self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.end_headers()
+                return
+            try:
+                # Only data fixed by the cache key goes in: the page is reused, and
+                # revalidated with 304, long after it was built
+                body = BOOTSTRAP.render(assets_version, version, pin, {
+                    "version": version,
+                    "boot": BOOT_ID,
+                    "state": payload,
+                    "assets": assets_version,
+                })
+            except Exception as e:
+                print(f"Error building bootstrap page: {e}")
+                self.send_response(500)
+                self.send_header('Content-type', 'text/plain')
+                self.end_headers()
+                self.wfile.write(f"Error: {e}".encode())
+                return
+            self.send_response(200)
+            self.send_header('Content-type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('Cache-Control', 'no-cache')
+            self.send_header('ETag', etag)
+            self.end_headers()
+            self.wfile.write(body)
+
         elif path == '/artwork' or path.startswith('/artwork?'):
             # Fixed path to the artwork file (use OS temp directory)
-            artwork_path = os.path.join(_runtime_dir(), "harmony_deck_cover.jpg")
-            print(f"Serving artwork from: {artwork_path}")
-            
+            artwork_path = _cover_file_path()
+            # ?h=<sha1> addresses a specific cover in the in-memory cache
+            digest = parse_qs(parsed_path.query).get('h', [None])[0]
+
             try:
-                # Read the file
-                with open(artwork_path, 'rb') as f:
-                    file_data = f.read()
-                
+                file_data = ARTWORK.get(digest)
+                if file_data is None:
+                    if not QUIET:
+                        print(f"Serving artwork from: {artwork_path}")
+                    # Read the file
+                    with open(artwork_path, 'rb') as f:
+                        file_data = f.read()
+
                 self.send_response(200)
                 self.send_header('Content-type', 'image/jpeg')
-                self.send_header('Cache-Control', 'no-cache')  # Prevent caching
+                self.send_header('Content-Length', str(len(file_data)))
+                if digest and ARTWORK.get(digest) is not None:
+                    # Content-addressed: the bytes behind this URL never change
+                    self.send_header('Cache-Control', 'public, max-age=31536000, immutable')
+                else:
+                    self.send_header('Cache-Control', 'no-cache')  # Prevent caching
                 self.end_headers()
                 self.wfile.write(file_data)
-                print("Artwork served successfully")
+                if not QUIET:
+                    print("Artwork served successfully")
                 
             except Exception as e:
                 print(f"Error serving artwork: {e}")
@@ -671,26 +1993,253 @@ class MusicHandler(BaseHTTPRequestHandler):
                 self.end_headers()
                 self.wfile.write(b'Artwork not found')
                 
+        elif path == '/render.png':
+            query = parse_qs(parsed_path.query)
+            theme = query.get('theme', [RENDER_DEFAULT_THEME])[0]
+            if theme not in RENDER_THEMES:
+                theme = RENDER_DEFAULT_THEME
+            try:
+                width = int(query.get('width', [RENDER_DEFAULT_WIDTH])[0])
+            except ValueError:
+                width = RENDER_DEFAULT_WIDTH
+            # Widths that render the same frame share one cache entry and ETag
+            width = clamp_width(width)
+
+            version, payload, limited = self._sample_limited(query)
+            if limited and payload is None:
+                self._send_rate_limited(limited)
+                return
+            etag = f'"{BOOT_ID}-{version}-{theme}-{width}"'
+            if self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.end_headers()
+                return
+            fonts_dir = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'assets', 'fonts')
+            try:
+                png = RENDER_CACHE.get_or_render(
+                    (version, theme, width),
+                    lambda: render_frame(payload, ARTWORK.get(payload.get('artworkHash')) if payload.get('artworkHash') else None,
+                                         theme=theme, width=width, fonts_dir=fonts_dir),
+                )
+            except Exception as e:
+                print(f"Error rendering frame: {e}")
+                self.send_response(500)
+                self.send_header('Content-type', 'text/plain')
+                self.end_headers()
+                self.wfile.write(f"Render error: {e}".encode())
+                return
+            # Over the limit: 429 carrying the frame for the cached state
+            self.send_response(429 if limited else 200)
+            self.send_header('Content-type', 'image/png')
+            self.send_header('Content-Length', str(len(png)))
+            self.send_header('Cache-Control', 'no-cache')
+            self.send_header('ETag', etag)
+            if limited:
+                self.send_header('Retry-After', str(limited))
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.end_headers()
+            self.wfile.write(png)
+
+        elif path == '/sessions':
+            # Every media session from the same sample (and version) as /nowplaying
+            version, payload, limited = self._sample_limited(parse_qs(parsed_path.query))
+            if limited and payload is None:
+                self._send_rate_limited(limited)
+                return
+            version, sessions = NOW_PLAYING.snapshot_sessions()
+            body = json.dumps({"version": version, "sessions": sessions}).encode()
+            self.send_response(429 if limited else 200)
+            self.send_header('Content-type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('X-JamDeck-Version', str(version))
+            if limited:
+                self.send_header('Retry-After', str(limited))
+            self.send_header('Access-Control-Expose-Headers', 'X-JamDeck-Version, Retry-After')
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.send_header('Cache-Control', 'no-store')
+            self.end_headers()
+            self.wfile.write(body)
+
+        elif path == '/asset-manifest.json':
+            # Static assets and their combined content version, read by sw.js
+            body = json.dumps(ASSETS.get()).encode()
+            self.send_response(200)
+            self.send_header('Content-type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('Cache-Control', 'no-store')
+            self.end_headers()
+            self.wfile.write(body)
+
+        elif path == '/health':
+            # Liveness and identity for the instance registry and attaching launchers; never samples
+            version, payload = NOW_PLAYING.snapshot()
+            health = {
+                "app": "jamdeck",
+                "version": VERSION,
+                "pid": os.getpid(),
+                "port": self.server.server_port,
+                "boot": BOOT_ID,
+                "uptime": round(time.time() - STARTED_AT, 1),
+                "stateVersion": version,
+                "track": track_summary(payload),
+            }
+            health.update(_control_status())
+            body = json.dumps(health).encode()
+            self.send_response(200)
+            self.send_header('Content-type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('Cache-Control', 'no-store')
+            self.end_headers()
+            self.wfile.write(body)
+
+        elif path == '/stats':
+            # Top tracks, artists or apps: ?by=track|artist|app&window=stream|day|week|month|all&order=plays|time&limit=N
+            if STATS is None:
+                self.send_response(404)
+                self.send_header('Content-type', 'text/plain')
+                self.end_headers()
+                self.wfile.write(b'Listening stats are disabled')
+                return
+            query = parse_qs(parsed_path.query)
+            kind = query.get('by', ['track'])[0]
+            window = query.get('window', ['stream'])[0]
+            order = query.get('order', ['plays'])[0]
+            try:
+                limit = min(MAX_TOP, max(1, int(query.get('limit', ['10'])[0])))
+            except ValueError:
+                limit = 10
+            if kind not in STATS_KINDS or window not in STATS_WINDOWS or order not in STATS_ORDERS:
+                self.send_response(400)
+                self.send_header('Content-type', 'text/plain')
+                self.end_headers()
+                self.wfile.write(f"by: {'|'.join(STATS_KINDS)}, window: {'|'.join(STATS_WINDOWS)}, "
+                                 f"order: {'|'.join(STATS_ORDERS)}".encode())
+                return
+            try:
+                body = json.dumps(STATS.top(kind, window, order, limit)).encode()
+            except Exception as e:
+                print(f"Error reading listening stats: {e}")
+                self.send_response(500)
+                self.send_header('Content-type', 'text/plain')
+                self.end_headers()
+                self.wfile.write(f"Error: {e}".encode())
+                return
+            self.send_response(200)
+            self.send_header('Content-type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('Cache-Control', 'no-store')
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.end_headers()
+            self.wfile.write(body)
+
+        elif path == '/metrics':
+            # Request limiter and provider health counters
+            version, _ = NOW_PLAYING.snapshot()
+            metrics = {
+                "uptime": round(time.time() - STARTED_AT, 1),
+                "stateVersion": version,
+                "providerSampleSeconds": round(PROVIDER_LOAD.average, 4),
+                "limiter": LIMITER.metrics(),
+            }
+            body = json.dumps(metrics).encode()
+            self.send_response(200)
+            self.send_header('Content-type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('Cache-Control', 'no-store')
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.end_headers()
+            self.wfile.write(body)
+
+        elif path == '/debug/trace':
+            # Chrome trace-event JSON of the recorded spans (open in ui.perfetto.dev)
+            if not TRACE_ENABLED:
+                self._send_debug_disabled()
+                return
+            query = parse_qs(parsed_path.query)
+            body = json.dumps(TRACER.export(), separators=(',', ':')).encode()
+            if query.get('clear', [''])[0] in ('1', 'true'):
+                TRACER.clear()
+            self.send_response(200)
+            self.send_header('Content-type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('Content-Disposition', f'attachment; filename="jamdeck-trace-{int(time.time())}.json"')
+            self.send_header('Cache-Control', 'no-store')
+            self.end_headers()
+            self.wfile.write(body)
+
+        elif path == '/debug/profile':
+            # cProfile of every sample and request during the next N seconds, as a pstats report
+            if not TRACE_ENABLED:
+                self._send_debug_disabled()
+                return
+            query = parse_qs(parsed_path.query)
+            try:
+                seconds = float(query.get('seconds', ['5'])[0])
+            except ValueError:
+                seconds = 5.0
+            sort = query.get('sort', ['cumulative'])[0]
+            if sort not in ('cumulative', 'tottime', 'calls'):
+                sort = 'cumulative'
+            report = PROFILER.capture(seconds, sort=sort)
+            if report is None:
+                self.send_response(409)
+                self.send_header('Content-type', 'text/plain')
+                self.end_headers()
+                self.wfile.write(b'A profile capture is already running')
+                return
+            body = report.encode()
+            self.send_response(200)
+            self.send_header('Content-type', 'text/plain; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('Cache-Control', 'no-store')
+            self.end_headers()
+            self.wfile.write(body)
+
         elif path.startswith('/assets/fonts/'):
             # Extract the filename from the path
-            font_file = path.split('/')[-1]
-            font_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'assets', 'fonts', font_file)
-            
-            print(f"Serving font file: {font_path}")
-            
+            font_file = unquote(path.split('/')[-1])
+            fonts_dir = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'assets', 'fonts')
+            # Content-hashed WOFF2 bundle produced by build_fonts.py
+            hashed = path.startswith('/assets/fonts/dist/')
+            if hashed:
+                fonts_dir = os.path.join(fonts_dir, 'dist')
+            font_path = os.path.realpath(os.path.join(fonts_dir, font_file))
+            # The name is URL-decoded: refuse anything that resolves outside the fonts directory
+            if '/' in font_file or '\\' in font_file or '..' in font_file \
+                    or os.path.dirname(font_path) != os.path.realpath(fonts_dir):
+                self.send_response(404)
+                self.send_header('Content-type', 'text/plain')
+                self.end_headers()
+                self.wfile.write(b'Font file not found')
+                return
+
+            if not QUIET:
+                print(f"Serving font file: {font_path}")
+
             try:
                 # Open in binary mode for font files
                 with open(font_path, 'rb') as f:
                     file_data = f.read()
-                
+
                 self.send_response(200)
-                # Set the correct MIME type for TTF fonts
-                self.send_header('Content-type', 'font/ttf')
-                # Allow caching for fonts (unlike dynamic content)
-                self.send_header('Cache-Control', 'max-age=86400')  # Cache for 24 hours
+                # Set the correct MIME type for the font format
+                if font_file.lower().endswith('.woff2'):
+                    self.send_header('Content-type', 'font/woff2')
+                else:
+                    self.send_header('Content-type', 'font/ttf')
+                self.send_header('Content-Length', str(len(file_data)))
+                if hashed:
+                    # The hash in the name changes with the content, so this URL never goes stale
+                    self.send_header('Cache-Control', 'public, max-age=31536000, immutable')
+                else:
+                    # Allow caching for fonts (unlike dynamic content)
+                    self.send_header('Cache-Control', 'max-age=86400')  # Cache for 24 hours
+                self.send_header('Access-Control-Allow-Origin', '*')
                 self.end_headers()
                 self.wfile.write(file_data)
-                print(f"Font file '{font_file}' served successfully")
+                if not QUIET:
+                    print(f"Font file '{font_file}' served successfully")
                 
             except Exception as e:
                 print(f"Error serving font file: {e}")
@@ -704,7 +2253,8 @@ class MusicHandler(BaseHTTPRequestHandler):
             image_file = path.split('/')[-1]
             image_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'assets', 'images', image_file)
             
-            print(f"Serving image file: {image_path}")
+            if not QUIET:
+                print(f"Serving image file: {image_path}")
             
             try:
                 # Open in binary mode for image files
@@ -728,7 +2278,8 @@ class MusicHandler(BaseHTTPRequestHandler):
                 self.send_header('Cache-Control', 'max-age=86400')  # Cache for 24 hours
                 self.end_headers()
                 self.wfile.write(file_data)
-                print(f"Image file '{image_file}' served successfully")
+                if not QUIET:
+                    print(f"Image file '{image_file}' served successfully")
                 
             except Exception as e:
                 print(f"Error serving image file: {e}")
@@ -738,7 +2289,8 @@ class MusicHandler(BaseHTTPRequestHandler):
                 self.wfile.write(f'Image file not found: {str(e)}'.encode())
                 
         else:
-            print(f"404 Not Found: {path}")
+            if not QUIET:
+                print(f"404 Not Found: {path}")
             self.send_response(404)
             self.send_header('Content-type', 'text/plain')
             self.end_headers()
@@ -747,6 +2299,9 @@ class MusicHandler(BaseHTTPRequestHandler):
 # Start the web server, finding an available port
 def run_server(preferred_port=None): # Accept preferred_port argument
     global zmq_context # Declare zmq_context as global for this function's scope
+    if REGISTRY_ENABLED and not _claim_instance():
+        # Launchers (the tray) attach to the running instance on this exit code
+        sys.exit(EXIT_ALREADY_RUNNING)
     httpd = None
     actual_port = -1
     port_found = False
@@ -761,7 +2316,7 @@ def run_server(preferred_port=None): # Accept preferred_port argument
                 print("ZMQ context initialized")
     
             server_address = ('', preferred_port)
-            httpd = HTTPServer(server_address, MusicHandler)
+            httpd = ThreadingHTTPServer(server_address, MusicHandler)
             actual_port = preferred_port
             port_found = True # Mark as found
             # Always print the chosen port in a machine-readable form so parent processes
@@ -796,7 +2351,7 @@ def run_server(preferred_port=None): # Accept preferred_port argument
                     print("ZMQ context initialized") # Keep this informational message
 
                 server_address = ('', port_to_try)
-                httpd = HTTPServer(server_address, MusicHandler)
+                httpd = ThreadingHTTPServer(server_address, MusicHandler)
                 actual_port = port_to_try
 
                 # IMPORTANT: Print the port for the parent process BEFORE other messages
@@ -831,12 +2386,29 @@ def run_server(preferred_port=None): # Accept preferred_port argument
         cleanup()
         return
 
+    _start_control_channel(actual_port)
     try:
-        # Test the now-playing interface before starting the server (only if server started)
-        print("\nTesting now-playing interface...")
-        test_result = get_now_playing()
-        print(f"Test result: {test_result}")
+        if RELAY_LISTEN:
+            # Mirrored state arrives over the relay; a local poller is not needed
+            _start_relay_receiver()
+        restored = WARM_STATE_ENABLED and restore_warm_state()
+        if not restored:
+            # Test the now-playing interface before starting the server (only if server started)
+            print("\nTesting now-playing interface...")
+            _, test_result = sample_now_playing()
+            print(f"Test result: {json.dumps(test_result)}")
+        if STATS_ENABLED:
+            _start_listening_stats()
+        _start_push_outputs()
+        if WARM_STATE_ENABLED:
+            _start_warm_state_writer()
+        if restored:
+            # Serve the restored state right away; the first live sample replaces it
+            threading.Thread(target=sample_now_playing, name="jamdeck-first-sample", daemon=True).start()
         print("\nServer ready!")
+        _register_instance(actual_port)
+        if CONTROL is not None:
+            CONTROL.send(EVENT_READY, port=actual_port)
 
         # Start server
         httpd.serve_forever()
@@ -858,7 +2430,28 @@ if __name__ == '__main__':
     parser = argparse.ArgumentParser(description="Jam Deck Music Server")
     parser.add_argument('--port', type=int, help='Preferred port number to start the server on.')
     parser.add_argument('--debug', action='store_true', help='Enable verbose debug logging to logs/overlay.log')
+    parser.add_argument('--zmq-pub', metavar='ENDPOINT', help='Publish now-playing updates on a ZMQ PUB socket, e.g. tcp://127.0.0.1:5557')
+    parser.add_argument('--zmq-encoding', choices=sorted(ZMQ_ENCODINGS), help='Encoding for ZMQ messages (default: json)')
+    parser.add_argument('--obs-ws', metavar='URL', help='Push title/artist/artwork into OBS sources via obs-websocket, e.g. ws://127.0.0.1:4455')
+    parser.add_argument('--obs-password', help='obs-websocket password (or set JAMDECK_OBS_PASSWORD)')
+    parser.add_argument('--obs-title-source', help=f'OBS Text source for the title (default: "{DEFAULT_TITLE_SOURCE}")')
+    parser.add_argument('--obs-artist-source', help=f'OBS Text source for artist/album (default: "{DEFAULT_ARTIST_SOURCE}")')
+    parser.add_argument('--obs-artwork-source', help=f'OBS Image source for the cover (default: "{DEFAULT_ARTWORK_SOURCE}")')
+    parser.add_argument('--export-dir', nargs='?', const='', metavar='DIR', help='Write title/artist/album/artwork files for OBS sources (default dir: <runtime>/jamdeck_export)')
+    parser.add_argument('--sample-interval', type=float, help=f'Seconds between background samples for push outputs (default: {SAMPLE_INTERVAL})')
+    parser.add_argument('--smtc-reads', choices=SMTC_READ_MODES, help='Read media sessions one after another (default) or concurrently')
+    parser.add_argument('--trace', action='store_true', help='Record spans for /debug/trace and enable /debug/profile')
+    parser.add_argument('--no-warm-state', action='store_true', help='Do not save or restore the last state in the runtime dir')
+    parser.add_argument('--relay-to', metavar='HOST[:PORT]', help='Forward now-playing state to a Jam Deck instance started with --relay-listen')
+    parser.add_argument('--relay-listen', metavar='[HOST:]PORT', help='Serve overlays from state forwarded by another instance (--relay-to)')
+    parser.add_argument('--relay-token', help='Shared secret for the relay connection (or set JAMDECK_RELAY_TOKEN)')
+    parser.add_argument('--control', metavar='ENDPOINT', help='Send status events to the tray app on this ZMQ endpoint, e.g. tcp://127.0.0.1:5600')
+    parser.add_argument('--quiet', action='store_true', help='Do not print to stdout (use with --control)')
+    parser.add_argument('--no-registry', action='store_true', help='Allow a second server: do not register this one or defer to a running one')
+    parser.add_argument('--no-stats', action='store_true', help='Do not record listening statistics (/stats)')
     args = parser.parse_args()
+    if args.relay_to and args.relay_listen:
+        parser.error("--relay-to and --relay-listen cannot be combined")
     # --- End Argument Parsing ---
 
     # Force output buffering off for better debugging
@@ -883,9 +2476,50 @@ if __name__ == '__main__':
     except Exception:
         pass
 
-    # Wrap stdout to route SMTC debug lines into logs/overlay.log
+    # Push output options
+    if args.zmq_pub:
+        ZMQ_PUB_ENDPOINT = args.zmq_pub
+    if args.zmq_encoding:
+        ZMQ_PUB_ENCODING = args.zmq_encoding
+    if args.obs_ws:
+        OBS_WS_URL = args.obs_ws
+    if args.obs_password:
+        OBS_WS_PASSWORD = args.obs_password
+    if args.obs_title_source is not None:
+        OBS_TITLE_SOURCE = args.obs_title_source
+    if args.obs_artist_source is not None:
+        OBS_ARTIST_SOURCE = args.obs_artist_source
+    if args.obs_artwork_source is not None:
+        OBS_ARTWORK_SOURCE = args.obs_artwork_source
+    if args.export_dir is not None:
+        EXPORT_DIR = args.export_dir
+    if args.sample_interval:
+        SAMPLE_INTERVAL = args.sample_interval
+    if args.no_warm_state:
+        WARM_STATE_ENABLED = False
+    if args.trace:
+        TRACE_ENABLED = True
+    if args.smtc_reads:
+        SMTC_READ_MODE = args.smtc_reads
+    if args.relay_to:
+        RELAY_TO = args.relay_to
+    if args.relay_listen:
+        RELAY_LISTEN = args.relay_listen
+    if args.relay_token:
+        RELAY_TOKEN = args.relay_token
+    if args.control:
+        CONTROL_ENDPOINT = args.control
+    if args.quiet:
+        QUIET = True
+    if args.no_registry:
+        REGISTRY_ENABLED = False
+    if args.no_stats:
+        STATS_ENABLED = False
+    TRACER.enabled = TRACE_ENABLED
+
+    # Wrap stdout to route SMTC debug lines into logs/overlay.log; with --quiet everything else is dropped
     try:
-        sys.stdout = _DebugStdoutProxy(sys.stdout)
+        sys.stdout = _DebugStdoutProxy(open(os.devnull, "w", encoding="utf-8") if QUIET else sys.stdout)
     except Exception:
         pass
 
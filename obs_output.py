@@ -0,0 +1,330 @@
+# obs_output.py
+# Pushes now-playing text and artwork straight into native OBS Text/Image sources
+# over the obs-websocket v5 protocol, so scenes don't need a Browser Source.
+# Only the standard library is used: a minimal RFC 6455 client is included below.
+
+import base64
+import hashlib
+import json
+import os
+import select
+import socket
+import struct
+import threading
+import uuid
+from urllib.parse import urlparse
+
+_WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+# obs-websocket v5 opcodes
+OP_HELLO = 0
+OP_IDENTIFY = 1
+OP_IDENTIFIED = 2
+OP_REQUEST_BATCH = 8
+OP_REQUEST_BATCH_RESPONSE = 9
+
+DEFAULT_TITLE_SOURCE = "Jam Deck Title"
+DEFAULT_ARTIST_SOURCE = "Jam Deck Artist"
+DEFAULT_ARTWORK_SOURCE = "Jam Deck Artwork"
+
+class WebSocketClosed(Exception):
+    pass
+
+class WebSocketClient:
+    """Blocking text-frame WebSocket client, just enough for obs-websocket."""
+    def __init__(self, url, subprotocol=None, timeout=5.0):
+        self.url = url
+        self.subprotocol = subprotocol
+        self.timeout = timeout
+        self.sock = None
+        self._buf = b""
+
+    def connect(self):
+        parsed = urlparse(self.url)
+        if parsed.scheme != "ws":
+            raise ValueError(f"Unsupported WebSocket URL: {self.url}")
+        host = parsed.hostname or "127.0.0.1"
+        port = parsed.port or 80
+        path = parsed.path or "/"
+        key = base64.b64encode(os.urandom(16)).decode()
+        sock = socket.create_connection((host, port), timeout=self.timeout)
+        lines = [
+            f"GET {path} HTTP/1.1",
+            f"Host: {host}:{port}",
+            "Upgrade: websocket",
+            "Connection: Upgrade",
+            f"Sec-WebSocket-Key: {key}",
+            "Sec-WebSocket-Version: 13",
+        ]
+        if self.subprotocol:
+            lines.append(f"Sec-WebSocket-Protocol: {self.subprotocol}")
+        sock.sendall(("\r\n".join(lines) + "\r\n\r\n").encode())
+
+        self.sock = sock
+        self._buf = b""
+        while b"\r\n\r\n" not in self._buf:
+            chunk = sock.recv(4096)
+            if not chunk:
+                raise WebSocketClosed("Connection closed during handshake")
+            self._buf += chunk
+        head, self._buf = self._buf.split(b"\r\n\r\n", 1)
+        head_lines = head.decode("latin-1").split("\r\n")
+        if " 101 " not in head_lines[0] + " ":
+            raise WebSocketClosed(f"Handshake rejected: {head_lines[0]}")
+        headers = {}
+        for line in head_lines[1:]:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        expected = base64.b64encode(hashlib.sha1((key + _WS_GUID).encode()).digest()).decode()
+        if headers.get("sec-websocket-accept") != expected:
+            raise WebSocketClosed("Handshake failed: bad Sec-WebSocket-Accept")
+
+    def close(self):
+        sock, self.sock = self.sock, None
+        if sock is None:
+            return
+        try:
+            self._send_frame(0x8, b"", sock=sock)
+        except Exception:
+            pass
+        try:
+            sock.close()
+        except Exception:
+            pass
+
+    def _send_frame(self, opcode, data, sock=None):
+        sock = sock or self.sock
+        if sock is None:
+            raise WebSocketClosed("Not connected")
+        length = len(data)
+        header = bytearray([0x80 | opcode])
+        # Client frames must be masked
+        if length < 126:
+            header.append(0x80 | length)
+        elif length < 0x10000:
+            header.append(0x80 | 126)
+            header += struct.pack("!H", length)
+        else:
+            header.append(0x80 | 127)
+            header += struct.pack("!Q", length)
+        mask = os.urandom(4)
+        header += mask
+        if length:
+            # XOR the payload with the repeated mask in one big-int operation
+            repeated = (mask * (length // 4 + 1))[:length]
+            masked = (int.from_bytes(data, "big") ^ int.from_bytes(repeated, "big")).to_bytes(length, "big")
+        else:
+            masked = b""
+        sock.sendall(bytes(header) + masked)
+
+    def send_text(self, text):
+        self._send_frame(0x1, text.encode("utf-8"))
+
+    def _read_exact(self, n):
+        while len(self._buf) < n:
+            chunk = self.sock.recv(max(4096, n - len(self._buf)))
+            if not chunk:
+                raise WebSocketClosed("Connection closed")
+            self._buf += chunk
+        data, self._buf = self._buf[:n], self._buf[n:]
+        return data
+
+    def readable(self, timeout):
+        """True when a frame can be read without blocking for longer than timeout."""
+        if self._buf:
+            return True
+        if self.sock is None:
+            return False
+        ready, _, _ = select.select([self.sock], [], [], timeout)
+        return bool(ready)
+
+    def recv_text(self):
+        """Return the next text message, answering pings transparently."""
+        fragments = []
+        while True:
+            b1, b2 = self._read_exact(2)
+            fin = b1 & 0x80
+            opcode = b1 & 0x0F
+            length = b2 & 0x7F
+            if length == 126:
+                length = struct.unpack("!H", self._read_exact(2))[0]
+            elif length == 127:
+                length = struct.unpack("!Q", self._read_exact(8))[0]
+            mask = self._read_exact(4) if b2 & 0x80 else None
+            data = self._read_exact(length) if length else b""
+            if mask:
+                data = bytes(b ^ mask[i % 4] for i, b in enumerate(data))
+            if opcode == 0x8:
+                raise WebSocketClosed("Closed by peer")
+            if opcode == 0x9:
+                self._send_frame(0xA, data)
+                continue
+            if opcode == 0xA:
+                continue
+            fragments.append(data)
+            if fin:
+                return b"".join(fragments).decode("utf-8")
+
+def obs_auth_string(password, salt, challenge):
+    """obs-websocket v5 authentication response."""
+    secret = base64.b64encode(hashlib.sha256((password + salt).encode()).digest()).decode()
+    return base64.b64encode(hashlib.sha256((secret + challenge).encode()).digest()).decode()
+
+def _artist_line(payload):
+    # Same "Artist • Album" format as the browser overlay
+    artist = payload.get("artist") or ""
+    album = payload.get("album") or ""
+    return artist + (f" • {album}" if album else "")
+
+class ObsWebSocketSink(threading.Thread):
+    """Mirrors the published state into OBS inputs, sending only fields that changed.
+
+    Register update() as a state listener. Changes are batched into a single
+    RequestBatch per update; on disconnect the sink reconnects with backoff and
+    resends everything once identified again.
+    """
+    def __init__(self, url, password=None, title_source=DEFAULT_TITLE_SOURCE,
+                 artist_source=DEFAULT_ARTIST_SOURCE, artwork_source=DEFAULT_ARTWORK_SOURCE,
+                 artwork_dir=None, get_artwork=None):
+        super().__init__(name="jamdeck-obs-ws", daemon=True)
+        self.url = url
+        self.password = password
+        self.title_source = title_source
+        self.artist_source = artist_source
+        self.artwork_source = artwork_source
+        self.artwork_dir = artwork_dir
+        self.get_artwork = get_artwork
+        self._lock = threading.Lock()
+        self._latest = None
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self._sent = {}
+        self._artwork_files = []
+        self.client = None
+
+    def update(self, version, payload):
+        """State listener: remember the latest payload and wake the sink thread."""
+        with self._lock:
+            self._latest = payload
+        self._wake.set()
+
+    def stop(self):
+        self._stop_event.set()
+        self._wake.set()
+
+    def _identify(self, client):
+        hello = json.loads(client.recv_text())
+        if hello.get("op") != OP_HELLO:
+            raise WebSocketClosed(f"Expected Hello, got op {hello.get('op')}")
+        d = {"rpcVersion": 1, "eventSubscriptions": 0}
+        auth = (hello.get("d") or {}).get("authentication")
+        if auth:
+            if not self.password:
+                raise WebSocketClosed("OBS requires a password (--obs-password)")
+            d["authentication"] = obs_auth_string(self.password, auth["salt"], auth["challenge"])
+        client.send_text(json.dumps({"op": OP_IDENTIFY, "d": d}))
+        reply = json.loads(client.recv_text())
+        if reply.get("op") != OP_IDENTIFIED:
+            raise WebSocketClosed(f"Expected Identified, got op {reply.get('op')}")
+
+    def _artwork_file(self, digest):
+        """Write the cover under a content-hashed name so OBS reloads it. Returns the path."""
+        if not digest or not self.artwork_dir or not self.get_artwork:
+            return ""
+        path = os.path.join(self.artwork_dir, f"jamdeck_obs_cover_{digest[:16]}.jpg")
+        if not os.path.exists(path):
+            data = self.get_artwork(digest)
+            if not data:
+                return ""
+            tmp = path + ".tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        if path not in self._artwork_files:
+            self._artwork_files.append(path)
+            # Keep the previous cover around until OBS has switched away from it
+            while len(self._artwork_files) > 2:
+                old = self._artwork_files.pop(0)
+                try:
+                    os.remove(old)
+                except OSError:
+                    pass
+        return path
+
+    def _desired(self, payload):
+        payload = payload or {}
+        playing = bool(payload.get("playing"))
+        fields = {}
+        if self.title_source:
+            fields[self.title_source] = {"text": (payload.get("title") or "") if playing else ""}
+        if self.artist_source:
+            fields[self.artist_source] = {"text": _artist_line(payload) if playing else ""}
+        if self.artwork_source:
+            digest = payload.get("artworkHash") if playing else None
+            fields[self.artwork_source] = {"file": self._artwork_file(digest)}
+        return fields
+
+    def _flush(self, client):
+        with self._lock:
+            payload = self._latest
+        if payload is None:
+            return
+        requests = []
+        desired = self._desired(payload)
+        for input_name, settings in desired.items():
+            if self._sent.get(input_name) == settings:
+                continue
+            requests.append({
+                "requestType": "SetInputSettings",
+                "requestData": {"inputName": input_name, "inputSettings": settings, "overlay": True},
+            })
+        if not requests:
+            return
+        client.send_text(json.dumps({"op": OP_REQUEST_BATCH, "d": {
+            "requestId": uuid.uuid4().hex,
+            "haltOnFailure": False,
+            "executionType": 0,
+            "requests": requests,
+        }}))
+        for input_name, settings in desired.items():
+            self._sent[input_name] = settings
+
+    def _handle_message(self, text):
+        try:
+            msg = json.loads(text)
+        except Exception:
+            return
+        if msg.get("op") != OP_REQUEST_BATCH_RESPONSE:
+            return
+        for result in (msg.get("d") or {}).get("results") or []:
+            status = result.get("requestStatus") or {}
+            if not status.get("result"):
+                print(f"OBS request {result.get('requestType')} failed: {status.get('comment') or status.get('code')}")
+
+    def run(self):
+        backoff = 1.0
+        while not self._stop_event.is_set():
+            client = WebSocketClient(self.url, subprotocol="obswebsocket.json")
+            try:
+                client.connect()
+                self._identify(client)
+                print(f"Connected to OBS at {self.url}")
+                self.client = client
+                backoff = 1.0
+                # Everything is stale after a reconnect; resend the latest state in full
+                self._sent = {}
+                self._wake.set()
+                while not self._stop_event.is_set():
+                    if self._wake.is_set():
+                        self._wake.clear()
+                        self._flush(client)
+                    if client.readable(0.25):
+                        self._handle_message(client.recv_text())
+            except Exception as e:
+                if not self._stop_event.is_set():
+                    print(f"OBS connection error: {e}; retrying in {backoff:.0f}s")
+            finally:
+                self.client = None
+                client.close()
+            self._stop_event.wait(backoff)
+            backoff = min(backoff * 2, 30.0)
@@ -1,14 +1,24 @@
         // Debug mode - can be enabled via URL parameter ?debug=true
         let debugMode = false;
         
-        // How often to check for updates (in milliseconds)
+        // How often to check for updates (in milliseconds) when the server sends no hint
         const refreshInterval = 3000;
+        // Bounds for server-suggested poll delays
+        const minPollDelay = 250;
+        const maxPollDelay = 30000;
+        // Longest the server may hold a poll open waiting for a change (it caps this itself)
+        const longPollWait = 25000;
         
         // API endpoint
         const apiEndpoint = '/nowplaying';
+        // Identifies this overlay to the server's per-client rate limiter
+        const clientId = Math.random().toString(36).slice(2, 10);
         
         // Keep track of previous state
         let previousState = null;
+        // Server version (and server run) of previousState; sent as ?since= to get patches
+        let stateVersion = null;
+        let stateBoot = null;
         let containerVisible = true;
         let errorCount = 0;
         
@@ -30,6 +40,30 @@
                 params.scene = scene;
             }
             
+            // Get render mode parameter (?render=lite for the low-CPU mode)
+            const render = urlParamsObj.get('render');
+            if (render) {
+                params.render = render;
+            }
+            
+            // ?app= pins this scene to one player (matched against its app id)
+            const app = urlParamsObj.get('app');
+            if (app) {
+                params.app = app;
+            }
+            
+            // ?tint=art tints the overlay with the album art's palette
+            const tint = urlParamsObj.get('tint');
+            if (tint) {
+                params.tint = tint;
+            }
+            
+            // ?sw=off disables (and removes) the service worker asset cache
+            const sw = urlParamsObj.get('sw');
+            if (sw) {
+                params.sw = sw;
+            }
+            
             return params;
         }
         
@@ -37,6 +71,86 @@
         const urlParams = getUrlParams();
         const currentScene = urlParams.scene || 'default';
         
+        // Low-CPU render mode: only transform/opacity are animated (compositor-only),
+        // the artwork <img> is reused, and animations pause while the overlay is hidden.
+        const lowCpuMode = urlParams.render === 'lite';
+        if (lowCpuMode) {
+            document.documentElement.classList.add('render-lite');
+            if (debugMode) console.log("Low-CPU render mode enabled");
+        }
+        
+        // --- Service worker asset cache ---
+        // sw.js precaches the files in /asset-manifest.json so reloads paint from cache.
+        // The server reports its asset version on every poll; the worker rebuilds the
+        // cache in the background only when that version changes.
+        const assetCacheEnabled = 'serviceWorker' in navigator && urlParams.sw !== 'off';
+        let knownAssetVersion = null;
+        
+        if (assetCacheEnabled) {
+            navigator.serviceWorker.register('/sw.js').then(registration => {
+                if (debugMode) console.log(`[SW] Registered with scope ${registration.scope}`);
+            }).catch(error => {
+                if (debugMode) console.warn("[SW] Registration failed:", error);
+            });
+        } else if ('serviceWorker' in navigator) {
+            navigator.serviceWorker.getRegistrations().then(registrations => {
+                registrations.forEach(registration => registration.unregister());
+            });
+        }
+        
+        function checkAssetVersion(version) {
+            if (!assetCacheEnabled || !version || version === knownAssetVersion) {
+                return;
+            }
+            knownAssetVersion = version;
+            navigator.serviceWorker.ready.then(registration => {
+                if (registration.active) {
+                    if (debugMode) console.log(`[SW] Server asset version: ${version}`);
+                    registration.active.postMessage({ type: 'check-version', version: version });
+                }
+            });
+        }
+        
+        // --- Artwork palette tint ---
+        // The server computes the palette once per cover and sends it with the track,
+        // so no canvas readback is needed here.
+        const tintWithArtwork = urlParams.tint === 'art';
+        let appliedPalette = null;
+        
+        function hexToRgbList(hex) {
+            const value = parseInt(hex.slice(1), 16);
+            return `${(value >> 16) & 255}, ${(value >> 8) & 255}, ${value & 255}`;
+        }
+        
+        function applyPalette(palette) {
+            if (!tintWithArtwork) {
+                return;
+            }
+            const key = palette ? JSON.stringify(palette) : null;
+            if (key === appliedPalette) {
+                return;
+            }
+            appliedPalette = key;
+            if (palette) {
+                const rootStyle = document.documentElement.style;
+                rootStyle.setProperty('--art-dominant-rgb', hexToRgbList(palette.dominant));
+                rootStyle.setProperty('--art-accent', palette.accent);
+                rootStyle.setProperty('--art-text', palette.text);
+                rootStyle.setProperty('--art-accent-text', palette.accentText);
+            }
+            // Without a palette (no artwork) the theme's own colors apply
+            document.body.classList.toggle('art-tint', !!palette);
+            if (debugMode) console.log("[Tint] Palette:", key);
+        }
+        
+        // Swap only the theme class so other body classes survive a theme change
+        function applyThemeClass(theme) {
+            Array.from(document.body.classList)
+                .filter(cls => cls.startsWith('theme-'))
+                .forEach(cls => document.body.classList.remove(cls));
+            document.body.classList.add(`theme-${theme}`);
+        }
+        
         // Get scene-specific setting from localStorage with fallback
         function getSceneStorage(key, defaultValue) {
             // Try to get scene-specific setting first
@@ -87,7 +201,7 @@
         
         // Get saved theme or use default
         const savedTheme = getSceneStorage('musicPlayerTheme', 'natural');
-        document.body.className = `theme-${savedTheme}`;
+        applyThemeClass(savedTheme);
         
         // Get saved width setting or use default (now 'fixed')
         const savedWidth = getSceneStorage('musicPlayerWidth', 'fixed');
@@ -122,7 +236,7 @@
                 const theme = btn.dataset.theme;
                 
                 // Update body class
-                document.body.className = `theme-${theme}`;
+                applyThemeClass(theme);
                 
                 // Update active state
                 themeButtons.forEach(b => b.classList.remove('active'));
@@ -131,11 +245,11 @@
                 // Save selection with scene context
                 setSceneStorage('musicPlayerTheme', theme);
                 
-                // Re-check if scrolling is needed after theme change.
-                requestAnimationFrame(() => { 
-                    songTitleMarquee._checkNeedsScroll(); 
-                    songArtistMarquee._checkNeedsScroll();
-                });
+                // Fonts differ per theme: drop the cached font and re-check scrolling.
+                songTitleMarquee.invalidateFont();
+                songArtistMarquee.invalidateFont();
+                songTitleMarquee._checkNeedsScroll();
+                songArtistMarquee._checkNeedsScroll();
             });
         });
         
@@ -160,14 +274,47 @@
                 // Save selection with scene context
                 setSceneStorage('musicPlayerWidth', width);
                 
-                // Re-check if scrolling is needed after width change.
-                 requestAnimationFrame(() => { 
+                // The ResizeObserver in MarqueeController picks up the new container
+                // width; only browsers without it need an explicit re-check.
+                if (!('ResizeObserver' in window)) {
                     songTitleMarquee._checkNeedsScroll();
                     songArtistMarquee._checkNeedsScroll();
-                });
+                }
             });
         });
 
+        // --- Layout-free text measurement ---
+        // Canvas measureText never touches the DOM, so widths are computed without
+        // forcing a synchronous reflow. Results are memoised per (font, text) in a
+        // small LRU (a Map keeps insertion order, so the first key is the oldest).
+        const textMeasureCache = {
+            context: document.createElement('canvas').getContext('2d'),
+            entries: new Map(),
+            maxEntries: 256,
+
+            measure(font, text) {
+                const key = `${font}\u0000${text}`;
+                let width = this.entries.get(key);
+                if (width !== undefined) {
+                    // Refresh recency
+                    this.entries.delete(key);
+                    this.entries.set(key, width);
+                    return width;
+                }
+                this.context.font = font;
+                width = this.context.measureText(text).width;
+                this.entries.set(key, width);
+                if (this.entries.size > this.maxEntries) {
+                    this.entries.delete(this.entries.keys().next().value);
+                }
+                return width;
+            },
+
+            clear() {
+                this.entries.clear();
+            }
+        };
+
         // --- New Marquee Controller Logic ---
         class MarqueeController {
             // textElementId now refers to the ID of the inner span
@@ -178,33 +325,101 @@
                 this.originalText = '';
                 this.needsScroll = false;
                 this.animationFrameRequest = null;
+                // Font descriptor for canvas measurement; resolved lazily, reset on theme change
+                this.font = null;
+                this.letterSpacing = 0;
+                this.textTransform = 'none';
+                // Container width as reported by ResizeObserver (null until the first report)
+                this.containerWidth = null;
+                // Web Animations API handle used in low-CPU mode instead of the CSS class
+                this.animation = null;
+                this.paused = false;
+
+                if ('ResizeObserver' in window) {
+                    this.resizeObserver = new ResizeObserver(entries => {
+                        const entry = entries[entries.length - 1];
+                        const width = entry.contentBoxSize && entry.contentBoxSize[0]
+                            ? entry.contentBoxSize[0].inlineSize
+                            : entry.contentRect.width;
+                        if (this.containerWidth !== null && Math.abs(width - this.containerWidth) < 0.5) {
+                            return;
+                        }
+                        this.containerWidth = width;
+                        if (this.originalText) {
+                            this._checkNeedsScroll();
+                        }
+                    });
+                    this.resizeObserver.observe(this.container);
+                }
             }
 
-            _measureWidths() {
-                // Get the container width
-                const containerWidth = this.container.clientWidth;
-                
-                // Create a temporary span for accurate text measurement
-                const tempSpan = document.createElement('span');
-                
-                // Copy all styles that could affect text rendering
+            invalidateFont() {
+                this.font = null;
+            }
+
+            _cancelAnimation() {
+                if (this.animation) {
+                    this.animation.cancel();
+                    this.animation = null;
+                }
+            }
+
+            _startCompositorAnimation(scrollDistance, duration) {
+                // Same timeline as the scrollText keyframes, but with the distance baked in:
+                // no custom properties change per track, so there is no style recalculation.
+                const offset = `translateX(${scrollDistance}px)`;
+                const frames = [
+                    { offset: 0, transform: 'translateX(0)', easing: 'ease-in-out' },
+                    { offset: 0.15, transform: 'translateX(0)', easing: 'ease-in-out' },
+                    { offset: 0.30, transform: offset, easing: 'ease-in-out' },
+                    { offset: 0.35, transform: offset, easing: 'ease-in-out' },
+                    { offset: 0.50, transform: 'translateX(0)', easing: 'ease-in-out' },
+                    { offset: 1, transform: 'translateX(0)' }
+                ];
+                this.animation = this.innerElement.animate(frames, {
+                    duration: duration * 1000,
+                    delay: 2000,
+                    iterations: Infinity
+                });
+                if (this.paused) {
+                    this.animation.pause();
+                }
+            }
+
+            pause() {
+                this.paused = true;
+                if (this.animation) this.animation.pause();
+            }
+
+            resume() {
+                this.paused = false;
+                if (this.animation) this.animation.play();
+            }
+
+            _resolveFont() {
+                // Style-only read, done once per theme rather than on every update
                 const computedStyle = window.getComputedStyle(this.innerElement);
-                tempSpan.style.fontFamily = computedStyle.fontFamily;
-                tempSpan.style.fontSize = computedStyle.fontSize;
-                tempSpan.style.fontWeight = computedStyle.fontWeight;
-                tempSpan.style.letterSpacing = computedStyle.letterSpacing;
-                tempSpan.style.textTransform = computedStyle.textTransform;
-                tempSpan.style.whiteSpace = 'nowrap';
-                tempSpan.style.display = 'inline-block';
-                tempSpan.style.position = 'absolute';
-                tempSpan.style.visibility = 'hidden';
-                tempSpan.textContent = this.originalText;
-                
-                // Add to document, measure, and remove
-                document.body.appendChild(tempSpan);
-                const textWidth = tempSpan.getBoundingClientRect().width;
-                document.body.removeChild(tempSpan);
-                
+                this.font = `${computedStyle.fontStyle} ${computedStyle.fontWeight} ${computedStyle.fontSize} ${computedStyle.fontFamily}`;
+                this.letterSpacing = parseFloat(computedStyle.letterSpacing) || 0;
+                this.textTransform = computedStyle.textTransform;
+            }
+
+            _measureWidths() {
+                if (!this.font) {
+                    this._resolveFont();
+                }
+
+                // Container width comes from the ResizeObserver; older browsers fall back to a layout read
+                const containerWidth = this.containerWidth !== null ? this.containerWidth : this.container.clientWidth;
+
+                let text = this.originalText;
+                if (this.textTransform === 'uppercase') {
+                    text = text.toUpperCase();
+                } else if (this.textTransform === 'lowercase') {
+                    text = text.toLowerCase();
+                }
+                const textWidth = textMeasureCache.measure(this.font, text) + this.letterSpacing * text.length;
+
                 // Only log measurements in debug mode
                 if (debugMode) {
                     console.log(`[${this.innerElement.id}] Text: "${this.originalText}", Width: ${textWidth}px, Container: ${containerWidth}px`);
@@ -219,6 +434,7 @@
                 
                 // Reset visual state before measurement
                 this.innerElement.classList.remove('scrolling-active'); // Remove class if present
+                this._cancelAnimation();
                 // The line setting style.animation = 'none' was removed as it conflicts with the class-based animation.
                 this.innerElement.style.transform = 'translateX(0)'; // Ensure reset
                 
@@ -272,6 +488,11 @@
                              if (debugMode) console.log(`[${this.innerElement.id}] No scroll needed, using default duration.`);
                         }
 
+                        if (lowCpuMode && this.innerElement.animate) {
+                            this._startCompositorAnimation(scrollDistance, calculatedDuration);
+                            return;
+                        }
+
                         // Set custom property for animation duration with error checking
                         try {
                             // Use the newly calculated duration
@@ -282,10 +503,9 @@
                             
                             // Debug check if custom properties are supported
                             if (debugMode) {
-                                // Check if custom property was actually set
-                                const computed = window.getComputedStyle(this.innerElement);
-                                const durationValue = computed.getPropertyValue('--scroll-duration');
-                                const distanceValue = computed.getPropertyValue('--scroll-distance');
+                                // Read back the inline values (no style recalculation needed)
+                                const durationValue = this.innerElement.style.getPropertyValue('--scroll-duration');
+                                const distanceValue = this.innerElement.style.getPropertyValue('--scroll-distance');
                                 
                                 console.log(`[DEBUG] Custom properties set:
                                   --scroll-duration: ${durationValue || 'NOT SET'}
@@ -342,6 +562,7 @@
                 
                 // Reset visual state by removing animation class
                 this.innerElement.classList.remove('scrolling-active');
+                this._cancelAnimation();
                 // Ensure transform is reset (base style should handle this)
                 this.innerElement.style.transform = 'translateX(0)'; 
                 // Remove custom properties
@@ -363,7 +584,195 @@
         // Instantiate controllers for title and artist
         const songTitleMarquee = new MarqueeController('songTitle');
         const songArtistMarquee = new MarqueeController('songArtist');
+
+        // Widths measured before a web font finished loading used the fallback font
+        if (document.fonts && document.fonts.addEventListener) {
+            document.fonts.addEventListener('loadingdone', () => {
+                textMeasureCache.clear();
+                songTitleMarquee._checkNeedsScroll();
+                songArtistMarquee._checkNeedsScroll();
+            });
+        }
         // --- End Marquee Controller Logic ---
+
+        // --- Low-CPU render helpers ---
+        const fadeInKeyframes = [
+            { opacity: 0, transform: 'translateY(10px)' },
+            { opacity: 1, transform: 'translateY(0)' }
+        ];
+
+        // Restart the song-change fade-in
+        function restartFadeIn(element) {
+            if (lowCpuMode && element.animate) {
+                // A fresh Web Animation restarts the fade without resetting styles or forcing a reflow
+                element.animate(fadeInKeyframes, { duration: 500, easing: 'ease-in-out' });
+                return;
+            }
+            element.style.animation = 'none';
+            element.offsetHeight; // Trigger reflow
+            element.style.animation = 'fadeIn 0.5s ease-in-out';
+        }
+
+        // Artwork element reused across tracks in low-CPU mode
+        const artworkImg = new Image();
+        artworkImg.alt = 'Album art';
+        let pendingArtworkPath = null;
+
+        // Paint the server's tiny preview right away; the full cover cross-fades in over it
+        function showPlaceholder(artworkContainer, placeholder) {
+            artworkContainer.style.backgroundImage = `url("${placeholder}")`;
+            // Drop the previous cover (or note) so the preview is what shows
+            artworkContainer.textContent = '';
+            if (artworkContainer.className !== 'album-art') {
+                artworkContainer.className = 'album-art';
+            }
+        }
+
+        function clearPlaceholder(artworkContainer) {
+            if (artworkContainer.style.backgroundImage) {
+                artworkContainer.style.backgroundImage = '';
+            }
+        }
+
+        function fadeInArtwork(img, artworkContainer, hadPlaceholder) {
+            if (!hadPlaceholder) {
+                clearPlaceholder(artworkContainer);
+                return;
+            }
+            // Opacity only, so the cross-fade stays on the compositor
+            const fade = img.animate
+                ? img.animate([{ opacity: 0 }, { opacity: 1 }], { duration: 300, easing: 'ease-out' })
+                : null;
+            if (fade) {
+                fade.onfinish = () => {
+                    if (img.parentNode === artworkContainer) clearPlaceholder(artworkContainer);
+                };
+            } else {
+                clearPlaceholder(artworkContainer);
+            }
+        }
+
+        function showArtwork(artworkContainer, artworkPath, placeholder) {
+            pendingArtworkPath = artworkPath;
+            if (placeholder) {
+                showPlaceholder(artworkContainer, placeholder);
+            }
+            if (!lowCpuMode) {
+                // Preload the new image first
+                const newImg = new Image();
+                newImg.onload = function() {
+                    if (pendingArtworkPath !== artworkPath) return; // A newer cover arrived meanwhile
+                    artworkContainer.innerHTML = `<img src="${artworkPath}" alt="Album art">`;
+                    artworkContainer.className = 'album-art';
+                    fadeInArtwork(artworkContainer.firstChild, artworkContainer, !!placeholder);
+                };
+                newImg.src = artworkPath;
+                return;
+            }
+            // Decode before swapping so the visible <img> never waits on a decode
+            const loader = new Image();
+            loader.src = artworkPath;
+            const decoded = loader.decode ? loader.decode() : new Promise((resolve, reject) => {
+                loader.onload = resolve;
+                loader.onerror = reject;
+            });
+            decoded.then(() => {
+                if (pendingArtworkPath !== artworkPath) return; // A newer cover arrived meanwhile
+                artworkImg.src = artworkPath;
+                if (artworkImg.parentNode !== artworkContainer) {
+                    artworkContainer.textContent = '';
+                    artworkContainer.appendChild(artworkImg);
+                }
+                if (artworkContainer.className !== 'album-art') {
+                    artworkContainer.className = 'album-art';
+                }
+                fadeInArtwork(artworkImg, artworkContainer, !!placeholder);
+            }).catch(error => {
+                if (debugMode) console.warn(`[Artwork] Could not decode ${artworkPath}`, error);
+            });
+        }
+
+        function showNoteIcon(artworkContainer) {
+            pendingArtworkPath = null;
+            clearPlaceholder(artworkContainer);
+            if (lowCpuMode && artworkContainer.className === 'note-icon') {
+                return; // Already showing the note; avoid touching the DOM
+            }
+            artworkContainer.innerHTML = '♪';
+            artworkContainer.className = 'note-icon';
+        }
+
+        // Page / OBS source visibility; polling stops and animations pause while hidden
+        let documentHidden = document.hidden;
+        let obsSourceHidden = false;
+
+        // Pause every animation while nothing is visible (low-CPU mode only)
+        function updateAnimationPause() {
+            if (!lowCpuMode) return;
+            const paused = !containerVisible || documentHidden || obsSourceHidden;
+            document.documentElement.classList.toggle('animations-paused', paused);
+            [songTitleMarquee, songArtistMarquee].forEach(marquee => {
+                if (paused) {
+                    marquee.pause();
+                } else {
+                    marquee.resume();
+                }
+            });
+        }
+
+        function onVisibilityChanged() {
+            updateAnimationPause();
+            if (documentHidden || obsSourceHidden) {
+                stopPolling();
+            } else {
+                // Catch up right away instead of waiting out the old delay
+                schedulePoll(0);
+            }
+        }
+
+        document.addEventListener('visibilitychange', () => {
+            documentHidden = document.hidden;
+            onVisibilityChanged();
+        });
+        // OBS browser sources report scene visibility through this event
+        window.addEventListener('obsSourceVisibleChanged', event => {
+            obsSourceHidden = !(event.detail && event.detail.visible);
+            onVisibilityChanged();
+        });
+
+        // Report frame timing every 5 seconds in debug mode
+        function startFrameTimingReport() {
+            const reportInterval = 5000;
+            const longFrameMs = 50;
+            let last = performance.now();
+            let windowStart = last;
+            let frames = 0;
+            let worst = 0;
+            let longFrames = 0;
+
+            function tick(now) {
+                const delta = now - last;
+                last = now;
+                frames++;
+                worst = Math.max(worst, delta);
+                if (delta > longFrameMs) longFrames++;
+
+                if (now - windowStart >= reportInterval) {
+                    const fps = frames * 1000 / (now - windowStart);
+                    console.log(`[Frame] ${lowCpuMode ? 'lite' : 'default'} mode: ${fps.toFixed(1)} fps, worst ${worst.toFixed(1)} ms, ${longFrames} long frame(s) > ${longFrameMs} ms`);
+                    windowStart = now;
+                    frames = 0;
+                    worst = 0;
+                    longFrames = 0;
+                }
+                requestAnimationFrame(tick);
+            }
+            requestAnimationFrame(tick);
+        }
+
+        if (debugMode) {
+            startFrameTimingReport();
+        }
         
         // Function to show debug error
         function showDebugError(message, error) {
@@ -380,16 +789,253 @@
         }
 
         
+        // --- Poll scheduling ---
+        // Polls that send ?since= also send ?wait=, and the server answers them once the state
+        // changes (or the wait runs out). The server suggests the next delay (X-JamDeck-Poll-After,
+        // in ms), right away after a held poll, and sends Retry-After when it is overloaded.
+        let pollTimer = null;
+        let pollInFlight = false;
+        let nextPollDelay = refreshInterval;
+
+        function pollDelayFromResponse(response) {
+            let delay = refreshInterval;
+            const hint = parseInt(response.headers.get('X-JamDeck-Poll-After'), 10);
+            if (!isNaN(hint)) {
+                delay = hint;
+            }
+            const retryAfter = parseInt(response.headers.get('Retry-After'), 10);
+            if (!isNaN(retryAfter)) {
+                delay = Math.max(delay, retryAfter * 1000);
+            }
+            return Math.min(maxPollDelay, Math.max(minPollDelay, delay));
+        }
+
+        function stopPolling() {
+            clearTimeout(pollTimer);
+            pollTimer = null;
+        }
+
+        function schedulePoll(delay) {
+            stopPolling();
+            // Nothing is shown while hidden; visibility changes restart polling
+            if (documentHidden || obsSourceHidden || pollInFlight) {
+                return;
+            }
+            if (debugMode) console.log(`[Poll] Next poll in ${delay} ms`);
+            pollTimer = setTimeout(updateNowPlaying, delay);
+        }
+
+        // --- State patches ---
+        // With ?since=<version> the server answers with {"set": {...}, "unset": [...]}
+        // (X-JamDeck-Patch names the base version) instead of the full payload.
+        function sameValue(a, b) {
+            if (a === b) return true;
+            // Only nested values (the palette) need a deep comparison
+            return typeof a === 'object' && typeof b === 'object' && a !== null && b !== null
+                && JSON.stringify(a) === JSON.stringify(b);
+        }
+
+        // Names of the top-level fields that differ between two payloads
+        function changedFields(previous, data) {
+            const changed = new Set();
+            for (const key of Object.keys(data)) {
+                if (!previous || !sameValue(previous[key], data[key])) changed.add(key);
+            }
+            if (previous) {
+                for (const key of Object.keys(previous)) {
+                    if (!(key in data)) changed.add(key);
+                }
+            }
+            return changed;
+        }
+
+        // Returns the patched payload and the fields the patch touched
+        function applyStatePatch(previous, patch) {
+            const data = Object.assign({}, previous);
+            const changed = new Set();
+            for (const key of patch.unset || []) {
+                delete data[key];
+                changed.add(key);
+            }
+            for (const [key, value] of Object.entries(patch.set || {})) {
+                data[key] = value;
+                changed.add(key);
+            }
+            return { data, changed };
+        }
+
+        // Apply one now-playing payload to the page (from a poll or the /bootstrap page).
+        // changed: fields that differ from previousState, when already known from a patch
+        function renderNowPlaying(data, changed) {
+            // Add logging for parsed data and previous state in debug mode
+            if (debugMode) {
+                console.log("[Debug] Parsed data:", JSON.stringify(data));
+                console.log("[Debug] Previous state:", JSON.stringify(previousState));
+            }
+
+            if (!changed) {
+                changed = changedFields(previousState, data);
+            }
+            const first = !previousState;
+            const touched = (...keys) => first || keys.some(key => changed.has(key));
+
+            // Only update the UI if the data has changed
+            if (changed.size > 0) {
+                const container = document.getElementById('musicContainer');
+
+                if (data.playing) {
+                    // Show container if hidden
+                    if (!containerVisible) {
+                        container.classList.remove('hidden');
+                        containerVisible = true;
+                        updateAnimationPause();
+                    }
+
+                    // Animate if song changed
+                    if (touched('title')) {
+                        restartFadeIn(container);
+                    }
+
+                    // The text only depends on these fields (and was cleared while not playing)
+                    const textChanged = !previousState || !previousState.playing
+                        || touched('title', 'artist', 'album', 'appId', 'status', 'error');
+                    if (textChanged) {
+                        const songTitleEl = document.getElementById('songTitle');
+                        const songArtistEl = document.getElementById('songArtist');
+
+                        let titleText = data.title || '';
+                        let artistAlbumText = (data.artist || '') + (data.album ? ` • ${data.album}` : '');
+
+                        // Fallback: if no metadata provided but playing=true, show app name and status
+                        if (!titleText && !data.artist && data.playing) {
+                            const aumid = data.appId || '';
+                            let appName = 'Now Playing';
+                            if (aumid.includes('AppleMusic')) {
+                                appName = 'Apple Music';
+                            } else if (aumid.toLowerCase().includes('spotify')) {
+                                appName = 'Spotify';
+                            } else if (aumid) {
+                                // Derive a readable name from AUMID
+                                try {
+                                    const parts = aumid.split(/[.!]/);
+                                    appName = parts[parts.length - 1] || aumid;
+                                } catch (e) {
+                                    appName = aumid;
+                                }
+                            }
+                            const statusText = (data.status ? (data.status.charAt(0).toUpperCase() + data.status.slice(1)) : 'Playing');
+                            titleText = appName;
+                            artistAlbumText = statusText;
+                        }
+
+                        songTitleEl.classList.remove('not-playing');
+
+                        // Update text using Marquee Controllers ONLY if text changed
+                        if (!previousState || !previousState.playing || titleText !== previousState.title) {
+                            if (debugMode) console.log(`[Main] Title changed: "${previousState?.title}" -> "${titleText}"`);
+                            songTitleMarquee.updateText(titleText);
+                        }
+
+                        const prevArtistAlbumText = (previousState?.artist || '') + (previousState?.album ? ` • ${previousState.album}` : '');
+                        if (!previousState || !previousState.playing || artistAlbumText !== prevArtistAlbumText) {
+                            if (debugMode) console.log(`[Main] Artist/Album changed: "${prevArtistAlbumText}" -> "${artistAlbumText}"`);
+                            songArtistMarquee.updateText(artistAlbumText);
+                        }
+                    }
+
+                    // Update artwork
+                    const artworkContainer = document.getElementById('artworkContainer');
+
+                    if (data.artworkPath) {
+                        // Use the artworkPath provided by the JSON response
+                        if (touched('artworkPath')) {
+                            showArtwork(artworkContainer, data.artworkPath, data.artworkPlaceholder);
+                        }
+                    } else if (touched('artworkPath', 'playing')) {
+                        // No artwork, show music note
+                        showNoteIcon(artworkContainer);
+                    }
+                    if (touched('palette')) {
+                        applyPalette(data.palette);
+                    }
+
+
+                } else {
+                    // Stop marquees and clear text if not playing or error
+                    songTitleMarquee.clear(); // Clear text and stop animation
+                    songArtistMarquee.clear(); // Clear text and stop animation
+
+                    // Check the specific error message
+                    if (data.error === "Music app not running") {
+                        // If Music app isn't running, hide the container completely
+                        if (containerVisible) {
+                            container.classList.add('hidden');
+                            containerVisible = false;
+                            updateAnimationPause();
+                            if (debugMode) console.log("[Main] Music app not running, hiding container.");
+                        }
+                        // Ensure text is cleared (already done by .clear() above)
+                    } else if (data.error) {
+                        // For other errors, show "Music information unavailable"
+                        if (!containerVisible) { // Ensure container is visible for error message
+                            container.classList.remove('hidden');
+                            containerVisible = true;
+                            updateAnimationPause();
+                        }
+                        songTitleMarquee.updateText("Music information unavailable"); 
+                        document.getElementById('songTitle').classList.add('not-playing');
+                        // Artist marquee already cleared by .clear() above
+
+                        if (debugMode) {
+                            showDebugError(`Server reports issue: ${data.error}`);
+                        }
+                    } else {
+                        // If simply not playing (no error), hide the container
+                        if (containerVisible) {
+                            container.classList.add('hidden');
+                            containerVisible = false;
+                            updateAnimationPause();
+                            if (debugMode) console.log("[Main] Music not playing (no error), hiding container.");
+                        }
+                    }
+                }
+
+                previousState = data;
+            }
+
+            // Hide any error messages
+            if (!debugMode) {
+                document.getElementById('errorContainer').style.display = 'none';
+            }
+        }
+
         // Function to fetch and display song info
         function updateNowPlaying() {
-            fetch(apiEndpoint + '?t=' + new Date().getTime(), {
+            pollTimer = null;
+            pollInFlight = true;
+            nextPollDelay = refreshInterval;
+            const pinQuery = urlParams.app ? '&app=' + encodeURIComponent(urlParams.app) : '';
+            // Ask for only what changed since the state on screen
+            const since = previousState && stateVersion !== null && stateBoot !== null ? stateVersion : null;
+            const sinceQuery = since !== null
+                ? '&since=' + since + '&boot=' + encodeURIComponent(stateBoot) + '&wait=' + longPollWait : '';
+            let patchBase = null;
+            let responseVersion = null;
+            let responseBoot = null;
+            fetch(apiEndpoint + '?client=' + clientId + pinQuery + sinceQuery + '&t=' + new Date().getTime(), {
                 method: 'GET',
                 headers: {
                     'Accept': 'application/json'
                 }
             })
             .then(response => {
-                if (!response.ok) {
+                nextPollDelay = pollDelayFromResponse(response);
+                checkAssetVersion(response.headers.get('X-JamDeck-Assets'));
+                patchBase = response.headers.get('X-JamDeck-Patch');
+                responseVersion = response.headers.get('X-JamDeck-Version');
+                responseBoot = response.headers.get('X-JamDeck-Boot');
+                // 429 still carries the last known state; Retry-After already set the next delay
+                if (!response.ok && response.status !== 429) {
                     throw new Error(`Server returned ${response.status} ${response.statusText}`);
                 }
                 return response.text();
@@ -407,140 +1053,20 @@
                 
                 // Try to parse as JSON
                 try {
-                    const data = JSON.parse(text);
+                    const body = JSON.parse(text);
                     errorCount = 0; // Reset error count on success
 
-                    // Add logging for parsed data and previous state in debug mode
-                    if (debugMode) {
-                        console.log("[Debug] Parsed data:", JSON.stringify(data));
-                        console.log("[Debug] Previous state:", JSON.stringify(previousState));
-                    }
-                    
-                    // Only update the UI if the data has changed
-                    if (JSON.stringify(data) !== JSON.stringify(previousState)) {
-                        const container = document.getElementById('musicContainer');
-                        
-                        if (data.playing) {
-                            // Show container if hidden
-                            if (!containerVisible) {
-                                container.classList.remove('hidden');
-                                containerVisible = true;
-                            }
-                            
-                            // Animate if song changed
-                            if (!previousState || previousState.title !== data.title) {
-                                container.style.animation = 'none';
-                                container.offsetHeight; // Trigger reflow
-                                container.style.animation = 'fadeIn 0.5s ease-in-out';
-                            }
-                            
-                            const songTitleEl = document.getElementById('songTitle');
-                            const songArtistEl = document.getElementById('songArtist');
-                            
-                            let titleText = data.title || '';
-                            let artistAlbumText = (data.artist || '') + (data.album ? ` • ${data.album}` : '');
-                            
-                            // Fallback: if no metadata provided but playing=true, show app name and status
-                            if (!titleText && !data.artist && data.playing) {
-                                const aumid = data.appId || '';
-                                let appName = 'Now Playing';
-                                if (aumid.includes('AppleMusic')) {
-                                    appName = 'Apple Music';
-                                } else if (aumid.toLowerCase().includes('spotify')) {
-                                    appName = 'Spotify';
-                                } else if (aumid) {
-                                    // Derive a readable name from AUMID
-                                    try {
-                                        const parts = aumid.split(/[.!]/);
-                                        appName = parts[parts.length - 1] || aumid;
-                                    } catch (e) {
-                                        appName = aumid;
-                                    }
-                                }
-                                const statusText = (data.status ? (data.status.charAt(0).toUpperCase() + data.status.slice(1)) : 'Playing');
-                                titleText = appName;
-                                artistAlbumText = statusText;
-                            }
-                            
-                            songTitleEl.classList.remove('not-playing');
-                            
-                            // Update text using Marquee Controllers ONLY if text changed
-                            if (!previousState || titleText !== previousState.title) {
-                                if (debugMode) console.log(`[Main] Title changed: "${previousState?.title}" -> "${titleText}"`);
-                                songTitleMarquee.updateText(titleText);
-                            }
-                            
-                            const prevArtistAlbumText = (previousState?.artist || '') + (previousState?.album ? ` • ${previousState.album}` : '');
-                            if (!previousState || artistAlbumText !== prevArtistAlbumText) {
-                                if (debugMode) console.log(`[Main] Artist/Album changed: "${prevArtistAlbumText}" -> "${artistAlbumText}"`);
-                                songArtistMarquee.updateText(artistAlbumText);
-                            }
-                            
-                            // Update artwork
-                            const artworkContainer = document.getElementById('artworkContainer');
-                            
-                            if (data.artworkPath) {
-                                // Use the artworkPath provided by the JSON response
-                                if (!previousState || previousState.artworkPath !== data.artworkPath) {
-                                    // Preload the new image first
-                                    const newImg = new Image();
-                                    newImg.onload = function() {
-                                        artworkContainer.innerHTML = `<img src="${data.artworkPath}" alt="Album art">`;
-                                        artworkContainer.className = 'album-art';
-                                    };
-                                    newImg.src = data.artworkPath;
-                                }
-                            } else {
-                                // No artwork, show music note
-                                artworkContainer.innerHTML = '♪';
-                                artworkContainer.className = 'note-icon';
-                            }
-                            
-                            
-                        } else {
-                            // Stop marquees and clear text if not playing or error
-                            songTitleMarquee.clear(); // Clear text and stop animation
-                            songArtistMarquee.clear(); // Clear text and stop animation
-
-                            // Check the specific error message
-                            if (data.error === "Music app not running") {
-                                // If Music app isn't running, hide the container completely
-                                if (containerVisible) {
-                                    container.classList.add('hidden');
-                                    containerVisible = false;
-                                    if (debugMode) console.log("[Main] Music app not running, hiding container.");
-                                }
-                                // Ensure text is cleared (already done by .clear() above)
-                            } else if (data.error) {
-                                // For other errors, show "Music information unavailable"
-                                if (!containerVisible) { // Ensure container is visible for error message
-                                    container.classList.remove('hidden');
-                                    containerVisible = true;
-                                }
-                                songTitleMarquee.updateText("Music information unavailable"); 
-                                document.getElementById('songTitle').classList.add('not-playing');
-                                // Artist marquee already cleared by .clear() above
-                                
-                                if (debugMode) {
-                                    showDebugError(`Server reports issue: ${data.error}`);
-                                }
-                            } else {
-                                // If simply not playing (no error), hide the container
-                                if (containerVisible) {
-                                    container.classList.add('hidden');
-                                    containerVisible = false;
-                                    if (debugMode) console.log("[Main] Music not playing (no error), hiding container.");
-                                }
-                            }
-                        }
-                        
-                        previousState = data;
-                    }
-                    
-                    // Hide any error messages
-                    if (!debugMode) {
-                        document.getElementById('errorContainer').style.display = 'none';
+                    if (patchBase === null) {
+                        renderNowPlaying(body);
+                    } else if (previousState && patchBase === since) {
+                        const patched = applyStatePatch(previousState, body);
+                        renderNowPlaying(patched.data, patched.changed);
+                    } else {
+                        // A patch against a state we no longer have: the next poll asks for everything
+                        responseVersion = null;
                     }
+                    stateVersion = responseVersion;
+                    stateBoot = responseBoot;
                 } catch (parseError) {
                     showDebugError('JSON parsing error', parseError);
                     throw parseError;
@@ -557,6 +1083,10 @@
                     
                     showDebugError('Error fetching now playing info', error);
                 }
+            })
+            .then(() => {
+                pollInFlight = false;
+                schedulePoll(nextPollDelay);
             });
         }
         
@@ -567,6 +1097,22 @@
             console.log(`Width for this scene: ${savedWidth}`);
         }
         
-        // Update immediately and then at regular intervals
-        updateNowPlaying();
-        setInterval(updateNowPlaying, refreshInterval);
+        // A page served by /bootstrap embeds the state it was built with, so the first
+        // paint needs no request; polling then continues at the normal interval
+        const bootstrap = window.JAMDECK_BOOTSTRAP || null;
+        if (bootstrap && bootstrap.state) {
+            if (debugMode) console.log(`[Bootstrap] State version ${bootstrap.version}`);
+            renderNowPlaying(bootstrap.state);
+            stateVersion = bootstrap.version != null ? String(bootstrap.version) : null;
+            stateBoot = bootstrap.boot || null;
+            checkAssetVersion(bootstrap.assets);
+        }
+
+        // Update immediately (unless bootstrapped); each response schedules the next poll
+        if (documentHidden) {
+            if (debugMode) console.log("[Poll] Page hidden, waiting until it is shown");
+        } else if (bootstrap && bootstrap.state) {
+            schedulePoll(refreshInterval);
+        } else {
+            updateNowPlaying();
+        }
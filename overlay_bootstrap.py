@@ -0,0 +1,93 @@
+# overlay_bootstrap.py
+# The single-request overlay page served at /bootstrap: overlay.html with fonts.css,
+# overlay.css and overlay.js inlined, and the current now-playing state embedded as
+# window.JAMDECK_BOOTSTRAP, so the first paint shows the right track (and the artwork
+# placeholder) without waiting on further requests.
+#
+# The inlined template is rebuilt only when the asset version changes; finished pages
+# are kept in a small LRU keyed by (asset version, state version, pinned app).
+
+import html
+import json
+import os
+import threading
+from collections import OrderedDict
+
+PAGE_FILE = "overlay.html"
+# Tags in overlay.html replaced by the inlined file contents
+INLINE_STYLES = {
+    '<link rel="stylesheet" href="fonts.css">': "fonts.css",
+    '<link rel="stylesheet" href="overlay.css">': "overlay.css",
+}
+SCRIPT_TAG = '<script src="overlay.js"></script>'
+SCRIPT_FILE = "overlay.js"
+
+def _read_text(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+def _script_json(value):
+    # "<" is escaped so the data can never close the script element early
+    return json.dumps(value, separators=(",", ":")).replace("<", "\\u003c")
+
+class BootstrapPage:
+    """Builds and caches /bootstrap pages for one app directory."""
+    def __init__(self, base_dir, max_entries=16):
+        self.base_dir = base_dir
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._template = None  # (asset version, [before </head>, before the script, rest])
+        self._pages = OrderedDict()
+
+    def _build_template(self):
+        page = _read_text(os.path.join(self.base_dir, PAGE_FILE))
+        for tag, name in INLINE_STYLES.items():
+            try:
+                css = _read_text(os.path.join(self.base_dir, name))
+            except OSError:
+                continue  # keep the link; the page still works
+            page = page.replace(tag, f"<style>\n{css}\n</style>", 1)
+        script = SCRIPT_TAG
+        try:
+            js = _read_text(os.path.join(self.base_dir, SCRIPT_FILE))
+            script = "<script>\n" + js.replace("</script", "<\\/script") + "\n</script>"
+        except OSError:
+            pass
+        head, head_end, body = page.partition("</head>")
+        if not head_end:
+            head, body = "", page
+        before_script, _, rest = body.partition(SCRIPT_TAG)
+        return [head, head_end + before_script, script + rest]
+
+    def template(self, assets_version):
+        """Return the inlined page split around the two insertion points."""
+        with self._lock:
+            if self._template is not None and self._template[0] == assets_version:
+                return self._template[1]
+        parts = self._build_template()
+        with self._lock:
+            self._template = (assets_version, parts)
+            self._pages.clear()
+        return parts
+
+    def render(self, assets_version, state_version, app, bootstrap):
+        """Return the page (bytes) with `bootstrap` embedded, cached per (assets_version, state_version, app)."""
+        key = (assets_version, state_version, app)
+        with self._lock:
+            body = self._pages.get(key)
+            if body is not None:
+                self._pages.move_to_end(key)
+                return body
+        head, before_script, rest = self.template(assets_version)
+        state = bootstrap.get("state") or {}
+        preload = ""
+        if state.get("artworkPath"):
+            # Start the cover download while the rest of the page is parsed
+            preload = f'    <link rel="preload" as="image" href="{html.escape(state["artworkPath"])}">\n'
+        embedded = f"<script>window.JAMDECK_BOOTSTRAP = {_script_json(bootstrap)};</script>\n    "
+        body = (head + preload + before_script + embedded + rest).encode("utf-8")
+        with self._lock:
+            self._pages[key] = body
+            while len(self._pages) > self.max_entries:
+                self._pages.popitem(last=False)
+        return body
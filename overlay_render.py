@@ -0,0 +1,243 @@
+# overlay_render.py
+# Server-side rendering of the overlay into a single PNG frame with Pillow,
+# so low-end streaming PCs can show the now-playing card without a Browser
+# Source. Theme values mirror overlay.css; keep the two in sync.
+
+import io
+import os
+import threading
+from collections import OrderedDict
+
+# CSS pixel metrics from overlay.css (.music-container, .album-art, .song-info)
+MARGIN = 10
+PADDING_X = 20
+PADDING_Y = 10
+ART_SIZE = 50
+ART_GAP = 15
+TITLE_SIZE = 18
+ARTIST_SIZE = 14
+LINE_GAP = 4
+DEFAULT_WIDTH = 400
+MIN_WIDTH = 160
+MAX_WIDTH = 1920
+
+# family -> (bold file, regular file) under assets/fonts. The Google families are the static
+# files `build_fonts.py --download` writes; until then their themes use FALLBACK_FAMILY.
+FONT_FILES = {
+    "Comfortaa": ("Comfortaa-Bold.ttf", "Comfortaa-Regular.ttf"),
+    "Inter": ("Inter-Bold.ttf", "Inter-Regular.ttf"),
+    "Rubik": ("Rubik-Bold.ttf", "Rubik-Regular.ttf"),
+    "Quicksand": ("Quicksand-Bold.ttf", "Quicksand-Regular.ttf"),
+    "Poppins": ("Poppins-Bold.ttf", "Poppins-Regular.ttf"),
+    "JetBrains Mono": ("JetBrainsMono[wght].ttf", "JetBrainsMono[wght].ttf"),
+    "Retro Gaming": ("PressStart2P-Regular.ttf", "PressStart2P-Regular.ttf"),
+    "Atkinson Hyperlegible": ("AtkinsonHyperlegible-Bold.ttf", "AtkinsonHyperlegible-Regular.ttf"),
+}
+FALLBACK_FAMILY = "Atkinson Hyperlegible"
+
+WHITE = (255, 255, 255, 255)
+
+# Subset of overlay.css per theme: container background/border/radius, icon and text colors
+THEMES = {
+    "natural": {"font": "Comfortaa", "bg": (245, 242, 235, 217), "border": (109, 155, 120, 255), "border_width": 2, "radius": 16,
+                "icon_bg": (109, 155, 120, 255), "icon_fg": WHITE, "art_radius": 8,
+                "title": (58, 58, 58, 255), "artist": (90, 90, 90, 255)},
+    "twitch": {"font": "Inter", "bg": (35, 35, 45, 230), "border": (120, 88, 242, 128), "border_width": 1, "radius": 8,
+               "icon_bg": (100, 65, 164, 255), "icon_fg": WHITE, "art_radius": 8,
+               "title": WHITE, "artist": (184, 184, 184, 255)},
+    "dark": {"font": "Rubik", "bg": (18, 18, 18, 230), "border": (51, 51, 51, 255), "border_width": 1, "radius": 10,
+             "icon_bg": (51, 51, 51, 255), "icon_fg": (12, 192, 223, 255), "art_radius": 8,
+             "title": WHITE, "artist": (153, 153, 153, 255)},
+    "pink": {"font": "Quicksand", "bg": (255, 240, 250, 230), "border": (255, 173, 216, 255), "border_width": 2, "radius": 20,
+             "icon_bg": (255, 126, 188, 255), "icon_fg": WHITE, "art_radius": 8,
+             "title": (209, 63, 150, 255), "artist": (158, 122, 165, 255)},
+    "light": {"font": "Poppins", "bg": (255, 255, 255, 242), "border": (224, 224, 224, 255), "border_width": 1, "radius": 12,
+              "icon_bg": (77, 171, 247, 255), "icon_fg": WHITE, "art_radius": 8,
+              "title": (43, 43, 43, 255), "artist": (117, 117, 117, 255)},
+    "transparent": {"font": "Inter", "bg": None, "border": None, "border_width": 0, "radius": 0,
+                    "icon_bg": (0, 0, 0, 128), "icon_fg": WHITE, "art_radius": 0,
+                    "title": WHITE, "artist": (255, 255, 255, 230), "shadow": (0, 0, 0, 179)},
+    "neon": {"font": "Quicksand", "bg": (10, 10, 20, 217), "border": (0, 255, 255, 255), "border_width": 2, "radius": 0,
+             "icon_bg": (0, 0, 0, 255), "icon_fg": (0, 255, 255, 255), "icon_border": (0, 255, 255, 255), "icon_border_width": 1,
+             "art_radius": 0, "title": (0, 255, 255, 255), "artist": (255, 0, 255, 255)},
+    "terminal": {"font": "JetBrains Mono", "bg": (0, 0, 0, 255), "border": (0, 255, 0, 255), "border_width": 1, "radius": 0,
+                 "icon_bg": (0, 0, 0, 255), "icon_fg": (0, 255, 0, 255), "icon_border": (0, 255, 0, 255), "icon_border_width": 1,
+                 "art_radius": 0, "title": (0, 255, 0, 255), "artist": (0, 187, 0, 255)},
+    "retro": {"font": "Retro Gaming", "bg": (0, 0, 170, 255), "border": (255, 255, 0, 255), "border_width": 4, "radius": 0,
+              "padding": (16, 6), "icon_bg": (0, 0, 0, 255), "icon_fg": WHITE, "icon_border": (255, 255, 0, 255),
+              "icon_border_width": 2, "art_radius": 0, "title": WHITE, "artist": (255, 255, 0, 255)},
+    "highcontrast": {"font": "Atkinson Hyperlegible", "bg": (0, 0, 0, 255), "border": WHITE, "border_width": 2, "radius": 0,
+                     "icon_bg": (0, 0, 0, 255), "icon_fg": WHITE, "icon_border": WHITE, "icon_border_width": 2,
+                     "art_radius": 0, "title": WHITE, "artist": WHITE, "title_scale": 1.2, "artist_scale": 1.1},
+}
+DEFAULT_THEME = "natural"
+
+_font_cache = {}
+_font_lock = threading.Lock()
+
+def _load_font(fonts_dir, family, bold, size):
+    """Return a FreeType font for family/weight/size, falling back to bundled fonts."""
+    from PIL import ImageFont
+    key = (fonts_dir, family, bold, size)
+    with _font_lock:
+        font = _font_cache.get(key)
+        if font is not None:
+            return font
+        for fam in (family, FALLBACK_FAMILY):
+            files = FONT_FILES.get(fam)
+            if not files:
+                continue
+            path = os.path.join(fonts_dir, files[0] if bold else files[1])
+            if not os.path.isfile(path):
+                continue
+            try:
+                font = ImageFont.truetype(path, size)
+            except Exception:
+                continue
+            if "[wght]" in path:
+                # Variable font: pick the weight axis value the CSS would use
+                try:
+                    font.set_variation_by_axes([700 if bold else 400])
+                except Exception:
+                    pass
+            break
+        if font is None:
+            font = ImageFont.load_default()
+        _font_cache[key] = font
+        return font
+
+def fit_text(font, text, max_width):
+    """Truncate text with an ellipsis so it fits in max_width pixels."""
+    if not text or font.getlength(text) <= max_width:
+        return text
+    ellipsis = "…"
+    lo, hi = 0, len(text)
+    # Binary search for the longest prefix that still fits with the ellipsis
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if font.getlength(text[:mid].rstrip() + ellipsis) <= max_width:
+            lo = mid
+        else:
+            hi = mid - 1
+    return text[:lo].rstrip() + ellipsis if lo else ellipsis
+
+def _cover(artwork_bytes, size, radius):
+    """Decode artwork and crop/scale it to a size x size tile with rounded corners."""
+    from PIL import Image, ImageDraw, ImageOps
+    try:
+        img = Image.open(io.BytesIO(artwork_bytes))
+        img.draft("RGB", (size * 2, size * 2))
+        img = ImageOps.fit(img.convert("RGBA"), (size, size), Image.LANCZOS)
+    except Exception:
+        return None
+    if radius:
+        mask = Image.new("L", (size, size), 0)
+        ImageDraw.Draw(mask).rounded_rectangle((0, 0, size - 1, size - 1), radius=radius, fill=255)
+        img.putalpha(mask)
+    return img
+
+def _draw_note(draw, cx, cy, fill):
+    """Draw the ♪ placeholder with primitives (not every bundled font has the glyph)."""
+    draw.ellipse((cx - 8, cy + 2, cx + 1, cy + 9), fill=fill)
+    draw.rectangle((cx - 1, cy - 10, cx + 1, cy + 6), fill=fill)
+    draw.polygon([(cx + 1, cy - 10), (cx + 8, cy - 5), (cx + 8, cy - 1), (cx + 1, cy - 6)], fill=fill)
+
+def frame_height(theme=DEFAULT_THEME):
+    spec = THEMES.get(theme, THEMES[DEFAULT_THEME])
+    pad_y = spec.get("padding", (PADDING_X, PADDING_Y))[1]
+    return MARGIN * 2 + pad_y * 2 + ART_SIZE + spec["border_width"] * 2
+
+def clamp_width(width):
+    """The width in pixels a frame is actually rendered at."""
+    return max(MIN_WIDTH, min(MAX_WIDTH, int(width)))
+
+def render_frame(payload, artwork_bytes=None, theme=DEFAULT_THEME, width=DEFAULT_WIDTH, fonts_dir="."):
+    """Render the now-playing card as PNG bytes (fully transparent when nothing is playing)."""
+    from PIL import Image, ImageDraw
+    spec = THEMES.get(theme, THEMES[DEFAULT_THEME])
+    width = clamp_width(width)
+    height = frame_height(theme)
+    img = Image.new("RGBA", (width, height), (0, 0, 0, 0))
+    payload = payload or {}
+
+    title = payload.get("title") or ""
+    artist_line = (payload.get("artist") or "") + (f" • {payload['album']}" if payload.get("album") else "")
+    muted = False
+    if payload.get("playing"):
+        if not title and not payload.get("artist"):
+            # Same fallback as overlay.js: app name + status
+            title = "Now Playing"
+            artist_line = (payload.get("status") or "playing").capitalize()
+    elif payload.get("error"):
+        title, artist_line, muted = "Music information unavailable", "", True
+    else:
+        buf = io.BytesIO()
+        img.save(buf, "PNG")
+        return buf.getvalue()
+
+    draw = ImageDraw.Draw(img)
+    bw = spec["border_width"]
+    box = (MARGIN, MARGIN, width - MARGIN - 1, height - MARGIN - 1)
+    if spec["bg"] or spec["border"]:
+        draw.rounded_rectangle(box, radius=spec["radius"], fill=spec["bg"],
+                               outline=spec["border"] if bw else None, width=bw)
+
+    pad_x, pad_y = spec.get("padding", (PADDING_X, PADDING_Y))
+    art_x = MARGIN + bw + pad_x
+    art_y = MARGIN + bw + pad_y
+    cover = _cover(artwork_bytes, ART_SIZE, spec["art_radius"]) if artwork_bytes else None
+    if cover is not None:
+        img.alpha_composite(cover, (art_x, art_y))
+    else:
+        icon_box = (art_x, art_y, art_x + ART_SIZE - 1, art_y + ART_SIZE - 1)
+        draw.rounded_rectangle(icon_box, radius=spec["art_radius"], fill=spec["icon_bg"],
+                               outline=spec.get("icon_border"), width=spec.get("icon_border_width", 0))
+        _draw_note(draw, art_x + ART_SIZE / 2, art_y + ART_SIZE / 2, spec["icon_fg"])
+
+    text_x = art_x + ART_SIZE + ART_GAP
+    text_w = width - MARGIN - bw - pad_x - text_x
+    title_font = _load_font(fonts_dir, spec["font"], True, round(TITLE_SIZE * spec.get("title_scale", 1)))
+    artist_font = _load_font(fonts_dir, spec["font"], False, round(ARTIST_SIZE * spec.get("artist_scale", 1)))
+    title_text = fit_text(title_font, title, text_w)
+    artist_text = fit_text(artist_font, artist_line, text_w)
+
+    # Vertically centre the two lines next to the artwork
+    title_h = title_font.getbbox("Ag")[3]
+    artist_h = artist_font.getbbox("Ag")[3] if artist_text else 0
+    block_h = title_h + (LINE_GAP + artist_h if artist_text else 0)
+    ty = art_y + (ART_SIZE - block_h) / 2
+    title_fill = spec["title"]
+    if muted:
+        title_fill = title_fill[:3] + (int(title_fill[3] * 0.7),)
+    shadow = spec.get("shadow")
+    for text, font, fill, y in ((title_text, title_font, title_fill, ty),
+                                (artist_text, artist_font, spec["artist"], ty + title_h + LINE_GAP)):
+        if not text:
+            continue
+        if shadow:
+            draw.text((text_x + 1, y + 1), text, font=font, fill=shadow)
+        draw.text((text_x, y), text, font=font, fill=fill)
+
+    buf = io.BytesIO()
+    img.save(buf, "PNG", optimize=False, compress_level=3)
+    return buf.getvalue()
+
+class RenderCache:
+    """LRU of rendered PNG frames keyed by (state version, theme, width)."""
+    def __init__(self, max_entries=16):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.max_entries = max_entries
+
+    def get_or_render(self, key, render):
+        with self._lock:
+            png = self._entries.get(key)
+            if png is not None:
+                self._entries.move_to_end(key)
+                return png
+        png = render()
+        with self._lock:
+            self._entries[key] = png
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return png
@@ -0,0 +1,358 @@
+# relay.py
+# Mirrors now-playing state from one Jam Deck instance to another over a single TCP
+# connection, for two-PC setups: the instance on the music PC runs a RelaySender
+# (--relay-to) and the one on the OBS PC a RelayReceiver (--relay-listen), which
+# serves its local overlays from the mirrored state.
+#
+# Framing: struct "!IB" = (body length, frame type), then the body. Bodies are JSON,
+# except artwork frames, which carry the 20-byte SHA-1 digest followed by the image.
+#
+#   receiver <- HELLO  {"proto", "boot", "token"}      sender identifies itself
+#   receiver -> SYNC   {"boot", "version", "artwork"}  what the receiver already has
+#   receiver <- FULL   {"boot", "version", "state"}    complete state
+#   receiver <- DELTA  {"base", "version", "payload": {"set", "unset"}, ...}
+#   receiver <- ART    digest + image bytes            sent once, before state that uses it
+#   receiver -> RESYNC {"version"}                     a delta did not apply; send FULL
+#   both     <> PING   {}                              keeps idle connections alive
+#
+# Versions are the sender's state versions; together with the sender's boot id they
+# let a reconnecting pair skip the full state when nothing changed in between.
+
+import hashlib
+import hmac
+import json
+import select
+import socket
+import struct
+import threading
+import time
+
+RELAY_PROTOCOL = 1
+DEFAULT_RELAY_PORT = 8095
+_FRAME = struct.Struct("!IB")
+MAX_FRAME_BYTES = 16 * 1024 * 1024
+
+FRAME_HELLO = 1
+FRAME_SYNC = 2
+FRAME_FULL = 3
+FRAME_DELTA = 4
+FRAME_ART = 5
+FRAME_RESYNC = 6
+FRAME_PING = 7
+
+# Seconds between heartbeats on an idle connection, and without any frame before giving up
+PING_INTERVAL = 5.0
+IDLE_TIMEOUT = 15.0
+# Reconnect backoff bounds (seconds)
+RECONNECT_MIN = 1.0
+RECONNECT_MAX = 30.0
+
+class RelayError(Exception):
+    pass
+
+def parse_address(value, default_host="", default_port=DEFAULT_RELAY_PORT):
+    """'host:port', 'host' or 'port' -> (host, port)."""
+    value = (value or "").strip()
+    if not value:
+        return default_host, default_port
+    if value.isdigit():
+        return default_host, int(value)
+    host, sep, port = value.rpartition(":")
+    if sep and port.isdigit():
+        return host.strip("[]"), int(port)
+    return value, default_port
+
+def send_frame(sock, kind, body=b""):
+    if not isinstance(body, (bytes, bytearray, memoryview)):
+        body = json.dumps(body, separators=(",", ":")).encode("utf-8")
+    sock.sendall(_FRAME.pack(len(body), kind) + bytes(body))
+
+def _recv_exact(sock, size):
+    buf = bytearray(size)
+    view = memoryview(buf)
+    got = 0
+    while got < size:
+        count = sock.recv_into(view[got:])
+        if not count:
+            raise RelayError("connection closed")
+        got += count
+    return buf
+
+def recv_frame(sock):
+    """Read one frame. Returns (kind, body bytes)."""
+    length, kind = _FRAME.unpack(_recv_exact(sock, _FRAME.size))
+    if length > MAX_FRAME_BYTES:
+        raise RelayError(f"frame too large ({length} bytes)")
+    return kind, bytes(_recv_exact(sock, length)) if length else b""
+
+def _json(body):
+    return json.loads(body.decode("utf-8")) if body else {}
+
+_MISSING = object()
+
+def diff_payload(old, new):
+    """Top-level changes turning payload old into new: {"set": {...}, "unset": [...]}."""
+    old = old or {}
+    new = new or {}
+    return {
+        "set": {key: value for key, value in new.items() if old.get(key, _MISSING) != value},
+        "unset": [key for key in old if key not in new],
+    }
+
+def apply_payload_diff(payload, diff):
+    result = dict(payload or {})
+    for key in diff.get("unset", ()):
+        result.pop(key, None)
+    result.update(diff.get("set", {}))
+    return result
+
+def _state_artwork(state):
+    """Artwork digests referenced by a relayed state."""
+    digests = []
+    for item in [state.get("payload") or {}] + list(state.get("sessions") or []):
+        digest = item.get("artworkHash")
+        if digest and digest not in digests:
+            digests.append(digest)
+    return digests
+
+class RelaySender(threading.Thread):
+    """Pushes state to a receiver over one persistent connection, reconnecting as needed.
+
+    get_state() returns (version, state) where state is {"payload", "sessions", "clock"};
+    get_artwork(digest) returns image bytes. Register update() as a state listener.
+    """
+    def __init__(self, address, get_state, get_artwork, boot_id, token=None):
+        super().__init__(name="jamdeck-relay-send", daemon=True)
+        self.address = address
+        self.get_state = get_state
+        self.get_artwork = get_artwork
+        self.boot_id = boot_id
+        self.token = token or ""
+        self.connected = False
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+
+    def update(self, version, payload):
+        """State listener: send the change right away."""
+        self._wake.set()
+
+    def stop(self):
+        self._stop_event.set()
+        self._wake.set()
+
+    def run(self):
+        delay = RECONNECT_MIN
+        while not self._stop_event.is_set():
+            try:
+                sock = socket.create_connection(self.address, timeout=5.0)
+            except OSError as e:
+                print(f"Relay: cannot reach {self.address[0]}:{self.address[1]} ({e}); retrying in {delay:.0f}s")
+                self._stop_event.wait(delay)
+                delay = min(delay * 2, RECONNECT_MAX)
+                continue
+            try:
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                self._session(sock)
+            except (OSError, RelayError, ValueError) as e:
+                if not self._stop_event.is_set():
+                    print(f"Relay connection lost: {e}")
+            finally:
+                # Back off further when the receiver turned us away (e.g. a wrong token)
+                delay = RECONNECT_MIN if self.connected else min(delay * 2, RECONNECT_MAX)
+                self.connected = False
+                try:
+                    sock.close()
+                except OSError:
+                    pass
+            self._stop_event.wait(delay)
+
+    def _session(self, sock):
+        sock.settimeout(IDLE_TIMEOUT)
+        send_frame(sock, FRAME_HELLO, {"proto": RELAY_PROTOCOL, "boot": self.boot_id, "token": self.token})
+        kind, body = recv_frame(sock)
+        if kind != FRAME_SYNC:
+            raise RelayError(f"expected SYNC, got frame {kind}")
+        sync = _json(body)
+        self.connected = True
+        print(f"Relay connected to {self.address[0]}:{self.address[1]}")
+        known_art = set(sync.get("artwork") or [])
+        # Deltas need the state they apply to, so only a receiver already at the current
+        # version of this boot resumes without a full state
+        sent_version = sent_state = None
+        if sync.get("boot") == self.boot_id:
+            version, state = self.get_state()
+            if version == sync.get("version"):
+                sent_version, sent_state = version, state
+        last_send = last_recv = time.monotonic()
+        self._wake.set()
+        while not self._stop_event.is_set():
+            readable, _, _ = select.select([sock], [], [], 0)
+            if readable:
+                kind, body = recv_frame(sock)
+                last_recv = time.monotonic()
+                if kind == FRAME_RESYNC:
+                    sent_version = sent_state = None
+                    self._wake.set()
+            elif time.monotonic() - last_recv > IDLE_TIMEOUT:
+                raise RelayError("receiver stopped answering")
+            # update() only fires for payload changes; session-only changes are picked up here
+            self._wake.wait(0.2)
+            self._wake.clear()
+            version, state = self.get_state()
+            if version != sent_version:
+                # Images first, so the receiver never mirrors a state with missing art
+                for digest in _state_artwork(state):
+                    if digest not in known_art:
+                        data = self.get_artwork(digest)
+                        if data:
+                            send_frame(sock, FRAME_ART, bytes.fromhex(digest) + bytes(data))
+                            known_art.add(digest)
+                if sent_state is None:
+                    send_frame(sock, FRAME_FULL, {"boot": self.boot_id, "version": version, "state": state})
+                else:
+                    delta = {"base": sent_version, "version": version, "clock": state.get("clock"),
+                             "payload": diff_payload(sent_state.get("payload"), state.get("payload"))}
+                    if state.get("sessions") != sent_state.get("sessions"):
+                        delta["sessions"] = state.get("sessions")
+                    send_frame(sock, FRAME_DELTA, delta)
+                sent_version, sent_state = version, state
+                last_send = time.monotonic()
+            if time.monotonic() - last_send >= PING_INTERVAL:
+                send_frame(sock, FRAME_PING)
+                last_send = time.monotonic()
+
+class RelayReceiver(threading.Thread):
+    """Accepts a sender and mirrors its state.
+
+    The mirrored state is {"payload", "sessions", "clock"} as sent; read it with snapshot().
+    on_change() is called after every applied frame and on connect and disconnect;
+    put_artwork(data) stores an image; has_artwork(digest) tells whether it is still stored.
+    """
+    def __init__(self, address, on_change, put_artwork, has_artwork, token=None):
+        super().__init__(name="jamdeck-relay-listen", daemon=True)
+        self.address = address
+        self.on_change = on_change
+        self.put_artwork = put_artwork
+        self.has_artwork = has_artwork
+        self.token = token or ""
+        self.remote_boot = None
+        self.remote_version = None
+        self.state = None
+        self.received_at = 0.0
+        self.connected = False
+        self._server = None
+        self._current = None
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+
+    def snapshot(self):
+        """Return (state, monotonic time it was received, connected)."""
+        with self._lock:
+            return self.state, self.received_at, self.connected
+
+    def stop(self):
+        self._stop_event.set()
+        for sock in (self._server, self._current):
+            if sock is None:
+                continue
+            # close() alone does not wake a thread blocked in accept() or recv() on Linux
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            try:
+                sock.close()
+            except OSError:
+                pass
+
+    def run(self):
+        try:
+            self._server = socket.create_server(self.address, reuse_port=False)
+        except OSError as e:
+            print(f"Relay: cannot listen on {self.address[0] or '*'}:{self.address[1]}: {e}")
+            return
+        print(f"Relay listening on {self.address[0] or '*'}:{self.address[1]}")
+        while not self._stop_event.is_set():
+            try:
+                sock, peer = self._server.accept()
+            except OSError:
+                break
+            # A new sender replaces the current one (e.g. after the old connection went stale)
+            previous, self._current = self._current, sock
+            if previous is not None:
+                try:
+                    previous.close()
+                except OSError:
+                    pass
+            threading.Thread(target=self._serve, args=(sock, peer), name="jamdeck-relay-conn", daemon=True).start()
+
+    def _serve(self, sock, peer):
+        try:
+            sock.settimeout(IDLE_TIMEOUT)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            kind, body = recv_frame(sock)
+            hello = _json(body) if kind == FRAME_HELLO else {}
+            if hello.get("proto") != RELAY_PROTOCOL:
+                raise RelayError(f"unsupported sender from {peer[0]}")
+            if not hmac.compare_digest(str(hello.get("token") or ""), self.token):
+                raise RelayError(f"sender {peer[0]} sent a wrong token")
+            with self._lock:
+                known = [d for d in _state_artwork(self.state or {}) if self.has_artwork(d)]
+                send_frame(sock, FRAME_SYNC, {"boot": self.remote_boot, "version": self.remote_version, "artwork": known})
+            print(f"Relay sender connected from {peer[0]}")
+            self._set_connected(True)
+            while not self._stop_event.is_set():
+                kind, body = recv_frame(sock)
+                if kind == FRAME_PING:
+                    send_frame(sock, FRAME_PING)
+                elif kind == FRAME_ART:
+                    digest = bytes(body[:20]).hex()
+                    if hashlib.sha1(body[20:]).hexdigest() == digest:
+                        self.put_artwork(body[20:])
+                elif kind == FRAME_FULL:
+                    full = _json(body)
+                    with self._lock:
+                        self.remote_boot = full.get("boot")
+                        self.remote_version = full.get("version")
+                        self.state = full.get("state") or {}
+                        self.received_at = time.monotonic()
+                    self._notify()
+                elif kind == FRAME_DELTA:
+                    if not self._apply_delta(_json(body)):
+                        send_frame(sock, FRAME_RESYNC, {"version": self.remote_version})
+        except (OSError, RelayError, ValueError) as e:
+            if not self._stop_event.is_set():
+                print(f"Relay sender disconnected: {e}")
+        finally:
+            try:
+                sock.close()
+            except OSError:
+                pass
+            if self._current is sock:
+                self._set_connected(False)
+
+    def _apply_delta(self, delta):
+        with self._lock:
+            if self.state is None or delta.get("base") != self.remote_version:
+                return False
+            state = dict(self.state)
+            state["payload"] = apply_payload_diff(state.get("payload"), delta.get("payload") or {})
+            if "sessions" in delta:
+                state["sessions"] = delta["sessions"]
+            state["clock"] = delta.get("clock")
+            self.state = state
+            self.received_at = time.monotonic()
+            self.remote_version = delta.get("version")
+        self._notify()
+        return True
+
+    def _set_connected(self, connected):
+        with self._lock:
+            self.connected = connected
+        self._notify()
+
+    def _notify(self):
+        try:
+            self.on_change()
+        except Exception as e:
+            print(f"Relay change callback failed: {e}")
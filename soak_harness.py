@@ -0,0 +1,408 @@
+# soak_harness.py
+# Long-running soak test for the music server, to catch the slow memory creep seen over
+# 8-12 hour streams.
+#
+# The server runs in this process (so tracemalloc sees its allocations) with its HTTP
+# handler, sampling lock, artwork store and caches unchanged; only the provider is
+# replaced. The synthetic provider changes tracks every few seconds and reads each
+# new, large cover through the same chunked thumbnail reader the SMTC path uses. A
+# pool of simulated overlays polls /nowplaying, follows artwork changes and now and
+# then loads /bootstrap or /render.png, so hours of a stream are compressed into
+# minutes. On Windows, --provider live soaks the real SMTC provider instead (WinRT
+# proxies, DataReader buffers) while a player is running.
+#
+# After a warmup, tracemalloc and the RSS are sampled periodically. When either keeps
+# growing (the minimum of the last third of the samples is above the maximum of the
+# first third, and it grew by more than the threshold), the run fails and prints the
+# top allocators since the warmup.
+#
+#   python soak_harness.py --duration 1800 --clients 20
+#
+# Exit code: 0 when memory stayed flat, 1 on growth.
+
+import argparse
+import collections
+import gc
+import http.client
+import io
+import json
+import os
+import random
+import signal
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+from thumbnail_reader import read_image_stream
+
+# Typical track length on a real stream, used to report the simulated stream time
+REAL_TRACK_SECONDS = 210.0
+# Extra covers beyond the artwork cache size, so eviction is exercised
+COVER_POOL = 24
+COVER_SIZE = 1000
+# Reported size of a thumbnail stream is padded like some players do (see thumbnail_reader.py)
+STREAM_PADDING = 4096
+READ_CHUNK = 16 * 1024
+SYNTHETIC_APPS = ("SyntheticPlayer.Main", "SyntheticPlayer.Browser", "SyntheticPlayer.Podcasts")
+STAT_TOP = 15
+TRACEBACK_TOP = 3
+
+# Harness output: the server's own prints go to devnull
+OUT = sys.stdout
+
+def report(message):
+    print(message, file=OUT, flush=True)
+
+# ---------------------------------------------------------
+# Memory probes
+
+def rss_bytes():
+    """Resident set size of this process in bytes, or None where it cannot be read."""
+    if sys.platform == "win32":
+        import ctypes
+        from ctypes import wintypes
+
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD)] + [
+                (name, ctypes.c_size_t) for name in (
+                    "PeakWorkingSetSize", "WorkingSetSize", "QuotaPeakPagedPoolUsage",
+                    "QuotaPagedPoolUsage", "QuotaPeakNonPagedPoolUsage", "QuotaNonPagedPoolUsage",
+                    "PagefileUsage", "PeakPagefileUsage")]
+
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        kernel32 = ctypes.windll.kernel32
+        kernel32.GetCurrentProcess.restype = wintypes.HANDLE
+        if not kernel32.K32GetProcessMemoryInfo(kernel32.GetCurrentProcess(), ctypes.byref(counters), counters.cb):
+            return None
+        return counters.WorkingSetSize
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+def find_growth(values, min_growth):
+    """Growth in bytes when values trend upward by more than min_growth, else None.
+
+    A trend means the lowest of the last third of the samples is above the highest of
+    the first third, so a single spike or a cache filling up once does not count.
+    """
+    values = [v for v in values if v is not None]
+    if len(values) < 6:
+        return None
+    third = len(values) // 3
+    growth = values[-1] - values[0]
+    if min(values[-third:]) > max(values[:third]) and growth > min_growth:
+        return growth
+    return None
+
+def _mb(value):
+    return "n/a" if value is None else f"{value / (1024 * 1024):.1f} MB"
+
+# ---------------------------------------------------------
+# Synthetic provider
+
+def make_covers(count, size, seed=1):
+    """Large, distinct JPEG covers (noise compresses badly). Without Pillow, JPEG-shaped filler."""
+    rng = random.Random(seed)
+    covers = []
+    try:
+        from PIL import Image
+    except ImportError:
+        Image = None
+    for index in range(count):
+        if Image is not None:
+            img = Image.frombytes("RGB", (size // 4, size // 4), rng.randbytes((size // 4) ** 2 * 3))
+            img = img.resize((size, size)).effect_spread(3)
+            out = io.BytesIO()
+            img.save(out, "JPEG", quality=92)
+            covers.append(out.getvalue())
+        else:
+            body = rng.randbytes(size * size // 8)
+            segments = [b"\xff\xfe" + (len(body[i:i + 65000]) + 2).to_bytes(2, "big") + body[i:i + 65000]
+                        for i in range(0, len(body), 65000)]
+            covers.append(b"\xff\xd8" + b"".join(segments) + b"\xff\xd9")
+    return covers
+
+def _unique_cover(cover, track):
+    # A comment segment right after SOI gives every track its own digest (and cache entries)
+    note = f"jamdeck soak track {track}".encode("ascii")
+    return cover[:2] + b"\xff\xfe" + (len(note) + 2).to_bytes(2, "big") + note + cover[2:]
+
+class SyntheticProvider:
+    """Stands in for get_now_playing_state(): a few sessions whose tracks change every track_seconds."""
+    def __init__(self, server, covers, track_seconds):
+        self.server = server
+        self.covers = covers
+        self.track_seconds = track_seconds
+        self.started = time.monotonic()
+        self._artwork = {}
+        self.reads = 0
+
+    def _read_cover(self, data):
+        """Read a cover like _read_thumbnail does: chunked, into one buffer, with an over-reported size."""
+        self.reads += 1
+        source = memoryview(data)
+        offset = 0
+
+        def read_into(window):
+            nonlocal offset
+            count = min(len(window), READ_CHUNK, len(source) - offset)
+            window[:count] = source[offset:offset + count]
+            offset += count
+            return count
+
+        return read_image_stream(read_into, size_hint=len(data) + STREAM_PADDING)
+
+    def _session_artwork(self, app_id, track):
+        cached = self._artwork.get(app_id)
+        if cached and cached[0] == track and self.server.ARTWORK.get(cached[1]) is not None:
+            return cached[1]
+        cover = self.covers[(track * 7 + len(app_id)) % len(self.covers)]
+        data, digest = self._read_cover(_unique_cover(cover, track))
+        if data:
+            digest = self.server.ARTWORK.put(data, current=False, digest=digest)
+        self._artwork[app_id] = (track, digest)
+        return digest
+
+    def _record(self, index, app_id, elapsed):
+        # Sessions are out of phase so their changes do not line up
+        offset = elapsed + index * self.track_seconds / len(SYNTHETIC_APPS)
+        track = int(offset // self.track_seconds)
+        # Every few tracks a session pauses for one track, flipping the selected session
+        status = "paused" if (track + index) % 5 == 4 else "playing"
+        record = {
+            "appId": app_id,
+            "status": status,
+            "playing": True,
+            "title": f"Synthetic Track {track}",
+            "artist": f"Soak Artist {track % 17}",
+            "album": f"Soak Album {track % 5}",
+            "_session": None,
+            "_playback_status": status,
+            "_control": None,
+            "_metadata_error": None,
+            "_timeline": (offset % self.track_seconds, self.track_seconds),
+        }
+        self.server._attach_artwork(record, self._session_artwork(app_id, track))
+        return record
+
+    def state(self):
+        elapsed = time.monotonic() - self.started
+        records = [self._record(i, app_id, elapsed) for i, app_id in enumerate(SYNTHETIC_APPS)]
+        return self.server._state_from_records(records, lambda record, advancing: record["_timeline"])
+
+# ---------------------------------------------------------
+# Simulated overlays
+
+class Stats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = collections.Counter()
+
+    def add(self, key):
+        with self._lock:
+            self.counts[key] += 1
+
+    def summary(self):
+        with self._lock:
+            return dict(sorted(self.counts.items()))
+
+class OverlayClient(threading.Thread):
+    """Polls like overlay.js: /nowplaying, the cover when it changes, and an occasional scene switch."""
+    def __init__(self, index, port, poll_seconds, stats, stop_event, themes, reconnect_every=200):
+        super().__init__(name=f"soak-client-{index}", daemon=True)
+        self.client_id = f"soak-{index}"
+        self.port = port
+        self.poll_seconds = poll_seconds
+        self.stats = stats
+        self.stop_event = stop_event
+        self.themes = themes
+        self.reconnect_every = reconnect_every
+        self.rng = random.Random(index)
+        self._conn = None
+        self._artwork = None
+
+    def _get(self, path):
+        if self._conn is None:
+            self._conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=10)
+        try:
+            self._conn.request("GET", path, headers={"User-Agent": "jamdeck-soak"})
+            response = self._conn.getresponse()
+            body = response.read()
+        except (OSError, http.client.HTTPException):
+            self.stats.add("error")
+            self._close()
+            return None, None
+        self.stats.add(response.status)
+        if response.will_close:
+            self._close()
+        return response.status, body
+
+    def _close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _poll(self):
+        status, body = self._get(f"/nowplaying?client={self.client_id}")
+        if status not in (200, 429) or not body:
+            return
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            self.stats.add("bad-json")
+            return
+        artwork = payload.get("artworkPath")
+        if artwork and artwork != self._artwork:
+            self._artwork = artwork
+            self._get(artwork)
+
+    def run(self):
+        requests = 0
+        while not self.stop_event.is_set():
+            roll = self.rng.random()
+            if roll < 0.02:
+                # OBS scene switch: a fresh page load
+                self._close()
+                self._get(f"/bootstrap?client={self.client_id}")
+            elif roll < 0.04:
+                theme = self.rng.choice(self.themes)
+                self._get(f"/render.png?client={self.client_id}&theme={theme}")
+            elif roll < 0.05:
+                self._get("/sessions" if roll < 0.045 else "/health")
+            else:
+                self._poll()
+            requests += 1
+            if requests % self.reconnect_every == 0:
+                self._close()
+            self.stop_event.wait(self.poll_seconds * self.rng.uniform(0.8, 1.2))
+        self._close()
+
+# ---------------------------------------------------------
+# Run
+
+def start_server(server, sample_interval):
+    httpd = server.ThreadingHTTPServer(("127.0.0.1", 0), server.MusicHandler)
+    httpd.daemon_threads = True
+    threading.Thread(target=httpd.serve_forever, name="soak-httpd", daemon=True).start()
+    poller = server.StatePoller(sample_interval)
+    poller.start()
+    server._PUSH_OUTPUTS.append(poller)
+    return httpd
+
+def print_top_allocators(baseline, snapshot):
+    filters = [
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+        tracemalloc.Filter(False, "<unknown>"),
+    ]
+    baseline = baseline.filter_traces(filters)
+    snapshot = snapshot.filter_traces(filters)
+    report(f"\nTop {STAT_TOP} allocators since the warmup:")
+    for stat in snapshot.compare_to(baseline, "lineno")[:STAT_TOP]:
+        report(f"  {stat}")
+    report(f"\nTracebacks of the top {TRACEBACK_TOP}:")
+    for stat in snapshot.compare_to(baseline, "traceback")[:TRACEBACK_TOP]:
+        report(f"  {stat.size_diff / 1024:+.1f} KiB in {stat.count_diff:+d} blocks")
+        for line in stat.traceback.format(most_recent_first=True):
+            report(f"    {line}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Soak-test the Jam Deck server and fail on memory growth")
+    parser.add_argument("--duration", type=float, default=600, help="Seconds to run (default: 600)")
+    parser.add_argument("--warmup", type=float, default=60, help="Seconds before the baseline is taken, while caches fill (default: 60)")
+    parser.add_argument("--sample-every", type=float, default=15, help="Seconds between memory samples (default: 15)")
+    parser.add_argument("--clients", type=int, default=20, help="Simulated overlays (default: 20)")
+    parser.add_argument("--poll", type=float, default=0.3, help="Seconds between polls of each overlay (default: 0.3)")
+    parser.add_argument("--track-seconds", type=float, default=2.0, help="Synthetic track length in seconds (default: 2)")
+    parser.add_argument("--cover-size", type=int, default=COVER_SIZE, help=f"Synthetic cover width/height in pixels (default: {COVER_SIZE})")
+    parser.add_argument("--sample-interval", type=float, default=0.5, help="Seconds between background samples (default: 0.5)")
+    parser.add_argument("--provider", choices=("synthetic", "live"), default="synthetic", help="Synthetic tracks, or the real platform provider")
+    parser.add_argument("--frames", type=int, default=10, help="Traceback depth recorded by tracemalloc (default: 10)")
+    parser.add_argument("--max-traced-growth", type=float, default=2.0, help="Allowed growth of traced memory in MB (default: 2)")
+    parser.add_argument("--max-rss-growth", type=float, default=48.0, help="Allowed growth of the RSS in MB (default: 48)")
+    args = parser.parse_args()
+
+    # Keep the cover file and any state out of a real runtime dir
+    runtime_dir = tempfile.mkdtemp(prefix="jamdeck-soak-")
+    os.environ["JAMDECK_RUNTIME_DIR"] = runtime_dir
+    tracemalloc.start(args.frames)
+    import music_server as server
+    # The server's handler would exit quietly on Ctrl+C; stop the run and report instead
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+    sys.stdout = open(os.devnull, "w", encoding="utf-8")
+
+    if args.provider == "synthetic":
+        report(f"Generating {COVER_POOL} covers of {args.cover_size}px...")
+        covers = make_covers(COVER_POOL, args.cover_size)
+        report(f"Cover size: {sum(map(len, covers)) // len(covers) // 1024} KiB on average")
+        provider = SyntheticProvider(server, covers, args.track_seconds)
+        server.get_now_playing_state = provider.state
+    httpd = start_server(server, args.sample_interval)
+    port = httpd.server_address[1]
+    stats = Stats()
+    stop_event = threading.Event()
+    clients = [OverlayClient(i, port, args.poll, stats, stop_event, sorted(server.RENDER_THEMES)) for i in range(args.clients)]
+    for client in clients:
+        client.start()
+    compression = REAL_TRACK_SECONDS / args.track_seconds
+    report(f"Soaking on port {port} for {args.duration:.0f} s with {args.clients} overlays "
+           f"(~{args.duration * compression / 3600:.1f} h of a stream at {compression:.0f}x)")
+
+    started = time.monotonic()
+    baseline = snapshot = None
+    samples = []
+    try:
+        next_sample = started + args.warmup
+        while time.monotonic() - started < args.duration:
+            time.sleep(max(0.0, min(next_sample, started + args.duration) - time.monotonic()))
+            if time.monotonic() < next_sample:
+                continue
+            next_sample += args.sample_every
+            gc.collect()
+            traced = tracemalloc.get_traced_memory()[0]
+            rss = rss_bytes()
+            if baseline is None:
+                baseline = tracemalloc.take_snapshot()
+            samples.append((time.monotonic() - started, traced, rss))
+            report(f"[{samples[-1][0]:7.0f}s] traced {_mb(traced)}  rss {_mb(rss)}  requests {sum(stats.summary().values())}")
+    except KeyboardInterrupt:
+        report("Interrupted; checking the samples taken so far")
+    finally:
+        stop_event.set()
+        for client in clients:
+            client.join(timeout=5)
+        if baseline is not None:
+            gc.collect()
+            snapshot = tracemalloc.take_snapshot()
+        httpd.shutdown()
+        httpd.server_close()
+        server.cleanup()
+
+    report(f"Responses: {stats.summary()}")
+    report(f"Limiter: {server.LIMITER.metrics()}")
+    if args.provider == "synthetic":
+        report(f"Covers read: {provider.reads}")
+    traced_growth = find_growth([s[1] for s in samples], args.max_traced_growth * 1024 * 1024)
+    rss_growth = find_growth([s[2] for s in samples], args.max_rss_growth * 1024 * 1024)
+    if len(samples) < 6:
+        report(f"Only {len(samples)} samples after the warmup; run longer for a verdict")
+    if traced_growth is None and rss_growth is None:
+        report("PASS: no steady memory growth")
+        return 0
+    if traced_growth is not None:
+        report(f"FAIL: traced memory grew by {_mb(traced_growth)}")
+    if rss_growth is not None:
+        # Growth outside tracemalloc points at native memory (e.g. WinRT objects)
+        report(f"FAIL: RSS grew by {_mb(rss_growth)}")
+    if snapshot is not None:
+        print_top_allocators(baseline, snapshot)
+    return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,143 @@
+// sw.js
+// Service worker that precaches the overlay's static assets so OBS reloads paint from
+// cache immediately. The asset list and version come from /asset-manifest.json. The page
+// posts the asset version the server reports, and a new cache is built in the background
+// only when that version changes; the new files are used from the next reload.
+
+const CACHE_PREFIX = 'jamdeck-assets-';
+const REMOTE_FONT_CACHE = 'jamdeck-remote-fonts';
+const MANIFEST_URL = '/asset-manifest.json';
+const REMOTE_FONT_HOSTS = ['fonts.googleapis.com', 'fonts.gstatic.com'];
+
+let activeCacheName = null;
+let updating = null;
+
+// A cache is complete once the manifest itself has been stored in it (done last)
+async function isComplete(name) {
+    if (!(await caches.has(name))) {
+        return false;
+    }
+    const cache = await caches.open(name);
+    return !!(await cache.match(MANIFEST_URL));
+}
+
+async function findActiveCache() {
+    if (activeCacheName && await caches.has(activeCacheName)) {
+        return activeCacheName;
+    }
+    const names = (await caches.keys()).filter(name => name.startsWith(CACHE_PREFIX));
+    for (const name of names.reverse()) {
+        if (await isComplete(name)) {
+            activeCacheName = name;
+            return name;
+        }
+    }
+    return null;
+}
+
+async function fetchManifest() {
+    const response = await fetch(MANIFEST_URL, { cache: 'no-store' });
+    if (!response.ok) {
+        throw new Error(`Asset manifest request failed: ${response.status}`);
+    }
+    return response.json();
+}
+
+async function precache(manifest) {
+    const name = CACHE_PREFIX + manifest.version;
+    const cache = await caches.open(name);
+    // Bypass the HTTP cache so a new version never picks up stale files
+    await cache.addAll(manifest.assets.map(url => new Request(url, { cache: 'reload' })));
+    await cache.put(MANIFEST_URL, new Response(JSON.stringify(manifest), {
+        headers: { 'Content-Type': 'application/json' }
+    }));
+    activeCacheName = name;
+    const stale = (await caches.keys()).filter(key => key.startsWith(CACHE_PREFIX) && key !== name);
+    await Promise.all(stale.map(key => caches.delete(key)));
+}
+
+// Bring the cache up to date; a no-op when `version` is already cached
+function update(version) {
+    if (!updating) {
+        updating = (async () => {
+            if (version && await isComplete(CACHE_PREFIX + version)) {
+                return;
+            }
+            const manifest = await fetchManifest();
+            if (await isComplete(CACHE_PREFIX + manifest.version)) {
+                return;
+            }
+            await precache(manifest);
+        })().finally(() => {
+            updating = null;
+        });
+    }
+    return updating;
+}
+
+async function fromCache(request, key) {
+    const name = await findActiveCache();
+    if (name) {
+        const cache = await caches.open(name);
+        const hit = await cache.match(key);
+        if (hit) {
+            return hit;
+        }
+    }
+    return fetch(request);
+}
+
+async function remoteFont(request) {
+    // Google Fonts fallback for families that are not vendored yet
+    const cache = await caches.open(REMOTE_FONT_CACHE);
+    const hit = await cache.match(request);
+    if (hit) {
+        return hit;
+    }
+    const response = await fetch(request);
+    if (response.ok || response.type === 'opaque') {
+        cache.put(request, response.clone());
+    }
+    return response;
+}
+
+self.addEventListener('install', event => {
+    // Without a cache the overlay still works from the network, so never block on a failure
+    event.waitUntil(update().catch(() => {}).then(() => self.skipWaiting()));
+});
+
+self.addEventListener('activate', event => {
+    event.waitUntil(self.clients.claim());
+});
+
+self.addEventListener('message', event => {
+    const data = event.data || {};
+    if (data.type === 'check-version') {
+        event.waitUntil(update(data.version).catch(error => {
+            console.warn('[SW] Asset update failed:', error);
+        }));
+    }
+});
+
+self.addEventListener('fetch', event => {
+    const request = event.request;
+    if (request.method !== 'GET') {
+        return;
+    }
+    const url = new URL(request.url);
+    if (REMOTE_FONT_HOSTS.includes(url.hostname)) {
+        event.respondWith(remoteFont(request));
+        return;
+    }
+    if (url.origin !== self.location.origin) {
+        return;
+    }
+    // Only static assets are served from cache; dynamic routes always go to the server
+    const path = url.pathname;
+    if (path === '/' || path === '/overlay.html') {
+        // Any ?scene=... variant of the overlay page uses the same cached document
+        event.respondWith(fromCache(request, '/'));
+    } else if (/\.(css|js|woff2)$/.test(path) && path !== '/sw.js') {
+        event.respondWith(fromCache(request, path));
+    }
+});
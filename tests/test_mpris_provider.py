@@ -0,0 +1,204 @@
+# test_mpris_provider.py
+# MprisWatcher against a private dbus-daemon with a fake MPRIS player: the initial
+# scan, PropertiesChanged track and status changes, art read once per track, and
+# players appearing and exiting. Skipped when dbus-daemon or jeepney is missing.
+
+import hashlib
+import os
+import queue
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mpris_provider import MPRIS_PATH, MPRIS_PREFIX, PLAYER_IFACE, PROPS_IFACE, ROOT_IFACE, MprisWatcher
+
+try:
+    import jeepney  # noqa: F401
+except ImportError:
+    jeepney = None
+
+def _metadata(track_id, title, art_url=None):
+    meta = {
+        "mpris:trackid": ("o", f"/org/jamdeck/track/{track_id}"),
+        "xesam:title": ("s", title),
+        "xesam:artist": ("as", ["Fake Artist"]),
+        "xesam:album": ("s", "Fake Album"),
+        "mpris:length": ("x", 200 * 1000000),
+    }
+    if art_url:
+        meta["mpris:artUrl"] = ("s", art_url)
+    return meta
+
+class FakePlayer(threading.Thread):
+    """An MPRIS player on its own connection; all bus traffic happens on this thread."""
+    def __init__(self, address, name, metadata, status="Playing"):
+        from jeepney import message_bus
+        from jeepney.io.blocking import open_dbus_connection
+        super().__init__(daemon=True)
+        self.bus_name = MPRIS_PREFIX + name
+        self.props = {
+            "PlaybackStatus": ("s", status),
+            "Metadata": ("a{sv}", metadata),
+            "Position": ("x", 0),
+            "Rate": ("d", 1.0),
+        }
+        self._commands = queue.Queue()
+        self._done = False
+        self.conn = open_dbus_connection(bus=address)
+        self.conn.send_and_get_reply(message_bus.RequestName(self.bus_name), timeout=5)
+
+    def change(self, **props):
+        """Update Player properties and emit PropertiesChanged for them."""
+        self._commands.put(("change", props))
+
+    def quit(self):
+        self._commands.put(("quit", None))
+        self.join(timeout=5)
+
+    def run(self):
+        from jeepney import MessageType
+        while not self._done:
+            while not self._commands.empty():
+                self._command(*self._commands.get())
+            if self._done:
+                break
+            try:
+                msg = self.conn.receive(timeout=0.05)
+            except TimeoutError:
+                continue
+            if msg.header.message_type == MessageType.method_call:
+                self._reply(msg)
+        self.conn.close()
+
+    def _command(self, kind, props):
+        from jeepney import DBusAddress, new_signal
+        if kind == "quit":
+            self._done = True
+            return
+        self.props.update(props)
+        signal = new_signal(DBusAddress(MPRIS_PATH, interface=PROPS_IFACE), "PropertiesChanged",
+                            "sa{sv}as", (PLAYER_IFACE, props, []))
+        self.conn.send(signal)
+
+    def _reply(self, msg):
+        from jeepney import HeaderFields, new_error, new_method_return
+        member = msg.header.fields.get(HeaderFields.member)
+        if member == "GetAll" and msg.body[0] == ROOT_IFACE:
+            self.conn.send(new_method_return(msg, "a{sv}", ({"Identity": ("s", "Fake Player")},)))
+        elif member == "GetAll" and msg.body[0] == PLAYER_IFACE:
+            self.conn.send(new_method_return(msg, "a{sv}", (self.props,)))
+        else:
+            self.conn.send(new_error(msg, "org.freedesktop.DBus.Error.UnknownMethod"))
+
+@unittest.skipIf(jeepney is None or shutil.which("dbus-daemon") is None, "needs jeepney and dbus-daemon")
+class MprisWatcherTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.daemon = subprocess.Popen(["dbus-daemon", "--session", "--nofork", "--print-address=1"],
+                                      stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+        cls.address = cls.daemon.stdout.readline().strip()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.daemon.terminate()
+        cls.daemon.wait(timeout=5)
+        cls.daemon.stdout.close()
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.art_path = os.path.join(self.tmp.name, "cover.jpg")
+        self.art_url = "file://" + self.art_path
+        self._write_art(b"cover one")
+        self.art_loads = []
+        self.players = []
+        self.watcher = None
+
+    def tearDown(self):
+        for player in self.players:
+            if player.is_alive():
+                player.quit()
+        if self.watcher is not None:
+            self.watcher.stop()
+            self.watcher.join(timeout=5)
+        self.tmp.cleanup()
+
+    def _write_art(self, data):
+        with open(self.art_path, "wb") as f:
+            f.write(data)
+
+    def _load_art(self, data):
+        self.art_loads.append(data)
+        return hashlib.sha256(data).hexdigest()
+
+    def _player(self, name, metadata, status="Playing"):
+        player = FakePlayer(self.address, name, metadata, status)
+        player.start()
+        self.players.append(player)
+        return player
+
+    def _watch(self):
+        self.watcher = MprisWatcher(load_art=self._load_art, bus=self.address)
+        self.watcher.start()
+        self.assertTrue(self.watcher.wait_ready(5))
+        self.assertIsNone(self.watcher.error)
+        return self.watcher
+
+    def _wait_for(self, predicate):
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            players = self.watcher.players()
+            if predicate(players):
+                return players
+            time.sleep(0.02)
+        self.fail(f"condition not reached; players: {self.watcher.players()}")
+
+    def test_initial_scan_reads_existing_players(self):
+        self._player("fake", _metadata(1, "One", self.art_url))
+        (snap,) = self._watch().players()
+        self.assertEqual(snap["appId"], "fake")
+        self.assertEqual(snap["identity"], "Fake Player")
+        self.assertEqual(snap["status"], "playing")
+        self.assertEqual((snap["title"], snap["artist"], snap["album"]), ("One", "Fake Artist", "Fake Album"))
+        self.assertEqual(snap["duration"], 200.0)
+        self.assertEqual(snap["artDigest"], hashlib.sha256(b"cover one").hexdigest())
+
+    def test_properties_changed_updates_track_and_status(self):
+        player = self._player("fake", _metadata(1, "One"))
+        self._watch()
+        player.change(Metadata=("a{sv}", _metadata(2, "Two")))
+        self._wait_for(lambda players: players and players[0]["title"] == "Two")
+        player.change(PlaybackStatus=("s", "Paused"))
+        (snap,) = self._wait_for(lambda players: players and players[0]["status"] == "paused")
+        self.assertEqual(snap["title"], "Two")
+
+    def test_art_is_read_once_per_track(self):
+        player = self._player("fake", _metadata(1, "One", self.art_url))
+        self._watch()
+        self.assertEqual(self.art_loads, [b"cover one"])
+        # A status change keeps the track, so the art file is not read again
+        player.change(PlaybackStatus=("s", "Paused"))
+        self._wait_for(lambda players: players[0]["status"] == "paused")
+        self.assertEqual(len(self.art_loads), 1)
+        # Players reuse one file path for every cover; a new track reads it again
+        self._write_art(b"cover two")
+        player.change(Metadata=("a{sv}", _metadata(2, "Two", self.art_url)))
+        (snap,) = self._wait_for(lambda players: players[0]["title"] == "Two")
+        self.assertEqual(self.art_loads, [b"cover one", b"cover two"])
+        self.assertEqual(snap["artDigest"], hashlib.sha256(b"cover two").hexdigest())
+
+    def test_players_appearing_and_exiting(self):
+        self._watch()
+        self.assertEqual(self.watcher.players(), [])
+        player = self._player("late", _metadata(1, "Late"))
+        self._wait_for(lambda players: [p["appId"] for p in players] == ["late"])
+        player.quit()
+        self._wait_for(lambda players: players == [])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,197 @@
+# test_obs_output.py
+# ObsWebSocketSink against a local stand-in obs-websocket server: Identify and
+# authentication, changed-fields-only RequestBatches, and the full resend after a
+# reconnect.
+
+import base64
+import hashlib
+import json
+import os
+import queue
+import socket
+import struct
+import sys
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from obs_output import (_WS_GUID, OP_HELLO, OP_IDENTIFY, OP_IDENTIFIED, OP_REQUEST_BATCH,
+                        OP_REQUEST_BATCH_RESPONSE, ObsWebSocketSink, obs_auth_string)
+
+PASSWORD = "hunter2"
+SALT = "c2FsdA=="
+CHALLENGE = "Y2hhbGxlbmdl"
+
+class FakeObsServer(threading.Thread):
+    """Accepts obs-websocket clients one at a time and queues what they send."""
+    def __init__(self, password=None):
+        super().__init__(daemon=True)
+        self.password = password
+        self.listener = socket.socket()
+        self.listener.bind(("127.0.0.1", 0))
+        self.listener.listen(4)
+        self.url = f"ws://127.0.0.1:{self.listener.getsockname()[1]}"
+        self.messages = queue.Queue()
+        self.connections = 0
+        self.conn = None
+
+    def run(self):
+        while True:
+            try:
+                conn, _ = self.listener.accept()
+            except OSError:
+                return
+            self.conn = conn
+            self.connections += 1
+            try:
+                self._serve(conn)
+            except (OSError, ConnectionError):
+                pass
+            finally:
+                conn.close()
+
+    def drop(self):
+        """Close the current client connection without a close frame."""
+        self.conn.shutdown(socket.SHUT_RDWR)
+
+    def close(self):
+        self.listener.close()
+        if self.conn is not None:
+            try:
+                self.conn.close()
+            except OSError:
+                pass
+
+    def _serve(self, conn):
+        buf = b""
+        while b"\r\n\r\n" not in buf:
+            chunk = conn.recv(4096)
+            if not chunk:
+                return
+            buf += chunk
+        head, buf = buf.split(b"\r\n\r\n", 1)
+        headers = {}
+        for line in head.decode("latin-1").split("\r\n")[1:]:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        accept = base64.b64encode(hashlib.sha1((headers["sec-websocket-key"] + _WS_GUID).encode()).digest()).decode()
+        conn.sendall(("HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                      f"Sec-WebSocket-Accept: {accept}\r\nSec-WebSocket-Protocol: obswebsocket.json\r\n\r\n").encode())
+        hello = {"obsWebSocketVersion": "5.0.0", "rpcVersion": 1}
+        if self.password:
+            hello["authentication"] = {"salt": SALT, "challenge": CHALLENGE}
+        self._send(conn, {"op": OP_HELLO, "d": hello})
+        reader = _FrameReader(conn, buf)
+        while True:
+            msg = reader.read()
+            if msg is None:
+                return
+            self.messages.put(msg)
+            if msg["op"] == OP_IDENTIFY:
+                auth = msg["d"].get("authentication")
+                if self.password and auth != obs_auth_string(self.password, SALT, CHALLENGE):
+                    return
+                self._send(conn, {"op": OP_IDENTIFIED, "d": {"negotiatedRpcVersion": 1}})
+            elif msg["op"] == OP_REQUEST_BATCH:
+                results = [{"requestType": r["requestType"], "requestStatus": {"result": True, "code": 100}}
+                           for r in msg["d"]["requests"]]
+                self._send(conn, {"op": OP_REQUEST_BATCH_RESPONSE,
+                                  "d": {"requestId": msg["d"]["requestId"], "results": results}})
+
+    def _send(self, conn, msg):
+        data = json.dumps(msg).encode()
+        header = bytes([0x81, len(data)]) if len(data) < 126 else bytes([0x81, 126]) + struct.pack("!H", len(data))
+        conn.sendall(header + data)
+
+class _FrameReader:
+    """Reads masked client text frames; None once the client closes."""
+    def __init__(self, conn, buf):
+        self.conn = conn
+        self.buf = buf
+
+    def _exact(self, n):
+        while len(self.buf) < n:
+            chunk = self.conn.recv(4096)
+            if not chunk:
+                raise ConnectionError("closed")
+            self.buf += chunk
+        data, self.buf = self.buf[:n], self.buf[n:]
+        return data
+
+    def read(self):
+        b1, b2 = self._exact(2)
+        length = b2 & 0x7F
+        if length == 126:
+            length = struct.unpack("!H", self._exact(2))[0]
+        elif length == 127:
+            length = struct.unpack("!Q", self._exact(8))[0]
+        mask = self._exact(4)
+        data = bytes(b ^ mask[i % 4] for i, b in enumerate(self._exact(length)))
+        if b1 & 0x0F == 0x8:
+            return None
+        return json.loads(data)
+
+def _payload(title, artist="Artist", album="Album", digest=None):
+    return {"playing": True, "title": title, "artist": artist, "album": album, "artworkHash": digest}
+
+class ObsWebSocketSinkTest(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeObsServer(password=PASSWORD)
+        self.server.start()
+        self.artwork_dir = tempfile.TemporaryDirectory()
+        self.sink = ObsWebSocketSink(self.server.url, password=PASSWORD, artwork_dir=self.artwork_dir.name,
+                                     get_artwork=lambda digest: b"jpeg:" + digest.encode())
+
+    def tearDown(self):
+        self.sink.stop()
+        self.sink.join(timeout=5)
+        self.server.close()
+        self.artwork_dir.cleanup()
+
+    def _next(self, op):
+        while True:
+            msg = self.server.messages.get(timeout=5)
+            if msg["op"] == op:
+                return msg["d"]
+
+    def _batch(self):
+        return {r["requestData"]["inputName"]: r["requestData"]["inputSettings"]
+                for r in self._next(OP_REQUEST_BATCH)["requests"]}
+
+    def test_identify_sends_auth_response(self):
+        self.sink.start()
+        identify = self._next(OP_IDENTIFY)
+        self.assertEqual(identify["rpcVersion"], 1)
+        self.assertEqual(identify["authentication"], obs_auth_string(PASSWORD, SALT, CHALLENGE))
+
+    def test_batches_only_changed_fields(self):
+        self.sink.update(1, _payload("One", digest="a" * 64))
+        self.sink.start()
+        first = self._batch()
+        self.assertEqual(first["Jam Deck Title"], {"text": "One"})
+        self.assertEqual(first["Jam Deck Artist"], {"text": "Artist • Album"})
+        self.assertTrue(first["Jam Deck Artwork"]["file"].endswith(f"jamdeck_obs_cover_{'a' * 16}.jpg"))
+
+        self.sink.update(2, _payload("Two", digest="a" * 64))
+        self.assertEqual(self._batch(), {"Jam Deck Title": {"text": "Two"}})
+
+        self.sink.update(3, _payload("Two", artist="Other", digest="b" * 64))
+        second = self._batch()
+        self.assertEqual(set(second), {"Jam Deck Artist", "Jam Deck Artwork"})
+        self.assertEqual(second["Jam Deck Artist"], {"text": "Other • Album"})
+
+    def test_resends_everything_after_reconnect(self):
+        self.sink.update(1, _payload("One"))
+        self.sink.start()
+        self.assertEqual(len(self._batch()), 3)
+        self.server.drop()
+        self._next(OP_IDENTIFY)
+        resent = self._batch()
+        self.assertEqual(self.server.connections, 2)
+        self.assertEqual(resent["Jam Deck Title"], {"text": "One"})
+        self.assertEqual(set(resent), {"Jam Deck Title", "Jam Deck Artist", "Jam Deck Artwork"})
+
+if __name__ == "__main__":
+    unittest.main()
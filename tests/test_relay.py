@@ -0,0 +1,142 @@
+# test_relay.py
+# RelaySender and RelayReceiver in one process over loopback: initial sync, deltas,
+# artwork sent once, recovery after a dropped connection, RESYNC after a delta with
+# a mismatched base, and resuming without a full state when boot and version match.
+
+import hashlib
+import os
+import socket
+import sys
+import threading
+import time
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import relay
+from relay import FRAME_ART, FRAME_DELTA, FRAME_FULL, FRAME_HELLO, FRAME_RESYNC, RelayReceiver, RelaySender
+
+COVER = b"\xff\xd8fake jpeg bytes"
+COVER_HASH = hashlib.sha1(COVER).hexdigest()
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+class RelayTest(unittest.TestCase):
+    def setUp(self):
+        self.frames = []
+        real_send = relay.send_frame
+
+        def record(sock, kind, body=b""):
+            self.frames.append((threading.current_thread().name, kind))
+            real_send(sock, kind, body)
+
+        patches = [mock.patch.object(relay, "send_frame", record),
+                   mock.patch.object(relay, "RECONNECT_MIN", 0.1)]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+        self.version = 1
+        self.state = {"payload": {"playing": True, "title": "One", "artist": "A"}, "sessions": [], "clock": None}
+        self.artwork = {COVER_HASH: COVER}
+        self.stored = []
+        address = ("127.0.0.1", _free_port())
+        self.receiver = RelayReceiver(address, on_change=lambda: None, put_artwork=self.stored.append,
+                                      has_artwork=lambda digest: any(hashlib.sha1(d).hexdigest() == digest
+                                                                     for d in self.stored), token="secret")
+        self.sender = RelaySender(address, lambda: (self.version, self.state), self.artwork.get,
+                                  boot_id="boot-1", token="secret")
+        self.receiver.start()
+        self.sender.start()
+
+    def tearDown(self):
+        self.sender.stop()
+        self.receiver.stop()
+        self.sender.join(timeout=5)
+        self.receiver.join(timeout=5)
+
+    def _publish(self, **changes):
+        self.state = dict(self.state, payload=dict(self.state["payload"], **changes))
+        self.version += 1
+        self.sender.update(self.version, self.state["payload"])
+
+    def _wait_for(self, predicate, what):
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            if predicate():
+                return
+            time.sleep(0.02)
+        self.fail(f"timed out waiting for {what}")
+
+    def _wait_mirrored(self):
+        self._wait_for(lambda: self.receiver.remote_version == self.version
+                       and self.receiver.snapshot()[0] == self.state, f"version {self.version}")
+
+    def _sent(self, kind, thread="jamdeck-relay-send"):
+        return sum(1 for name, k in self.frames if name == thread and k == kind)
+
+    def _drop(self):
+        """Cut the connection from the receiver's side and wait for the sender to come back."""
+        hellos = self._sent(FRAME_HELLO)
+        self.receiver._current.shutdown(socket.SHUT_RDWR)
+        self._wait_for(lambda: self._sent(FRAME_HELLO) > hellos and self.sender.connected
+                       and self.receiver.connected, "reconnect")
+
+    def test_full_sync_then_deltas(self):
+        self._wait_mirrored()
+        self.assertEqual(self._sent(FRAME_FULL), 1)
+        self._publish(title="Two")
+        self._wait_mirrored()
+        self._publish(status="paused")
+        self._wait_mirrored()
+        self.assertEqual(self._sent(FRAME_FULL), 1)
+        self.assertEqual(self._sent(FRAME_DELTA), 2)
+
+    def test_artwork_sent_once(self):
+        self._wait_mirrored()
+        self._publish(artworkHash=COVER_HASH)
+        self._wait_mirrored()
+        self._publish(title="Two")
+        self._wait_mirrored()
+        self.assertEqual(self.stored, [COVER])
+        self.assertEqual(self._sent(FRAME_ART), 1)
+        # Still stored on the receiver, so a reconnect does not send it again
+        self._drop()
+        self._publish(title="Three")
+        self._wait_mirrored()
+        self.assertEqual(self._sent(FRAME_ART), 1)
+
+    def test_recovers_after_dropped_connection(self):
+        self._wait_mirrored()
+        self.receiver._current.shutdown(socket.SHUT_RDWR)
+        # The state moves on while the pair is apart
+        self._publish(title="Changed while away")
+        self._wait_mirrored()
+        self.assertTrue(self.receiver.snapshot()[2])
+        self.assertEqual(self._sent(FRAME_HELLO), 2)
+
+    def test_resync_after_mismatched_base(self):
+        self._wait_mirrored()
+        with self.receiver._lock:
+            self.receiver.remote_version = -1
+        self._publish(title="Two")
+        self._wait_mirrored()
+        self.assertEqual(self._sent(FRAME_RESYNC, thread="jamdeck-relay-conn"), 1)
+        self.assertEqual(self._sent(FRAME_FULL), 2)
+
+    def test_resume_without_full_when_boot_and_version_match(self):
+        self._wait_mirrored()
+        self._drop()
+        time.sleep(0.5)
+        self.assertEqual(self._sent(FRAME_FULL), 1)
+        self._publish(title="Two")
+        self._wait_mirrored()
+        self.assertEqual(self._sent(FRAME_FULL), 1)
+        self.assertEqual(self._sent(FRAME_DELTA), 1)
+
+if __name__ == "__main__":
+    unittest.main()
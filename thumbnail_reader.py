@@ -0,0 +1,174 @@
+# thumbnail_reader.py
+# Streams an image out of a chunked source (e.g. a WinRT DataReader) with bounded memory.
+#
+# Chunks are read straight into one output buffer (sized from the stream's length when
+# it is known, up to INITIAL_BUFFER_BYTES) through memoryview windows, so no per-chunk
+# copies are made. The format is sniffed from the first bytes, and JPEG, PNG, WebP and
+# BMP streams stop at the real end of the image, so trailing padding or an over-reported
+# size is never read. The SHA-1 used as the artwork cache key is computed while reading.
+
+import hashlib
+
+CHUNK_SIZE = 64 * 1024
+# Streams larger than this are rejected rather than buffered
+MAX_IMAGE_BYTES = 8 * 1024 * 1024
+# Most that is allocated up front for a reported size; the buffer grows from there,
+# so a stream that over-reports its length does not reserve megabytes it never fills
+INITIAL_BUFFER_BYTES = 256 * 1024
+# Bytes needed to tell the formats apart
+SNIFF_BYTES = 12
+
+def sniff_image_type(head):
+    """Return "jpeg", "png", "gif", "webp", "bmp" or None for the leading bytes of a file."""
+    head = bytes(head[:SNIFF_BYTES])
+    if head.startswith(b"\xff\xd8\xff"):
+        return "jpeg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if head.startswith((b"GIF87a", b"GIF89a")):
+        return "gif"
+    if head.startswith(b"RIFF") and head[8:12] == b"WEBP":
+        return "webp"
+    if head.startswith(b"BM"):
+        return "bmp"
+    return None
+
+# JPEG markers without a length field
+_JPEG_STANDALONE = {0x01, 0xD8} | set(range(0xD0, 0xD8))
+
+class ImageEndScanner:
+    """Finds where an image ends inside a growing buffer.
+
+    scan() may be called again after more data arrived; it resumes where it stopped.
+    Returns the end offset once it is known, else None (also for formats without a
+    cheap end marker, such as GIF, which are read to the end of the stream).
+    """
+    def __init__(self, kind):
+        self.kind = kind
+        self.pos = {"jpeg": 2, "png": 8}.get(kind, 0)
+        self.in_scan = False
+
+    def scan(self, data, length):
+        try:
+            if self.kind == "jpeg":
+                return self._scan_jpeg(data, length)
+            if self.kind == "png":
+                return self._scan_png(data, length)
+            # RIFF and BMP headers state the total size up front
+            total = None
+            if self.kind == "webp" and length >= 8:
+                total = int.from_bytes(data[4:8], "little") + 8
+            elif self.kind == "bmp" and length >= 6:
+                total = int.from_bytes(data[2:6], "little")
+            if total is not None and total <= length:
+                return total
+        except Exception:
+            pass
+        return None
+
+    def _scan_jpeg(self, data, length):
+        pos = self.pos
+        while pos < length:
+            if self.in_scan:
+                # Entropy-coded data: only 0xFF followed by a real marker ends it
+                i = data.find(b"\xff", pos, length)
+                if i < 0 or i + 1 >= length:
+                    pos = length if i < 0 else i
+                    break
+                following = data[i + 1]
+                if following == 0x00 or 0xD0 <= following <= 0xD7:
+                    pos = i + 2
+                elif following == 0xFF:
+                    pos = i + 1
+                else:
+                    self.in_scan = False
+                    pos = i
+                continue
+            if pos + 2 > length:
+                break
+            if data[pos] != 0xFF:
+                # Not a marker where one must be: stop guessing and read to the end of the stream
+                self.kind = None
+                return None
+            marker = data[pos + 1]
+            if marker == 0xFF:
+                pos += 1  # fill byte
+            elif marker == 0xD9:
+                self.pos = pos + 2
+                return pos + 2
+            elif marker in _JPEG_STANDALONE:
+                pos += 2
+            else:
+                if pos + 4 > length:
+                    break
+                # Segment lengths also skip embedded EXIF thumbnails and their own EOI markers
+                pos += 2 + ((data[pos + 2] << 8) | data[pos + 3])
+                if marker == 0xDA:
+                    self.in_scan = True
+        self.pos = pos
+        return None
+
+    def _scan_png(self, data, length):
+        pos = self.pos
+        while pos + 8 <= length:
+            chunk_end = pos + 12 + int.from_bytes(data[pos:pos + 4], "big")
+            if data[pos + 4:pos + 8] == b"IEND":
+                if chunk_end <= length:
+                    return chunk_end
+                break
+            pos = chunk_end
+        self.pos = pos
+        return None
+
+def read_image_stream(read_into, size_hint=0, max_bytes=MAX_IMAGE_BYTES, chunk_size=CHUNK_SIZE):
+    """Read one image through read_into(window) -> bytes written (0 at the end of the stream).
+
+    Returns (data, sha1 hex digest), or (None, None) for an empty, unrecognized or
+    oversized stream. data is the bytearray the chunks were read into, trimmed to the
+    image; it is handed over, not copied, so callers must treat it as read-only.
+    """
+    if 0 < size_hint <= max_bytes:
+        buf = bytearray(min(size_hint, INITIAL_BUFFER_BYTES))
+    else:
+        buf = bytearray(min(chunk_size, max_bytes))
+    filled = 0
+    hashed = 0
+    digest = hashlib.sha1()
+    scanner = None
+    end = None
+    while True:
+        if filled == len(buf):
+            if len(buf) >= max_bytes:
+                return None, None
+            # Grow geometrically; no memoryview may be held on buf while it is resized
+            buf.extend(bytes(min(max(len(buf), chunk_size), max_bytes - len(buf))))
+        stop = min(len(buf), filled + chunk_size)
+        with memoryview(buf) as view, view[filled:stop] as window:
+            count = read_into(window)
+        if not count:
+            break
+        filled += count
+        if scanner is None:
+            if filled < SNIFF_BYTES:
+                continue
+            kind = sniff_image_type(buf)
+            if kind is None:
+                return None, None
+            scanner = ImageEndScanner(kind)
+        end = scanner.scan(buf, filled)
+        # Hash what is known to belong to the image while it is still in the CPU cache
+        hashed = _hash_range(digest, buf, hashed, end if end is not None else filled)
+        if end is not None:
+            break
+    if scanner is None and (filled == 0 or sniff_image_type(buf[:filled]) is None):
+        return None, None
+    size = end if end is not None else filled
+    _hash_range(digest, buf, hashed, size)
+    del buf[size:]
+    return buf, digest.hexdigest()
+
+def _hash_range(digest, buf, start, stop):
+    if stop > start:
+        with memoryview(buf) as view, view[start:stop] as part:
+            digest.update(part)
+    return max(start, stop)
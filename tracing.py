@@ -0,0 +1,223 @@
+# tracing.py
+# Opt-in span tracing and on-demand profiling for the music server.
+#
+# Tracer records nested spans (name, start, duration, thread) into a bounded ring
+# buffer and exports them as Chrome trace-event JSON, which Perfetto
+# (ui.perfetto.dev) and chrome://tracing open directly. Nesting is implied by
+# timestamps on each thread, so spans only need to be opened and closed in order.
+# While disabled, span() returns a shared no-op context manager.
+#
+# ProfileCapture runs cProfile for a fixed window. Before Python 3.12 cProfile only
+# sees the thread it was enabled on, so every thread that enters profiled() during
+# the window gets its own profiler and the results are merged with pstats when the
+# window closes. From 3.12 on a profiler sees every thread but only one may be active
+# per process, so the capture enables a single one and profiled() does nothing.
+
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import deque
+
+DEFAULT_TRACE_CAPACITY = 20000
+MAX_PROFILE_SECONDS = 60
+MAX_THREAD_NAMES = 1024
+# cProfile is built on sys.monitoring: one process-wide profiler covering all threads
+PROCESS_WIDE_PROFILER = sys.version_info >= (3, 12)
+
+class _NoopSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NOOP_SPAN = _NoopSpan()
+
+class _Span:
+    __slots__ = ("tracer", "name", "args", "start")
+
+    def __init__(self, tracer, name, args):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter_ns()
+        if exc_type is not None:
+            self.args = dict(self.args or {}, error=exc_type.__name__)
+        self.tracer._record(self.name, self.start, end - self.start, self.args)
+        return False
+
+class Tracer:
+    """Ring buffer of completed spans, exportable as Chrome trace-event JSON."""
+    def __init__(self, capacity=DEFAULT_TRACE_CAPACITY):
+        self.enabled = False
+        self._events = deque(maxlen=capacity)
+        self._thread_names = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._next_tid = 1
+        self._origin = time.perf_counter_ns()
+        self._pid = os.getpid()
+
+    def span(self, name, **args):
+        """Context manager timing one span; extra keyword arguments are attached to it."""
+        if not self.enabled:
+            return _NOOP_SPAN
+        return _Span(self, name, args or None)
+
+    def _thread_id(self):
+        # OS thread idents are reused by short-lived request threads, so each thread
+        # gets its own sequential id (one track in the trace viewer)
+        tid = getattr(self._local, "tid", None)
+        if tid is None:
+            with self._lock:
+                tid = self._next_tid
+                self._next_tid += 1
+                self._thread_names[tid] = threading.current_thread().name
+            self._local.tid = tid
+        return tid
+
+    def _record(self, name, start, duration, args):
+        # deque.append is atomic, so recording a span takes no lock
+        self._events.append((name, start, duration, self._thread_id(), args))
+
+    def clear(self):
+        self._events.clear()
+
+    def export(self):
+        """Return the buffered spans as a Chrome trace-event document (dict)."""
+        events = list(self._events)
+        tids = {event[3] for event in events}
+        with self._lock:
+            # Every request thread adds a name; forget those with no spans left in the buffer
+            if len(self._thread_names) > MAX_THREAD_NAMES:
+                for tid in [tid for tid in self._thread_names if tid not in tids]:
+                    del self._thread_names[tid]
+            names = dict(self._thread_names)
+        trace = [{"name": "process_name", "ph": "M", "pid": self._pid, "args": {"name": "jamdeck-server"}}]
+        for tid in sorted(tids):
+            trace.append({"name": "thread_name", "ph": "M", "pid": self._pid, "tid": tid,
+                          "args": {"name": names.get(tid, str(tid))}})
+        for name, start, duration, tid, args in events:
+            event = {
+                "name": name,
+                "ph": "X",
+                "ts": (start - self._origin) / 1000.0,
+                "dur": duration / 1000.0,
+                "pid": self._pid,
+                "tid": tid,
+            }
+            if args:
+                event["args"] = args
+            trace.append(event)
+        return {"traceEvents": trace, "displayTimeUnit": "ms"}
+
+class TracedWriter:
+    """Wraps a file object so each write() is recorded as a span."""
+    def __init__(self, raw, tracer, name="http.write"):
+        self._raw = raw
+        self._tracer = tracer
+        self._name = name
+
+    def write(self, data):
+        with self._tracer.span(self._name, bytes=len(data)):
+            return self._raw.write(data)
+
+    def __getattr__(self, attr):
+        return getattr(self._raw, attr)
+
+class ProfileCapture:
+    """Collects per-thread cProfile data for one capture window at a time."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._profiles = None  # list while a capture is running
+        self._local = threading.local()
+
+    @property
+    def active(self):
+        return self._profiles is not None
+
+    def profiled(self):
+        """Context manager profiling the calling thread if a capture is running."""
+        if PROCESS_WIDE_PROFILER or self._profiles is None or getattr(self._local, "profile", None) is not None:
+            return _NOOP_SPAN
+        return _ProfiledBlock(self)
+
+    def _add(self, profile):
+        with self._lock:
+            if self._profiles is not None:
+                self._profiles.append(profile)
+
+    def capture(self, seconds, sort="cumulative", limit=40):
+        """Profile for `seconds` and return a pstats text report, or None if a capture is already running."""
+        seconds = max(0.1, min(float(seconds), MAX_PROFILE_SECONDS))
+        with self._lock:
+            if self._profiles is not None:
+                return None
+            self._profiles = []
+        process_profile = None
+        try:
+            if PROCESS_WIDE_PROFILER:
+                profile = cProfile.Profile()
+                try:
+                    profile.enable()
+                except ValueError as e:
+                    # Another profiler or debugger holds the process-wide slot
+                    return f"Profiling unavailable: {e}\n"
+                process_profile = profile
+            time.sleep(seconds)
+        finally:
+            if process_profile is not None:
+                process_profile.disable()
+            with self._lock:
+                profiles, self._profiles = self._profiles, None
+        if process_profile is not None:
+            profiles = [process_profile]
+        out = io.StringIO()
+        if process_profile is not None:
+            out.write(f"Profile of {seconds:g}s, all threads\n\n")
+        else:
+            out.write(f"Profile of {seconds:g}s, {len(profiles)} profiled block(s)\n\n")
+        if not profiles:
+            out.write("No provider samples or requests ran during the capture.\n")
+            return out.getvalue()
+        stats = pstats.Stats(profiles[0], stream=out)
+        for profile in profiles[1:]:
+            stats.add(profile)
+        stats.sort_stats(sort).print_stats(limit)
+        return out.getvalue()
+
+class _ProfiledBlock:
+    def __init__(self, capture):
+        self.capture = capture
+        self.profile = cProfile.Profile()
+
+    def __enter__(self):
+        try:
+            self.profile.enable()
+        except ValueError:
+            # Another profiling tool is active; run the block unprofiled
+            self.profile = None
+            return self
+        self.capture._local.profile = self.profile
+        return self
+
+    def __exit__(self, *exc):
+        if self.profile is None:
+            return False
+        try:
+            self.profile.disable()
+        finally:
+            self.capture._local.profile = None
+        self.capture._add(self.profile)
+        return False
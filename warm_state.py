@@ -0,0 +1,152 @@
+# warm_state.py
+# Persists the last published now-playing snapshot, its cover images and the metadata
+# caches to one file in the runtime directory, so a restarted server can answer
+# immediately (marked stale) while its first live sample is still running.
+#
+# File layout: header struct "!4sBI" = (magic, format version, length of the
+# zlib-compressed JSON document), the document, then the raw image bytes of every
+# artwork entry listed in it, in order. A file with another magic or version is ignored.
+
+import hashlib
+import json
+import struct
+import threading
+import time
+import zlib
+
+from file_output import atomic_write
+
+WARM_STATE_FILE = "jamdeck_warm_state.bin"
+WARM_STATE_MAGIC = b"JDWS"
+WARM_STATE_FORMAT = 1
+_HEADER = struct.Struct("!4sBI")
+# Snapshots older than this are not worth showing, even as stale
+MAX_WARM_STATE_AGE = 7 * 24 * 3600
+
+def encode_warm_state(state, artwork):
+    """Serialize a state dict plus [(digest, bytes, extra dict)] artwork entries."""
+    doc = dict(state)
+    doc["artwork"] = []
+    blobs = []
+    for digest, data, extra in artwork:
+        entry = {"hash": digest, "size": len(data)}
+        entry.update(extra or {})
+        doc["artwork"].append(entry)
+        blobs.append(data)
+    body = zlib.compress(json.dumps(doc, separators=(",", ":")).encode("utf-8"))
+    return _HEADER.pack(WARM_STATE_MAGIC, WARM_STATE_FORMAT, len(body)) + body + b"".join(blobs)
+
+def decode_warm_state(raw):
+    """Inverse of encode_warm_state. Returns (state, artwork) or None for an unusable file.
+
+    Artwork entries whose bytes do not match their hash are dropped.
+    """
+    if len(raw) < _HEADER.size:
+        return None
+    magic, fmt, length = _HEADER.unpack_from(raw)
+    if magic != WARM_STATE_MAGIC or fmt != WARM_STATE_FORMAT:
+        return None
+    offset = _HEADER.size
+    try:
+        state = json.loads(zlib.decompress(raw[offset:offset + length]).decode("utf-8"))
+    except (zlib.error, ValueError):
+        return None
+    if not isinstance(state, dict):
+        return None
+    offset += length
+    view = memoryview(raw)
+    artwork = []
+    for entry in state.pop("artwork", None) or []:
+        size = int(entry.pop("size", 0))
+        data = bytes(view[offset:offset + size])
+        offset += size
+        digest = entry.pop("hash", None)
+        if len(data) == size and hashlib.sha1(data).hexdigest() == digest:
+            artwork.append((digest, data, entry))
+    return state, artwork
+
+def load_warm_state(path, max_age=MAX_WARM_STATE_AGE):
+    """Read a warm-state file. Returns (state, artwork) or None if missing, unusable or too old."""
+    try:
+        with open(path, "rb") as f:
+            raw = f.read()
+    except OSError:
+        return None
+    decoded = decode_warm_state(raw)
+    if decoded is None:
+        return None
+    saved_at = decoded[0].get("savedAt") or 0
+    if max_age is not None and time.time() - saved_at > max_age:
+        return None
+    return decoded
+
+class WarmStateWriter(threading.Thread):
+    """Writes the warm-state file after state changes.
+
+    Register update() as a state listener. get_snapshot() must return (state, artwork)
+    as accepted by encode_warm_state. Writes are coalesced like FileExportSink's, and a
+    pending write is flushed when the writer is stopped.
+    """
+    def __init__(self, path, get_snapshot, coalesce=2.0, max_delay=10.0):
+        super().__init__(name="jamdeck-warm-state", daemon=True)
+        self.path = path
+        self.get_snapshot = get_snapshot
+        self.coalesce = coalesce
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+        self._first_pending = None
+        self._last_update = 0.0
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self._written = None
+
+    def update(self, version, payload):
+        """State listener: schedule a write."""
+        now = time.monotonic()
+        with self._lock:
+            self._last_update = now
+            if self._first_pending is None:
+                self._first_pending = now
+        self._wake.set()
+
+    def stop(self):
+        self._stop_event.set()
+        self._wake.set()
+
+    def _due(self, flush=False):
+        """Return (True, None) when a write is due, else (False, seconds to wait or None)."""
+        with self._lock:
+            if self._first_pending is None:
+                return False, None
+            now = time.monotonic()
+            deadline = min(self._last_update + self.coalesce, self._first_pending + self.max_delay)
+            if now < deadline and not flush:
+                return False, deadline - now
+            self._first_pending = None
+            return True, None
+
+    def _write(self):
+        state, artwork = self.get_snapshot()
+        # Artwork extras are derived from the image, so its digest stands for the entry
+        key = (json.dumps(state, sort_keys=True), [digest for digest, _, _ in artwork])
+        if key == self._written:
+            return
+        atomic_write(self.path, encode_warm_state(dict(state, savedAt=round(time.time(), 3)), artwork))
+        self._written = key
+
+    def run(self):
+        while not self._stop_event.is_set():
+            due, wait = self._due()
+            if not due:
+                self._wake.wait(wait)
+                self._wake.clear()
+                continue
+            try:
+                self._write()
+            except Exception as e:
+                print(f"Warm state write error: {e}")
+        try:
+            if self._due(flush=True)[0]:
+                self._write()
+        except Exception as e:
+            print(f"Warm state write error: {e}")